@@ -0,0 +1,149 @@
+# app/agent.py
+#
+# Usage: python -m app.agent http://coordinator:8000 [--name gen-1] [--loop auto|uvloop|asyncio]
+
+import argparse
+import asyncio
+import socket
+import time
+from typing import Dict, Optional
+
+import httpx
+
+from app.cluster import POLL_TIMEOUT, SNAPSHOT_INTERVAL
+from app.debug import configure_logging, logger
+from app.histogram import LatencyHistogram
+from app.load_tester import run_load_test
+from app.runtime import EVENT_LOOPS, use_event_loop
+
+RETRY_DELAY = 2.0  # Seconds between attempts while the coordinator is unreachable
+
+
+class SnapshotWindow:
+    """Running totals of completed requests, fed through the hooks run_load_test calls on a LiveWindow"""
+
+    def __init__(self):
+        self.histogram = LatencyHistogram()
+        self.status_counts: Dict[int, int] = {}
+        self.started_at = time.time()
+
+    def request_started(self):
+        pass
+
+    def request_finished(self):
+        pass
+
+    def record(self, finished_at: float, status: int, latency: float):
+        self.histogram.record(latency)
+        self.status_counts[status] = self.status_counts.get(status, 0) + 1
+
+    def to_partial(self) -> Dict:
+        """Cumulative snapshot in RunResults.to_partial() form (the agent's fallback result).
+
+        Error types and bytes received are not seen by these hooks, so the
+        snapshot is flagged incomplete and a merged result that uses it says so.
+        """
+        return {
+            "histogram": self.histogram.to_dict(),
+            "status_counts": self.status_counts,
+            "started_at": self.started_at,
+            "ended_at": time.time(),
+            "complete": False,
+        }
+
+
+class LoadAgent:
+    """Registers with a coordinator, long-polls for shards and runs them.
+
+    During a run the agent posts a cumulative snapshot every
+    SNAPSHOT_INTERVAL seconds and a final partial at the end; a snapshot
+    response asking it to stop (the run was cancelled) ends the run early.
+    """
+
+    def __init__(self, coordinator: str, name: Optional[str] = None):
+        self.coordinator = coordinator.rstrip("/")
+        self.name = name or socket.gethostname()
+        self.agent_id: Optional[str] = None
+
+    async def serve(self):
+        async with httpx.AsyncClient(base_url=self.coordinator, timeout=POLL_TIMEOUT + 10) as control:
+            while True:
+                try:
+                    if self.agent_id is None:
+                        await self._register(control)
+                    assignment = await self._poll(control)
+                except httpx.HTTPError as e:
+                    logger.warning("⚠️ Coordinator unreachable (%s); retrying", e)
+                    await asyncio.sleep(RETRY_DELAY)
+                    continue
+                if assignment is not None:
+                    await self._execute(control, assignment)
+
+    async def _register(self, control: httpx.AsyncClient):
+        response = await control.post("/agents/register", json={"name": self.name})
+        response.raise_for_status()
+        self.agent_id = response.json()["agent_id"]
+        logger.info("🛰️ Registered with %s as %s", self.coordinator, self.agent_id)
+
+    async def _poll(self, control: httpx.AsyncClient) -> Optional[Dict]:
+        response = await control.get(
+            f"/agents/{self.agent_id}/assignment", params={"now": time.time(), "timeout": POLL_TIMEOUT}
+        )
+        if response.status_code == 404:
+            self.agent_id = None  # Coordinator restarted and forgot us
+            return None
+        response.raise_for_status()
+        return response.json() if response.status_code == 200 else None
+
+    async def _post_snapshot(
+        self, control: httpx.AsyncClient, run_id: str, partial: Optional[Dict],
+        final: bool = False, error: Optional[str] = None,
+    ) -> bool:
+        """Send a snapshot; returns whether the coordinator wants the run stopped"""
+        try:
+            response = await control.post(
+                f"/agents/{self.agent_id}/snapshot",
+                json={"run_id": run_id, "partial": partial, "final": final, "error": error},
+            )
+            response.raise_for_status()
+            return response.json()["stop"]
+        except httpx.HTTPError as e:
+            logger.warning("⚠️ Snapshot for run %s not delivered: %s", run_id, e)
+            return False
+
+    async def _execute(self, control: httpx.AsyncClient, assignment: Dict):
+        run_id = assignment["run_id"]
+        delay = assignment["start_at"] - time.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        window = SnapshotWindow()
+        stop = asyncio.Event()
+        job = {**assignment["job"], "feeder_shard": tuple(assignment["job"]["feeder_shard"])}
+        task = asyncio.create_task(run_load_test(**job, keep_samples=False, live=window, stop=stop))
+        while not task.done():
+            await asyncio.wait({task}, timeout=SNAPSHOT_INTERVAL)
+            if not task.done() and await self._post_snapshot(control, run_id, window.to_partial()):
+                stop.set()
+        try:
+            results = task.result()
+        except Exception as e:
+            logger.exception("❌ Run %s failed on this agent", run_id)
+            await self._post_snapshot(control, run_id, window.to_partial(), final=True, error=str(e))
+            return
+        await self._post_snapshot(control, run_id, results.to_partial(), final=True)
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="LoadAudit load-generating agent")
+    parser.add_argument("coordinator", help="Base URL of the coordinating LoadAudit API")
+    parser.add_argument("--name", default=None, help="Agent name (default: hostname)")
+    parser.add_argument("--loop", choices=EVENT_LOOPS, default="auto", help="Event loop (default: uvloop if installed)")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = _parse_args()
+    configure_logging()
+    logger.info("🔁 Running on the %s event loop", use_event_loop(args.loop))
+    asyncio.run(LoadAgent(args.coordinator, args.name).serve())
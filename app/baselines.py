@@ -0,0 +1,117 @@
+# app/baselines.py
+
+import json
+import statistics
+import time
+from typing import Dict, List, Optional, Tuple
+
+from app.persistence import connect_db
+
+BASELINE_WINDOW = 20  # K: runs kept per key for median / MAD
+EWMA_ALPHA = 0.3
+MIN_BASELINE_RUNS = 5  # Fewer runs than this cannot establish significance
+REGRESSION_Z = 3.5  # Robust z-score (MAD-based) that counts as a regression
+MAD_SCALE = 1.4826  # MAD → standard deviation for normally distributed data
+
+# metric → (label, higher_is_worse, minimum noise scale as (relative, absolute))
+TRACKED_METRICS = {
+    "p95_latency": ("p95 latency", True, (0.05, 0.001)),
+    "p99_latency": ("p99 latency", True, (0.05, 0.001)),
+    "throughput": ("Throughput", False, (0.05, 0.1)),
+    "error_rate": ("Error rate", True, (0.0, 0.005)),
+}
+
+
+def load_level(num_users: int, target_rps: Optional[float] = None) -> str:
+    """Baseline key component for the offered load: '50u' or, in open-loop mode, '200rps'"""
+    return f"{target_rps:g}rps" if target_rps is not None else f"{num_users}u"
+
+
+def _empty_state() -> Dict:
+    return {"runs": 0, "metrics": {name: {"ewma": None, "window": []} for name in TRACKED_METRICS}}
+
+
+def _update_metric(stat: Dict, value: float):
+    stat["ewma"] = value if stat["ewma"] is None else EWMA_ALPHA * value + (1 - EWMA_ALPHA) * stat["ewma"]
+    stat["window"] = (stat["window"] + [value])[-BASELINE_WINDOW:]
+
+
+def _robust_z(value: float, window: List[float], floor: Tuple[float, float]) -> Tuple[float, float]:
+    """(z, median) of value against the window, using MAD with a noise floor"""
+    median = statistics.median(window)
+    mad = statistics.median(abs(v - median) for v in window)
+    relative, absolute = floor
+    scale = max(MAD_SCALE * mad, relative * abs(median), absolute)
+    return (value - median) / scale, median
+
+
+def check_and_update_baseline(url: str, method: str, level: str, metrics: Dict) -> List[str]:
+    """Flag statistically significant regressions against this key's baseline, then fold the run in.
+
+    Each (url, method, load level) key keeps an EWMA and the last K values
+    of p95/p99/throughput/error rate, so checking and updating are a
+    single primary-key read and write, with no rescan of run history.
+    """
+    with connect_db() as conn:
+        row = conn.execute(
+            "SELECT state FROM baselines WHERE url = ? AND method = ? AND load_level = ?",
+            (url, method, level),
+        ).fetchone()
+        state = json.loads(row["state"]) if row is not None else _empty_state()
+
+        messages = []
+        if state["runs"] < MIN_BASELINE_RUNS:
+            messages.append(
+                f"ℹ️ Baseline for {method} {url} at {level} has {state['runs']} runs; "
+                f"regression checks start at {MIN_BASELINE_RUNS}."
+            )
+        else:
+            for name, (label, higher_is_worse, floor) in TRACKED_METRICS.items():
+                stat = state["metrics"][name]
+                z, median = _robust_z(metrics[name], stat["window"], floor)
+                if (z if higher_is_worse else -z) > REGRESSION_Z:
+                    messages.append(
+                        f"⚠️ {label} regressed: {metrics[name]:g} vs baseline median {median:g} "
+                        f"(EWMA {stat['ewma']:.4g}, robust z={z:+.1f} over {len(stat['window'])} runs)."
+                    )
+
+        for name in TRACKED_METRICS:
+            _update_metric(state["metrics"][name], metrics[name])
+        state["runs"] += 1
+
+        conn.execute(
+            "INSERT OR REPLACE INTO baselines (url, method, load_level, state, updated_at) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (url, method, level, json.dumps(state), time.time()),
+        )
+    return messages
+
+
+def get_baseline(url: str, method: str, level: str) -> Optional[Dict]:
+    """Current rolling statistics for one key"""
+    with connect_db() as conn:
+        row = conn.execute(
+            "SELECT state, updated_at FROM baselines WHERE url = ? AND method = ? AND load_level = ?",
+            (url, method, level),
+        ).fetchone()
+    if row is None:
+        return None
+    state = json.loads(row["state"])
+    summary = {
+        "url": url,
+        "method": method,
+        "load_level": level,
+        "runs": state["runs"],
+        "updated_at": row["updated_at"],
+        "metrics": {},
+    }
+    for name, stat in state["metrics"].items():
+        window = stat["window"]
+        median = statistics.median(window) if window else None
+        summary["metrics"][name] = {
+            "ewma": stat["ewma"],
+            "median": median,
+            "mad": statistics.median(abs(v - median) for v in window) if window else None,
+            "samples": len(window),
+        }
+    return summary
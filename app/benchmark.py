@@ -0,0 +1,591 @@
+# app/benchmark.py
+#
+# Usage: python -m app.benchmark <benchmark> [options]
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+
+from app.histogram import LatencyHistogram
+from app.load_tester import run_load_test, simulate_user
+from app.log_sink import RunLogSink
+from app.metrics import SERIES_PERCENTILES, analyze_results, bucket_stats, counter_statistics, sample_statistics
+from app.persistence import read_run_summaries, save_run_summary
+from app.responses import RESPONSE_MODES
+from app.results import ResultShard, RunResults
+from app.samples import save_samples, stored_run_results
+from app.stub_server import StubProfile, start_stub_server, stub_process, stub_url
+from app.transports import available_transports, build_transport
+from app.workers import run_multiprocess_load_test
+
+
+# ------------------------------
+# 🔹 Request logging
+# ------------------------------
+class PerRequestLogWriter:
+    """The original logging path: open, append and close the file for every request"""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def push(self, timestamp, status, latency, error):
+        with open(self.path, "a") as log_file:
+            log_file.write(json.dumps({
+                "timestamp": datetime.utcnow().isoformat(),
+                "status": status,
+                "latency": latency,
+                "error": error
+            }) + "\n")
+
+
+async def _measure_rps(url: str, users: int, duration: int, log_sink) -> float:
+    async with build_transport(read_timeout=10) as client:
+        started = time.perf_counter()
+        results = await asyncio.gather(*[
+            simulate_user(client, url, duration, log_sink=log_sink)
+            for _ in range(users)
+        ])
+        elapsed = time.perf_counter() - started
+    return sum(len(r) for r in results) / elapsed
+
+
+async def bench_logging(users: int, duration: int):
+    server = await start_stub_server(port=0)
+    url = stub_url(server)
+    rows = []
+
+    with tempfile.TemporaryDirectory() as log_dir, contextlib.redirect_stdout(io.StringIO()):
+        legacy = PerRequestLogWriter(os.path.join(log_dir, "run_legacy.jsonl"))
+        rows.append(("per-request open/write", await _measure_rps(url, users, duration, legacy)))
+
+        async with RunLogSink("inline", log_dir=log_dir, use_thread=False) as sink:
+            rows.append(("batched sink (inline)", await _measure_rps(url, users, duration, sink)))
+
+        async with RunLogSink("threaded", log_dir=log_dir) as sink:
+            rows.append(("batched sink (thread)", await _measure_rps(url, users, duration, sink)))
+
+    server.close()
+    await server.wait_closed()
+
+    print(f"📊 Request logging — {users} users x {duration}s against {url}")
+    for name, rps in rows:
+        print(f"  {name:<26} {rps:>10.1f} req/s")
+
+
+# ------------------------------
+# 🔹 Result collection memory
+# ------------------------------
+def _collect_dicts(samples: int, users: int):
+    per_user = [[] for _ in range(users)]
+    for i in range(samples):
+        per_user[i % users].append({"status": 200, "latency": random.random()})
+    return [item for sublist in per_user for item in sublist]
+
+
+def _collect_columns(samples: int, users: int):
+    shards = [ResultShard(user_id) for user_id in range(users)]
+    now = time.time()
+    for i in range(samples):
+        shards[i % users].record(now, 200, random.random())
+    return RunResults(shards)
+
+
+def _traced(fn, *args):
+    """Run fn under tracemalloc; return (result, retained bytes, peak bytes)"""
+    tracemalloc.start()
+    result = fn(*args)
+    retained, _ = tracemalloc.get_traced_memory()
+    with contextlib.redirect_stdout(io.StringIO()):
+        analyze_results(result)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, retained, peak
+
+
+def bench_memory(samples: int, users: int, dict_samples: int):
+    print(f"📊 Result collection memory — {samples:,} samples across {users} users")
+    rows = []
+
+    # Dicts are measured on a smaller run and extrapolated; 10M of them need several GB
+    dict_n = min(samples, dict_samples)
+    results, retained, peak = _traced(_collect_dicts, dict_n, users)
+    del results
+    rows.append(("list of dicts", dict_n, retained / dict_n, peak / dict_n))
+
+    results, retained, peak = _traced(_collect_columns, samples, users)
+    del results
+    rows.append(("columnar shards", samples, retained / samples, peak / samples))
+
+    for name, measured, retained_per, peak_per in rows:
+        print(
+            f"  {name:<16} measured on {measured:>11,}  "
+            f"{retained_per:>7.1f} B/sample retained  {peak_per:>7.1f} B/sample peak  "
+            f"→ {retained_per * samples / 1024**2:>9.1f} MB / {peak_per * samples / 1024**2:>9.1f} MB at {samples:,}"
+        )
+
+
+# ------------------------------
+# 🔹 Streaming histogram accuracy
+# ------------------------------
+HISTOGRAM_PERCENTILES = [50, 90, 95, 99, 99.9]
+
+
+def _latency_distributions(samples: int):
+    rng = np.random.default_rng(42)
+    bimodal = np.where(
+        rng.random(samples) < 0.9,
+        rng.lognormal(np.log(0.02), 0.3, samples),
+        rng.lognormal(np.log(1.5), 0.5, samples),
+    )
+    return {
+        "uniform": rng.uniform(0.001, 2.0, samples),
+        "lognormal": rng.lognormal(np.log(0.05), 1.0, samples),
+        "bimodal": bimodal,
+    }
+
+
+def bench_histogram(samples: int, significant_digits: int) -> bool:
+    """Returns whether every percentile stayed within the histogram's error bound"""
+    bound = 10 ** -significant_digits
+    print(f"📊 Histogram accuracy — {samples:,} samples, {significant_digits} significant digits (bound {bound:.2%})")
+    worst = 0.0
+
+    for name, latencies in _latency_distributions(samples).items():
+        started = time.perf_counter()
+        hist = LatencyHistogram(significant_digits)
+        for value in latencies.tolist():
+            hist.record(value)
+        approx = hist.percentiles(HISTOGRAM_PERCENTILES)
+        hist_time = time.perf_counter() - started
+
+        started = time.perf_counter()
+        exact = np.percentile(latencies, HISTOGRAM_PERCENTILES, method="inverted_cdf")
+        exact_std = statistics.stdev(latencies.tolist())
+        exact_time = time.perf_counter() - started
+
+        errors = [abs(a - e) / e for a, e in zip(approx, exact)]
+        worst = max(worst, *errors)
+        cells = "  ".join(f"p{q}={err:.3%}" for q, err in zip(HISTOGRAM_PERCENTILES, errors))
+        print(
+            f"  {name:<10} {cells}  stddev Δ={abs(hist.stddev - exact_std) / exact_std:.1e}  "
+            f"record+query {hist_time:.2f}s vs exact {exact_time:.2f}s"
+        )
+
+    print(f"{'✅' if worst <= bound else '❌'} Worst percentile error {worst:.3%} (bound {bound:.2%})")
+    return worst <= bound
+
+
+# ------------------------------
+# 🔹 Analysis engine
+# ------------------------------
+ANALYSIS_SIZES = [10_000, 1_000_000, 10_000_000]
+
+
+def _list_analysis(rows):
+    """The original analyzer: Python lists, generator counts, statistics.stdev, a full sort"""
+    latencies = [r["latency"] for r in rows]
+    successful = sum(1 for r in rows if 200 <= r["status"] < 300)
+    ordered = sorted(latencies)
+    percentiles = [ordered[max(int(len(ordered) * q / 100) - 1, 0)] for q in HISTOGRAM_PERCENTILES]
+    return successful, sum(latencies) / len(latencies), max(latencies), statistics.stdev(latencies), percentiles
+
+
+def _lexsort_bucket_stats(timestamps, latencies, statuses, origin, bucket_seconds):
+    """The previous time-series grouping: one lexsort over (bucket, latency)"""
+    buckets = np.floor((timestamps - origin) / bucket_seconds).astype(np.int64)
+    order = np.lexsort((latencies, buckets))
+    buckets, latencies = buckets[order], latencies[order]
+    failed = ((statuses < 200) | (statuses >= 300))[order].astype(np.int64)
+    ids, first, requests = np.unique(buckets, return_index=True, return_counts=True)
+    errors = np.add.reduceat(failed, first)
+    return ids, requests, errors, *[
+        latencies[first + np.maximum(np.ceil(q / 100 * requests).astype(np.int64) - 1, 0)]
+        for q in SERIES_PERCENTILES
+    ]
+
+
+def bench_analysis(sizes, legacy_max: int):
+    print("🧮 Analysis engine — seconds per call (synthetic lognormal latencies, 1% errors)")
+    print(f"  {'samples':>11}  {'list+stdev':>10}  {'histogram':>9}  {'vectorised':>10}  "
+          f"{'series lexsort':>14}  {'series sorted':>13}  {'analyze_results':>15}")
+    for samples in sizes:
+        results = _synthetic_results(samples)
+        latencies, statuses, timestamps = results.latencies, results.statuses, results.timestamps
+        origin = float(timestamps.min())
+
+        legacy = "skipped"
+        if samples <= legacy_max:
+            rows = results.to_dicts()
+            legacy = f"{_timed(_list_analysis, rows)[1]:.4f}"
+            del rows
+        histogram = _timed(
+            counter_statistics, results.histogram, results.status_counts, results.error_counts
+        )[1]
+        vectorised = _timed(sample_statistics, latencies, statuses, results.errors)[1]
+        lexsort = _timed(_lexsort_bucket_stats, timestamps, latencies, statuses, origin, 1.0)[1]
+        keyed = _timed(bucket_stats, timestamps, latencies, statuses, origin, 1.0)[1]
+        full = _timed(analyze_results, results)[1]
+        print(f"  {samples:>11,}  {legacy:>10}  {histogram:>9.4f}  {vectorised:>10.4f}  "
+              f"{lexsort:>14.4f}  {keyed:>13.4f}  {full:>15.4f}")
+
+
+# ------------------------------
+# 🔹 Worker process scaling
+# ------------------------------
+@contextlib.contextmanager
+def _quiet_stdout_fd():
+    """Silence fd 1 so spawned worker processes inherit a muted stdout"""
+    saved = os.dup(1)
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    try:
+        os.dup2(devnull, 1)
+        yield
+    finally:
+        os.dup2(saved, 1)
+        os.close(devnull)
+        os.close(saved)
+
+
+async def bench_scaling(users: int, duration: int, max_workers: int):
+    server = await start_stub_server(port=0)
+    url = stub_url(server)
+    rows = []
+
+    for workers in range(1, max_workers + 1):
+        started = time.perf_counter()
+        with _quiet_stdout_fd(), contextlib.redirect_stdout(io.StringIO()):
+            results = await run_multiprocess_load_test(url, users, duration, workers=workers)
+        elapsed = time.perf_counter() - started
+        rows.append((workers, len(results) / duration, elapsed))
+
+    server.close()
+    await server.wait_closed()
+
+    print(f"📊 Worker scaling — {users} users x {duration}s against {url}")
+    baseline = rows[0][1] or 1
+    for workers, rps, elapsed in rows:
+        print(f"  {workers:>2} workers  {rps:>10.1f} req/s  x{rps / baseline:>4.2f}  (wall {elapsed:.1f}s)")
+
+
+STAGED_PROFILE = [  # Targets that split unevenly over two shards
+    {"duration": 1, "target_users": 2},
+    {"duration": 1, "target_users": 3},
+    {"duration": 1, "target_users": 0},
+]
+
+
+async def bench_staged_shards(workers: int) -> bool:
+    """A staged run sharded over worker processes must merge into the whole profile's stages"""
+    server = await start_stub_server(port=0)
+    url = stub_url(server)
+    duration = sum(stage["duration"] for stage in STAGED_PROFILE)
+    peak = max(stage["target_users"] for stage in STAGED_PROFILE)
+    try:
+        with _quiet_stdout_fd(), contextlib.redirect_stdout(io.StringIO()):
+            results = await run_multiprocess_load_test(url, peak, duration, stages=STAGED_PROFILE, workers=workers)
+        stages = analyze_results(results)["stages"]
+    finally:
+        server.close()
+        await server.wait_closed()
+
+    print(f"📊 Staged profile over {workers} workers against {url}")
+    for stage in stages:
+        print(f"  {stage['name']:<12} target {stage['target_users']:>3}  {stage['total_requests']:>7} requests")
+    targets = [stage["target_users"] for stage in STAGED_PROFILE]
+    merged = [stage["target_users"] for stage in stages]
+    print(f"{'✅' if merged == targets else '❌'} Merged stage targets {merged} (profile {targets})")
+    return merged == targets
+
+
+# ------------------------------
+# 🔹 Transport backends
+# ------------------------------
+# name → client options; aiohttp rows are skipped when it is not installed
+TRANSPORT_MATRIX = {
+    "httpx": {"transport": "httpx"},
+    "aiohttp": {"transport": "aiohttp"},
+    "raw": {"transport": "raw"},
+    "raw pipeline=4": {"transport": "raw", "pipeline": 4},
+    "raw pipeline=16": {"transport": "raw", "pipeline": 16},
+}
+
+
+async def bench_transports(users: int, duration: int, payload_bytes: int, mode: str):
+    """Requests/sec and requests per CPU-second of this process for each transport.
+
+    The stub runs in its own process, so the generator's CPU time is the
+    cost of the client alone — the figure that bounds one generator core.
+    """
+    installed = available_transports()
+    rows = []
+    with stub_process(StubProfile(payload_bytes=payload_bytes)) as url:
+        for name, options in TRANSPORT_MATRIX.items():
+            if options["transport"] not in installed:
+                rows.append((name, None))
+                continue
+            cpu = time.process_time()
+            with contextlib.redirect_stdout(io.StringIO()):
+                results = await run_load_test(
+                    url, users, duration, run_id="bench_transport", client_options=options,
+                    response_mode=mode, resource_interval=None,
+                )
+            cpu = time.process_time() - cpu
+            metrics = analyze_results(results)
+            rows.append((name, (
+                metrics["total_requests"] / results.elapsed,
+                metrics["total_requests"] / cpu if cpu else 0.0,
+                metrics["p99_latency"] * 1000,
+                metrics["error_rate"],
+            )))
+
+    print(f"📊 Transports — {users} users x {duration}s, {payload_bytes} B responses ({mode}) against {url}")
+    baseline = rows[0][1][1] if rows[0][1] else 1
+    for name, row in rows:
+        if row is None:
+            print(f"  {name:<18} not installed")
+            continue
+        rps, per_core, p99_ms, error_rate = row
+        print(f"  {name:<18} {rps:>10.1f} req/s  {per_core:>10.1f} req/CPU-s  x{per_core / baseline:>5.2f}  "
+              f"p99 {p99_ms:>7.2f} ms  errors {error_rate:.2%}")
+
+
+# ------------------------------
+# 🔹 Reproducible suite against the stub target
+# ------------------------------
+PACKAGE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SUITE_BASELINE = os.path.join(PACKAGE_ROOT, "benchmarks", "baseline.json")
+SUITE_TOLERANCE = 0.25  # Relative change reported as a regression when comparing
+SUITE_SUMMARIES = 500
+SUITE_ACCURACY_SAMPLES = 200_000  # Per distribution, for the histogram error-bound check
+
+# name → (stub profile, load options); each scenario gets a fresh stub process
+SUITE_SCENARIOS = {
+    "closed_loop_fast": (StubProfile(), {"num_users": 50}),
+    "open_loop_lognormal": (StubProfile("lognormal", latency_ms=5, sigma=0.5), {"num_users": 0, "target_rps": 300}),
+    "bimodal_tail": (StubProfile("bimodal", latency_ms=2, slow_ms=50, slow_fraction=0.05), {"num_users": 20}),
+    "error_injection": (StubProfile(error_rate=0.05), {"num_users": 20}),
+    "large_payload": (StubProfile(payload_bytes=64 * 1024), {"num_users": 20}),
+    "connection_close": (StubProfile(close_every=1), {"num_users": 20}),
+}
+
+HIGHER_IS_BETTER = ("requests_per_sec", "throughput")
+LOWER_IS_BETTER = ("_ms", "_seconds")
+
+
+async def _suite_engine(duration: int) -> dict:
+    rows = {}
+    for name, (profile, load) in SUITE_SCENARIOS.items():
+        with stub_process(profile) as url, contextlib.redirect_stdout(io.StringIO()):
+            results = await run_load_test(url, duration=duration, run_id=f"bench_{name}", **load)
+            metrics = analyze_results(results)
+        rows[name] = {
+            "requests_per_sec": round(metrics["total_requests"] / results.elapsed, 1),
+            "throughput": metrics["throughput"],
+            "p50_ms": round(metrics["p50_latency"] * 1000, 2),
+            "p99_ms": round(metrics["p99_latency"] * 1000, 2),
+            "error_rate": metrics["error_rate"],
+            "dropped_requests": metrics["dropped_requests"],
+        }
+    return rows
+
+
+def _synthetic_results(samples: int, users: int = 100) -> RunResults:
+    """Columnar results built straight from arrays (lognormal latencies, 1% errors)"""
+    rng = np.random.default_rng(7)
+    latencies = rng.lognormal(np.log(0.05), 1.0, samples)
+    timestamps = time.time() + np.sort(rng.uniform(0, 60, samples))
+    statuses = np.where(rng.random(samples) < 0.01, 500, 200).astype(np.uint16)
+    shards = []
+    for user_id, part in enumerate(np.array_split(np.arange(samples), users)):
+        shard = ResultShard(user_id)
+        shard.latencies.frombytes(latencies[part].tobytes())
+        shard.timestamps.frombytes(timestamps[part].tobytes())
+        shard.statuses.frombytes(statuses[part].tobytes())
+        shard.errors.frombytes(bytes(len(part)))
+        shard.histogram.record_many(latencies[part])
+        codes, counts = np.unique(statuses[part], return_counts=True)
+        shard.status_counts = dict(zip(codes.tolist(), counts.tolist()))
+        shards.append(shard)
+    return RunResults(shards)
+
+
+def _timed(fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, round(time.perf_counter() - started, 4)
+
+
+def _suite_storage(samples: int) -> dict:
+    results = _synthetic_results(samples)
+    with contextlib.redirect_stdout(io.StringIO()):
+        metrics, analyze_seconds = _timed(analyze_results, results)
+        _, save_seconds = _timed(save_samples, "bench_samples", results)
+        stored, load_seconds = _timed(stored_run_results, "bench_samples")
+        _, reanalyze_seconds = _timed(analyze_results, stored)
+
+        started = time.perf_counter()
+        for i in range(SUITE_SUMMARIES):
+            save_run_summary(f"bench_{i}", "http://stub/", 10, 5, metrics)
+        summary_seconds = time.perf_counter() - started
+        _, read_seconds = _timed(read_run_summaries)
+    return {
+        "analyzer": {"analyze_seconds": analyze_seconds},
+        "samples_store": {
+            "save_seconds": save_seconds,
+            "load_seconds": load_seconds,
+            "reanalyze_seconds": reanalyze_seconds,
+        },
+        "run_store": {
+            "save_summary_ms": round(summary_seconds / SUITE_SUMMARIES * 1000, 3),
+            "read_all_seconds": read_seconds,
+        },
+    }
+
+
+def _compare(results: dict, baseline: dict, tolerance: float) -> int:
+    """Print every metric next to the baseline; returns the number of regressions"""
+    regressions = 0
+    for scenario, metrics in results.items():
+        print(f"  {scenario}")
+        for metric, value in metrics.items():
+            before = baseline.get(scenario, {}).get(metric)
+            if before is None:
+                print(f"    {metric:<20} {value:>12}")
+                continue
+            change = (value - before) / before if before else 0.0
+            worse = (
+                change < -tolerance if metric.endswith(HIGHER_IS_BETTER)
+                else change > tolerance if metric.endswith(LOWER_IS_BETTER)
+                else False
+            )
+            regressions += worse
+            print(f"    {metric:<20} {value:>12}  baseline {before:>12}  {change:>+7.1%}{'  ❌' if worse else ''}")
+    return regressions
+
+
+async def bench_suite(duration: int, samples: int, output: str, baseline_path: str, tolerance: float):
+    """Engine, analyzer and persistence benchmarks against local stub targets only"""
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as scratch:
+        # Logs, sample files and the run database all go to a scratch directory
+        os.chdir(scratch)
+        try:
+            results = await _suite_engine(duration)
+            results.update(_suite_storage(samples))
+        finally:
+            os.chdir(cwd)
+
+    report = {
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "settings": {"duration": duration, "samples": samples},
+        "scenarios": {name: profile.to_dict() for name, (profile, _) in SUITE_SCENARIOS.items()},
+        "results": results,
+    }
+
+    print(f"📊 Benchmark suite — {duration}s per engine scenario, {samples:,} stored samples")
+    regressions = 0
+    if baseline_path and os.path.exists(baseline_path):
+        with open(baseline_path) as f:
+            baseline = json.load(f)
+        print(f"  compared with {baseline_path} ({baseline['generated_at']}, ±{tolerance:.0%} tolerance)")
+        regressions = _compare(results, baseline["results"], tolerance)
+    else:
+        regressions = _compare(results, {}, tolerance)
+
+    if output:
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        with open(output, "w") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+        print(f"💾 Results written to {output}")
+    accurate = bench_histogram(SUITE_ACCURACY_SAMPLES, 2)
+    if regressions:
+        print(f"❌ {regressions} metrics regressed beyond {tolerance:.0%}")
+    if regressions or not accurate:
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LoadAudit micro-benchmarks")
+    sub = parser.add_subparsers(dest="benchmark", required=True)
+
+    logging_cmd = sub.add_parser("logging", help="Per-request log writes vs the batched run log sink")
+    logging_cmd.add_argument("--users", type=int, default=100)
+    logging_cmd.add_argument("--duration", type=int, default=5)
+
+    memory_cmd = sub.add_parser("memory", help="Bytes per sample for dict vs columnar result collection")
+    memory_cmd.add_argument("--samples", type=int, default=10_000_000)
+    memory_cmd.add_argument("--users", type=int, default=500)
+    memory_cmd.add_argument("--dict-samples", type=int, default=1_000_000)
+
+    histogram_cmd = sub.add_parser("histogram", help="Streaming histogram accuracy against exact NumPy percentiles")
+    histogram_cmd.add_argument("--samples", type=int, default=1_000_000)
+    histogram_cmd.add_argument("--digits", type=int, default=2)
+
+    analysis_cmd = sub.add_parser("analysis", help="List-based vs histogram vs vectorised analysis at 10k/1M/10M samples")
+    analysis_cmd.add_argument("--sizes", type=int, nargs="+", default=ANALYSIS_SIZES)
+    analysis_cmd.add_argument("--legacy-max", type=int, default=1_000_000,
+                              help="Largest size to run the list-based analyzer on (it needs ~1 KB per sample)")
+
+    scaling_cmd = sub.add_parser("scaling", help="Requests/sec from 1 to N worker processes")
+    scaling_cmd.add_argument("--users", type=int, default=200)
+    scaling_cmd.add_argument("--duration", type=int, default=5)
+    scaling_cmd.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+
+    staged_cmd = sub.add_parser("staged", help="Staged profile with uneven per-worker targets merges across workers")
+    staged_cmd.add_argument("--workers", type=int, default=2)
+
+    transports_cmd = sub.add_parser("transports", help="Requests/sec per core of each HTTP transport against the stub")
+    transports_cmd.add_argument("--users", type=int, default=100)
+    transports_cmd.add_argument("--duration", type=int, default=5)
+    transports_cmd.add_argument("--payload-bytes", type=int, default=512)
+    transports_cmd.add_argument("--mode", choices=RESPONSE_MODES, default="discard")
+
+    suite_cmd = sub.add_parser("suite", help="Engine, analyzer and persistence benchmarks against the stub target")
+    suite_cmd.add_argument("--duration", type=int, default=5)
+    suite_cmd.add_argument("--samples", type=int, default=1_000_000)
+    suite_cmd.add_argument("--output", help="Write the results as JSON (e.g. to refresh the baseline)")
+    suite_cmd.add_argument("--baseline", default=SUITE_BASELINE, help="Results JSON to compare against")
+    suite_cmd.add_argument("--tolerance", type=float, default=SUITE_TOLERANCE)
+
+    args = parser.parse_args()
+    if args.benchmark == "logging":
+        asyncio.run(bench_logging(args.users, args.duration))
+    elif args.benchmark == "memory":
+        bench_memory(args.samples, args.users, args.dict_samples)
+    elif args.benchmark == "histogram":
+        if not bench_histogram(args.samples, args.digits):
+            sys.exit(1)
+    elif args.benchmark == "analysis":
+        bench_analysis(args.sizes, args.legacy_max)
+    elif args.benchmark == "scaling":
+        asyncio.run(bench_scaling(args.users, args.duration, args.workers))
+    elif args.benchmark == "staged":
+        if not asyncio.run(bench_staged_shards(args.workers)):
+            sys.exit(1)
+    elif args.benchmark == "transports":
+        asyncio.run(bench_transports(args.users, args.duration, args.payload_bytes, args.mode))
+    elif args.benchmark == "suite":
+        asyncio.run(bench_suite(args.duration, args.samples, args.output, args.baseline, args.tolerance))
+
+
+if __name__ == "__main__":
+    main()
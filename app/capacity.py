@@ -0,0 +1,265 @@
+# app/capacity.py
+
+import asyncio
+import math
+import time
+from typing import Dict, List, Optional, Tuple
+
+from app.debug import logger
+from app.histogram import LatencyHistogram
+from app.load_tester import DEFAULT_MAX_IN_FLIGHT, run_arrival_rate, simulate_user
+from app.transports import Transport, build_transport
+
+SEARCH_MODES = ("users", "rps")
+CONFIDENCE_Z = 1.96  # Two-sided 95% intervals for the per-step SLO checks
+SLO_QUANTILE = 0.99
+MIN_DECISION_SAMPLES = 200  # Below this a p99 is just the maximum of a handful of requests
+CHECK_INTERVAL = 0.5  # Seconds between early-stop checks within a step
+STEP_COOLDOWN = 1.0  # Pause between steps so queues on the target drain
+DRAIN_GRACE = 1.0  # Seconds past the schedule that in-flight requests may take before being abandoned
+
+
+class StepMonitor:
+    """Collects one step's outcomes through the hooks simulate_user calls on a LiveWindow.
+
+    Requests that started during the warm-up period are ignored, so each
+    step is judged on steady-state traffic at its load level only.
+    """
+
+    def __init__(self, warmup: float):
+        self.measure_from = time.time() + warmup
+        self.histogram = LatencyHistogram()
+        self.errors = 0
+        self.in_flight = 0
+
+    def request_started(self):
+        self.in_flight += 1
+
+    def request_finished(self):
+        self.in_flight -= 1
+
+    def record(self, finished_at: float, status: int, latency: float):
+        if finished_at - latency < self.measure_from:
+            return
+        self.histogram.record(latency)
+        if not 200 <= status < 300:
+            self.errors += 1
+
+
+def wilson_interval(failures: int, total: int, z: float = CONFIDENCE_Z) -> Tuple[float, float]:
+    """Confidence interval for a proportion (well-behaved near 0, unlike the normal approximation)"""
+    if not total:
+        return 0.0, 1.0
+    p = failures / total
+    denominator = 1 + z * z / total
+    centre = (p + z * z / (2 * total)) / denominator
+    margin = z * math.sqrt(p * (1 - p) / total + z * z / (4 * total * total)) / denominator
+    return max(0.0, centre - margin), min(1.0, centre + margin)
+
+
+def quantile_interval(
+    histogram: LatencyHistogram, q: float = SLO_QUANTILE, z: float = CONFIDENCE_Z
+) -> Tuple[float, float]:
+    """Distribution-free interval for a quantile from the binomial spread of its rank"""
+    n = histogram.count
+    spread = z * math.sqrt(n * q * (1 - q))
+    low_rank = max(1.0, math.floor(n * q - spread))
+    high_rank = min(float(n), math.ceil(n * q + spread))
+    low, high = histogram.percentiles([low_rank / n * 100, high_rank / n * 100])
+    return low, high
+
+
+def slo_verdict(
+    monitor: StepMonitor, max_p99_latency: float, max_error_rate: float
+) -> Tuple[Optional[bool], Dict]:
+    """(True/False once the SLO is met/violated with confidence, else None; step statistics)"""
+    histogram = monitor.histogram
+    n = histogram.count
+    stats = {
+        "requests": n,
+        "error_rate": round(monitor.errors / n, 4) if n else 0,
+        "p99_latency": round(histogram.percentile(SLO_QUANTILE * 100), 4),
+        "error_rate_ci": [round(v, 4) for v in wilson_interval(monitor.errors, n)],
+        "p99_latency_ci": [round(v, 4) for v in quantile_interval(histogram)] if n else [0, 0],
+    }
+    if n < MIN_DECISION_SAMPLES:
+        return None, stats
+    error_low, error_high = stats["error_rate_ci"]
+    p99_low, p99_high = stats["p99_latency_ci"]
+    if error_low > max_error_rate or p99_low > max_p99_latency:
+        return False, stats
+    if error_high <= max_error_rate and p99_high <= max_p99_latency:
+        return True, stats
+    return None, stats
+
+
+async def run_step(
+    client: Transport,
+    url: str,
+    mode: str,
+    load: float,
+    max_p99_latency: float,
+    max_error_rate: float,
+    warmup: float,
+    min_step_duration: float,
+    max_step_duration: float,
+    method: str = "GET",
+    headers: Optional[Dict] = None,
+    payload: Optional[Dict] = None,
+    max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+) -> Dict:
+    """Hold one load level until the SLO verdict is confident or the step times out"""
+    monitor = StepMonitor(warmup)
+    stop = asyncio.Event()
+    duration = warmup + max_step_duration
+    if mode == "users":
+        load_task = asyncio.gather(*[
+            simulate_user(
+                client, url, duration, method, headers, payload,
+                user_id=user_id, keep_samples=False, trace_timings=False, live=monitor, stop=stop,
+            )
+            for user_id in range(int(load))
+        ])
+    else:
+        load_task = asyncio.ensure_future(run_arrival_rate(
+            client, url, duration, load, max_in_flight=max_in_flight, method=method,
+            headers=headers, payload=payload, keep_samples=False, trace_timings=False,
+            live=monitor, stop=stop,
+        ))
+
+    started = time.time()
+    deadline = started + duration + max(DRAIN_GRACE, max_p99_latency)
+    verdict = None
+    while not load_task.done() and time.time() < deadline:
+        await asyncio.wait({load_task}, timeout=CHECK_INTERVAL)
+        if verdict is None and time.time() - monitor.measure_from >= min_step_duration:
+            verdict, _ = slo_verdict(monitor, max_p99_latency, max_error_rate)
+            if verdict is not None:
+                stop.set()
+            if verdict is False:
+                break  # No need to wait for the backlog of a failed step
+
+    abandoned = 0
+    if load_task.done():
+        outcome = load_task.result()
+    else:
+        # Requests still outstanding here are far slower than the SLO allows
+        abandoned = monitor.in_flight
+        load_task.cancel()
+        await asyncio.gather(load_task, return_exceptions=True)
+        outcome = None
+    measured = max(time.time() - max(started, monitor.measure_from), 1e-9)
+
+    final, stats = slo_verdict(monitor, max_p99_latency, max_error_rate)
+    confident = final is not None
+    if final is None:
+        # Step ran out of time undecided: fall back to the point estimates
+        final = stats["error_rate"] <= max_error_rate and stats["p99_latency"] <= max_p99_latency
+    dropped = outcome.dropped_requests if mode == "rps" and outcome is not None else 0
+    if dropped or (abandoned and verdict is not False):
+        final = False  # The offered load was not actually sustained
+    return {
+        "load": load,
+        "passed": final,
+        "confident": confident,
+        "ended_early": verdict is not None,
+        "duration": round(time.time() - started, 2),
+        "throughput": round((monitor.histogram.count - monitor.errors) / measured, 4),
+        "dropped_requests": dropped,
+        "abandoned_requests": abandoned,
+        **stats,
+    }
+
+
+def _next_load(load: float, mode: str) -> float:
+    return float(max(1, round(load))) if mode == "users" else round(load, 2)
+
+
+async def find_capacity(
+    url: str,
+    mode: str = "users",
+    method: str = "GET",
+    headers: Optional[Dict] = None,
+    payload: Optional[Dict] = None,
+    start_load: float = 10,
+    max_load: float = 1000,
+    growth: float = 2.0,
+    resolution: float = 0.1,
+    max_p99_latency: float = 1.0,
+    max_error_rate: float = 0.01,
+    warmup: float = 2.0,
+    min_step_duration: float = 5.0,
+    max_step_duration: float = 30.0,
+    max_steps: int = 20,
+    max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+    client_options: Optional[Dict] = None,
+) -> Dict:
+    """Search for the highest load (users or req/s) that still meets the SLO.
+
+    The load grows geometrically until a step violates the p99 / error-rate
+    SLO, then the bracket between the last passing and the first failing
+    load is bisected until it is within `resolution` of the breaking load.
+    Every step shares one warm client, so connection setup is paid once.
+    A step ends as soon as its verdict is confident at 95%, otherwise after
+    `max_step_duration`. The knee lies in ``confidence_interval`` =
+    [max sustainable load, breaking load].
+    """
+    if mode not in SEARCH_MODES:
+        raise ValueError(f"mode must be one of {SEARCH_MODES}")
+    options = dict(client_options or {})
+    if mode == "users":
+        # A pool smaller than the user count would measure our own queueing, not the target
+        options["max_connections"] = max(options.get("max_connections", 100), int(max_load))
+
+    logger.info(
+        "🔎 Capacity search: %s %g→%g | p99 ≤ %ss, errors ≤ %.1f%% | %s %s",
+        mode, start_load, max_load, max_p99_latency, max_error_rate * 100, method, url,
+    )
+    steps: List[Dict] = []
+    passing: Optional[float] = None
+    failing: Optional[float] = None
+    load = _next_load(min(start_load, max_load), mode)
+    started = time.time()
+
+    async with build_transport(**options) as client:
+        while len(steps) < max_steps:
+            step = await run_step(
+                client, url, mode, load, max_p99_latency, max_error_rate,
+                warmup, min_step_duration, max_step_duration,
+                method, headers, payload, max_in_flight,
+            )
+            steps.append(step)
+            logger.info(
+                "   %s %g %s: p99=%ss errors=%.2f%% (%ss)", "✅" if step["passed"] else "❌",
+                load, mode, step["p99_latency"], step["error_rate"] * 100, step["duration"],
+            )
+            if step["passed"]:
+                passing = load
+            else:
+                failing = load
+
+            if failing is None:
+                if load >= max_load:
+                    break
+                candidate = min(load * growth, max_load)
+            else:
+                floor = passing or 0.0
+                if failing - floor <= resolution * failing:
+                    break
+                candidate = (floor + failing) / 2
+            candidate = _next_load(candidate, mode)
+            if candidate in (passing, failing):
+                break  # Whole users cannot split the bracket any further
+            load = candidate
+            await asyncio.sleep(STEP_COOLDOWN)
+
+    return {
+        "mode": mode,
+        "max_sustainable_load": passing or 0,
+        "breaking_load": failing,
+        "confidence_interval": [passing or 0, failing if failing is not None else max_load],
+        "capped": failing is None,
+        "slo": {"max_p99_latency": max_p99_latency, "max_error_rate": max_error_rate},
+        "steps": steps,
+        "total_duration": round(time.time() - started, 2),
+    }
@@ -0,0 +1,205 @@
+# app/cluster.py
+
+import asyncio
+import time
+import uuid
+from typing import Dict, List, Optional
+
+from app.debug import logger
+from app.results import RunResults
+from app.workers import shard_jobs
+
+AGENT_TIMEOUT = 60.0  # Agents not heard from for this long no longer get work
+POLL_TIMEOUT = 20.0  # Longest an assignment long-poll is held open
+AGENT_START_DELAY = 3.0  # Seconds for every agent to pick up its shard before the shared start
+SNAPSHOT_INTERVAL = 2.0  # Seconds between the cumulative snapshots agents post during a run
+RESULT_GRACE = 15.0  # Seconds past the scheduled end to wait for final snapshots
+
+
+class Agent:
+    """A remote load generator, as the coordinator sees it"""
+
+    def __init__(self, name: str):
+        self.agent_id = uuid.uuid4().hex[:12]
+        self.name = name
+        self.registered_at = time.time()
+        self.last_seen = self.registered_at
+        # Agent clock minus coordinator clock, measured on each poll
+        self.clock_offset = 0.0
+        self.run_id: Optional[str] = None
+        self.assignment: Optional[Dict] = None
+        self.assigned = asyncio.Event()
+        self.snapshot: Optional[Dict] = None
+        self.final = False
+        self.error: Optional[str] = None
+
+    @property
+    def alive(self) -> bool:
+        return time.time() - self.last_seen < AGENT_TIMEOUT
+
+    def to_dict(self) -> Dict:
+        snapshot = self.snapshot or {}
+        return {
+            "agent_id": self.agent_id,
+            "name": self.name,
+            "registered_at": self.registered_at,
+            "last_seen": self.last_seen,
+            "alive": self.alive,
+            "clock_offset": round(self.clock_offset, 4),
+            "run_id": self.run_id,
+            "requests": snapshot.get("histogram", {}).get("count", 0),
+            "final": self.final,
+            "error": self.error,
+        }
+
+
+class ClusterRun:
+    def __init__(self, run_id: str, agents: List[Agent]):
+        self.run_id = run_id
+        self.agents = agents
+        self.done = asyncio.Event()
+
+    def check_done(self):
+        if all(agent.final for agent in self.agents):
+            self.done.set()
+
+
+def to_coordinator_clock(partial: Dict, clock_offset: float) -> Dict:
+    """A copy of an agent's partial with its wall-clock timestamps moved to the coordinator's clock"""
+    shifted = dict(partial)
+    for field in ("started_at", "ended_at"):
+        if shifted.get(field) is not None:
+            shifted[field] = shifted[field] - clock_offset
+    shifted["resource_timelines"] = [
+        {**timeline, "started_at": timeline["started_at"] - clock_offset}
+        for timeline in partial.get("resource_timelines", [])
+    ]
+    if partial.get("stages"):
+        stages = partial["stages"]
+        shifted["stages"] = {
+            **stages,
+            "starts": [start - clock_offset for start in stages["starts"]],
+            "ends": [end - clock_offset for end in stages["ends"]],
+        }
+    return shifted
+
+
+class AgentRegistry:
+    """Coordinator side of distributed runs.
+
+    Agents register, then long-poll for work. A run is split with
+    ``shard_jobs`` across the idle agents, each shard carrying a shared
+    start time translated into that agent's clock. While running, agents
+    post cumulative histogram/counter snapshots; the final ones are merged
+    with ``RunResults.from_partials``, so the result goes through the
+    normal ``analyze_results``. An agent that never reports back
+    contributes its last snapshot.
+    """
+
+    def __init__(self):
+        self.agents: Dict[str, Agent] = {}
+        self.runs: Dict[str, ClusterRun] = {}
+
+    # ------------------------------
+    # 🔹 Agent-facing calls
+    # ------------------------------
+    def register(self, name: str) -> Agent:
+        agent = Agent(name)
+        self.agents[agent.agent_id] = agent
+        logger.info("🛰️ Agent %s registered as %s", name, agent.agent_id)
+        return agent
+
+    def get(self, agent_id: str) -> Optional[Agent]:
+        return self.agents.get(agent_id)
+
+    async def poll(self, agent: Agent, agent_time: Optional[float], timeout: float = POLL_TIMEOUT) -> Optional[Dict]:
+        """Wait up to `timeout` seconds for an assignment for this agent"""
+        agent.last_seen = time.time()
+        if agent_time is not None:
+            agent.clock_offset = agent_time - agent.last_seen
+        try:
+            await asyncio.wait_for(agent.assigned.wait(), min(timeout, POLL_TIMEOUT))
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            agent.last_seen = time.time()
+        agent.assigned.clear()
+        assignment, agent.assignment = agent.assignment, None
+        if assignment is None:
+            return None
+        return {**assignment, "start_at": assignment["start_at"] + agent.clock_offset}
+
+    def submit_snapshot(
+        self, agent: Agent, run_id: str, partial: Optional[Dict], final: bool, error: Optional[str] = None
+    ) -> bool:
+        """Record an agent's snapshot; returns whether the agent should stop early"""
+        agent.last_seen = time.time()
+        run = self.runs.get(run_id)
+        if run is None or agent not in run.agents:
+            return True  # The run is gone (cancelled or timed out): stop generating load for it
+        if partial is not None:
+            agent.snapshot = partial
+        if final:
+            agent.final = True
+            agent.error = error
+            agent.run_id = None
+            run.check_done()
+        return False
+
+    # ------------------------------
+    # 🔹 Coordinator
+    # ------------------------------
+    def available(self) -> List[Agent]:
+        return [agent for agent in self.agents.values() if agent.alive and agent.run_id is None]
+
+    async def run(self, run_id: str, run_options: Dict, agents: int) -> RunResults:
+        """Shard a run over `agents` idle agents and merge what they report"""
+        idle = self.available()
+        if len(idle) < agents:
+            raise RuntimeError(f"{agents} agents requested but only {len(idle)} available")
+        chosen = idle[:agents]
+        if run_options.get("target_rps") is None:
+            chosen = chosen[:max(run_options["num_users"], 1)]  # No idle agents in closed-loop mode
+        jobs = shard_jobs(len(chosen), "a", **run_options)
+        start_at = time.time() + AGENT_START_DELAY
+
+        run = ClusterRun(run_id, chosen)
+        self.runs[run_id] = run
+        for agent, job in zip(chosen, jobs):
+            agent.run_id = run_id
+            agent.snapshot = None
+            agent.final = False
+            agent.error = None
+            agent.assignment = {"run_id": run_id, "start_at": start_at, "job": job}
+            agent.assigned.set()
+        logger.info("🛰️ Spreading load test over %s agents", len(chosen))
+
+        try:
+            timeout = start_at + run_options["duration"] + RESULT_GRACE - time.time()
+            await asyncio.wait_for(run.done.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            # On cancellation too: agents learn the run is gone from their next snapshot response
+            for agent in chosen:
+                if agent.run_id == run_id:
+                    agent.run_id = None
+                    agent.assignment = None
+            self.runs.pop(run_id, None)
+
+        for agent in chosen:
+            if not agent.final or agent.error:
+                logger.warning(
+                    "⚠️ Agent %s did not finish run %s cleanly (%s); using its last snapshot",
+                    agent.name, run_id, agent.error or "no final snapshot",
+                )
+        return RunResults.from_partials([
+            to_coordinator_clock(agent.snapshot, agent.clock_offset) for agent in chosen if agent.snapshot
+        ])
+
+    def progress(self, run_id: str) -> Optional[List[Dict]]:
+        run = self.runs.get(run_id)
+        return [agent.to_dict() for agent in run.agents] if run is not None else None
+
+
+agent_registry = AgentRegistry()
@@ -0,0 +1,256 @@
+# app/compare.py
+
+import math
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.histogram import LatencyHistogram
+from app.metrics import DEFAULT_BUCKET_SECONDS, STATUS_CLASSES, count_breakdowns
+from app.persistence import get_run_distributions, get_run_timeseries, previous_run_ids
+from app.results import ERROR_TYPES
+from app.samples import load_meta, stored_time_series
+
+COMPARE_PERCENTILES = (50, 75, 90, 95, 99, 99.9)
+KS_COEFFICIENT = 1.358  # c(α) of the two-sample Kolmogorov–Smirnov test at α = 0.05
+OVERLAY_FIELDS = ("rps", "error_rate", "p50_latency", "p95_latency", "p99_latency")
+MAX_CACHED_COMPARISONS = 512
+MAX_BASELINES = 50
+
+
+class ComparisonCache:
+    """LRU of computed comparisons.
+
+    Stored runs never change once saved, so entries cannot go stale; only
+    successful comparisons are cached, so a run that is still being saved
+    is simply looked up again next time.
+    """
+
+    def __init__(self, size: int = MAX_CACHED_COMPARISONS):
+        self.size = size
+        self.entries: "OrderedDict[Tuple, Dict]" = OrderedDict()
+
+    def get(self, key: Tuple) -> Optional[Dict]:
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+        return entry
+
+    def put(self, key: Tuple, value: Dict):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+
+
+comparison_cache = ComparisonCache()
+
+
+# ------------------------------
+# 🔹 Distribution deltas
+# ------------------------------
+def _load_distributions(run_ids: List[str], required: bool = True) -> Dict[str, Dict]:
+    stored = get_run_distributions(run_ids)
+    missing = [run_id for run_id in run_ids if run_id not in stored]
+    if missing and required:
+        raise LookupError(f"No stored latency distribution for run(s) {', '.join(missing)}")
+    for distribution in stored.values():
+        distribution["histogram"] = LatencyHistogram.from_dict(distribution["histogram"])
+    return stored
+
+
+def ks_statistics(reference: LatencyHistogram, others: List[LatencyHistogram]) -> np.ndarray:
+    """Largest CDF gap between `reference` and each of `others`, all at once.
+
+    The CDFs are compared at every bucket edge, so the statistic is exact
+    up to the histogram's bucket resolution. Histograms must share a layout;
+    an empty one yields NaN.
+    """
+    for other in others:
+        if (other.significant_digits, other.lowest, other.highest) != (
+            reference.significant_digits, reference.lowest, reference.highest
+        ):
+            raise ValueError("Cannot compare histograms with different precision or range")
+    if not others:
+        return np.zeros(0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        base = np.cumsum(np.frombuffer(reference.counts, dtype=np.int64)) / reference.count
+        matrix = np.stack([np.frombuffer(other.counts, dtype=np.int64) for other in others])
+        totals = matrix.sum(axis=1, keepdims=True)
+        cdfs = np.cumsum(matrix, axis=1) / totals
+        return np.abs(cdfs - base).max(axis=1)
+
+
+def _delta(a: float, b: float) -> Dict[str, Optional[float]]:
+    return {
+        "a": round(a, 4),
+        "b": round(b, 4),
+        "delta": round(b - a, 4),
+        "relative": round((b - a) / a, 4) if a else None,
+    }
+
+
+def _shares(distribution: Dict) -> Tuple[Dict[str, float], Dict[str, float]]:
+    """Share of requests per status class and per error type"""
+    total = max(sum(distribution["status_counts"].values()), 1)
+    classes, _, errors = count_breakdowns(distribution["status_counts"], distribution["error_counts"], total)
+    return (
+        {name: count / total for name, count in classes.items()},
+        {name: breakdown["share"] for name, breakdown in errors.items()},
+    )
+
+
+def _mix_delta(a: Dict[str, float], b: Dict[str, float], keys) -> Dict[str, Dict]:
+    return {
+        key: {"a": round(a.get(key, 0.0), 4), "b": round(b.get(key, 0.0), 4),
+              "delta": round(b.get(key, 0.0) - a.get(key, 0.0), 4)}
+        for key in keys
+    }
+
+
+def compare_distributions(a: Dict, b: Dict, ks_statistic: Optional[float] = None) -> Dict:
+    """Percentile, KS and error-mix differences of run b against run a (deltas are b − a)"""
+    hist_a, hist_b = a["histogram"], b["histogram"]
+    if ks_statistic is None:
+        ks_statistic = float(ks_statistics(hist_a, [hist_b])[0])
+    n, m = hist_a.count, hist_b.count
+    critical = KS_COEFFICIENT * math.sqrt((n + m) / (n * m)) if n and m else None
+
+    classes_a, errors_a = _shares(a)
+    classes_b, errors_b = _shares(b)
+    error_types = [name for name in ERROR_TYPES if name in errors_a or name in errors_b]
+    error_types += sorted((set(errors_a) | set(errors_b)) - set(error_types))
+    return {
+        "requests": {"a": n, "b": m},
+        "mean_latency": _delta(hist_a.mean, hist_b.mean),
+        "percentiles": {
+            f"p{q:g}": _delta(value_a, value_b)
+            for q, value_a, value_b in zip(
+                COMPARE_PERCENTILES, hist_a.percentiles(COMPARE_PERCENTILES), hist_b.percentiles(COMPARE_PERCENTILES)
+            )
+        },
+        "ks": {
+            "statistic": None if math.isnan(ks_statistic) else round(ks_statistic, 4),
+            "critical": round(critical, 4) if critical is not None else None,
+            "shifted": critical is not None and ks_statistic > critical,
+        },
+        "error_mix": {
+            "status_classes": _mix_delta(classes_a, classes_b, STATUS_CLASSES),
+            "errors": _mix_delta(errors_a, errors_b, error_types),
+        },
+    }
+
+
+# ------------------------------
+# 🔹 Time-series overlay
+# ------------------------------
+def _series(run_id: str, bucket_seconds: Optional[float]) -> Optional[Dict]:
+    """The stored series, or one recomputed from raw samples for another bucket size"""
+    stored = get_run_timeseries(run_id)
+    if stored is not None and (bucket_seconds is None or bucket_seconds == stored["bucket_seconds"]):
+        return stored
+    if load_meta(run_id) is not None:
+        return stored_time_series(run_id, bucket_seconds=bucket_seconds or DEFAULT_BUCKET_SECONDS)
+    return stored
+
+
+def overlay_time_series(a: str, b: str, bucket_seconds: Optional[float] = None) -> Optional[Dict]:
+    """Both runs' series on one axis of seconds since each run's start, padded with None.
+
+    Without a `bucket_seconds`, run a's bucket size is used; when run b
+    only has a stored series of another size, both are returned unaligned.
+    """
+    series_a = _series(a, bucket_seconds)
+    if series_a is None:
+        return None
+    series_b = _series(b, series_a["bucket_seconds"])
+    if series_b is None:
+        return None
+    if series_a["bucket_seconds"] != series_b["bucket_seconds"]:
+        return {"aligned": False, "a": series_a, "b": series_b}
+    size = max(len(series_a["t"]), len(series_b["t"]))
+    bucket = series_a["bucket_seconds"]
+
+    def padded(series: Dict) -> Dict[str, List]:
+        missing = [None] * (size - len(series["t"]))
+        return {field: series[field] + missing for field in OVERLAY_FIELDS}
+
+    return {
+        "aligned": True,
+        "bucket_seconds": bucket,
+        "t": np.round(np.arange(size) * bucket, 4).tolist(),
+        "a": padded(series_a),
+        "b": padded(series_b),
+    }
+
+
+# ------------------------------
+# 🔹 Entry points
+# ------------------------------
+def compare_runs(a: str, b: str, bucket_seconds: Optional[float] = None) -> Dict:
+    """Full comparison of run b against run a, cached per run pair"""
+    key = ("distribution", a, b)
+    comparison = comparison_cache.get(key)
+    if comparison is None:
+        distributions = _load_distributions([a, b])
+        comparison = compare_distributions(distributions[a], distributions[b])
+        comparison_cache.put(key, comparison)
+
+    series_key = ("series", a, b, bucket_seconds)
+    overlay = comparison_cache.get(series_key)
+    if overlay is None:
+        overlay = overlay_time_series(a, b, bucket_seconds)
+        if overlay is not None:
+            comparison_cache.put(series_key, overlay)
+    return {"a": a, "b": b, **comparison, "timeseries": overlay}
+
+
+def compare_with_baselines(run_id: str, count: int) -> Dict:
+    """Run `run_id` against each of the last `count` earlier runs of the same url and method.
+
+    Pairs already compared come from the cache; the KS statistics of the
+    rest are computed in one vectorised pass over the stacked histograms.
+    The run is also compared with all of those baselines pooled together.
+    """
+    baseline_ids = previous_run_ids(run_id, min(count, MAX_BASELINES))
+    distributions = _load_distributions([run_id])
+    # Baselines saved before distributions were stored are skipped
+    distributions.update(_load_distributions(baseline_ids, required=False))
+    baseline_ids = [baseline_id for baseline_id in baseline_ids if baseline_id in distributions]
+
+    current = distributions[run_id]
+    pending = [
+        baseline_id for baseline_id in baseline_ids
+        if comparison_cache.get(("distribution", baseline_id, run_id)) is None
+    ]
+    statistics = ks_statistics(
+        current["histogram"], [distributions[baseline_id]["histogram"] for baseline_id in pending]
+    )
+    for baseline_id, statistic in zip(pending, statistics.tolist()):
+        comparison_cache.put(
+            ("distribution", baseline_id, run_id),
+            compare_distributions(distributions[baseline_id], current, statistic),
+        )
+
+    pooled = None
+    if baseline_ids:
+        pooled = {
+            "histogram": LatencyHistogram(current["histogram"].significant_digits),
+            "status_counts": {},
+            "error_counts": {},
+        }
+        for baseline_id in baseline_ids:
+            baseline = distributions[baseline_id]
+            pooled["histogram"].merge(baseline["histogram"])
+            for field in ("status_counts", "error_counts"):
+                for code, value in baseline[field].items():
+                    pooled[field][code] = pooled[field].get(code, 0) + value
+    return {
+        "run_id": run_id,
+        "baselines": [
+            {"run_id": baseline_id, **comparison_cache.get(("distribution", baseline_id, run_id))}
+            for baseline_id in baseline_ids
+        ],
+        "pooled": compare_distributions(pooled, current) if pooled is not None else None,
+    }
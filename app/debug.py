@@ -0,0 +1,42 @@
+# app/debug.py
+
+import logging
+import os
+
+logger = logging.getLogger("loadaudit")
+
+LOG_LEVEL = os.environ.get("LOADAUDIT_LOG_LEVEL", "INFO").upper()
+# Per-request messages: only every Nth one is emitted, even at DEBUG
+LOG_SAMPLE_EVERY = max(1, int(os.environ.get("LOADAUDIT_LOG_SAMPLE", "1000")))
+
+
+def configure_logging(level: str = LOG_LEVEL):
+    """Attach a stderr handler to the ``loadaudit`` logger (idempotent)"""
+    logger.setLevel(level)
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+        logger.addHandler(handler)
+
+
+class SampledLog:
+    """Hot-path logging: one in `every` messages, decided without formatting anything.
+
+    ``enabled`` is resolved once, when a user or schedule starts, so with
+    DEBUG off a request pays for a single attribute check::
+
+        if request_log.enabled:
+            request_log.debug("✅ %s in %.4fs", status, latency)
+    """
+
+    __slots__ = ("enabled", "every", "_seen")
+
+    def __init__(self, every: int = LOG_SAMPLE_EVERY, level: int = logging.DEBUG):
+        self.enabled = logger.isEnabledFor(level)
+        self.every = every
+        self._seen = 0
+
+    def debug(self, message: str, *args):
+        if self._seen % self.every == 0:
+            logger.debug(message + " [1/%d sampled]", *args, self.every)
+        self._seen += 1
@@ -0,0 +1,165 @@
+# app/histogram.py
+
+import math
+from array import array
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+LOWEST_LATENCY = 1e-6  # 1µs — anything faster lands in the first bucket
+HIGHEST_LATENCY = 3600.0  # 1h — anything slower lands in the last bucket
+
+
+class LatencyHistogram:
+    """Mergeable streaming latency histogram with bounded relative error.
+
+    Values are counted in logarithmic buckets whose width grows with the
+    value (HDR-style), so every percentile is reported within
+    ``10 ** -significant_digits`` relative error of a recorded sample.
+    Memory is fixed by the value range and precision, not by the number of
+    samples (~1.1k buckets for 2 significant digits). Mean and standard
+    deviation are tracked exactly with Welford's algorithm, min/max exactly.
+    """
+
+    __slots__ = (
+        "significant_digits", "lowest", "highest", "_gamma", "_log_gamma",
+        "counts", "count", "_mean", "_m2", "min", "max",
+    )
+
+    def __init__(
+        self,
+        significant_digits: int = 2,
+        lowest: float = LOWEST_LATENCY,
+        highest: float = HIGHEST_LATENCY,
+    ):
+        if not 1 <= significant_digits <= 4:
+            raise ValueError("significant_digits must be between 1 and 4")
+        self.significant_digits = significant_digits
+        self.lowest = lowest
+        self.highest = highest
+        accuracy = 10 ** -significant_digits
+        self._gamma = (1 + accuracy) / (1 - accuracy)
+        self._log_gamma = math.log(self._gamma)
+        buckets = int(math.ceil(math.log(highest / lowest) / self._log_gamma)) + 1
+        self.counts = array("q", bytes(8 * buckets))
+        self.count = 0
+        self._mean = 0.0
+        self._m2 = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def _index(self, value: float) -> int:
+        if value <= self.lowest:
+            return 0
+        return min(
+            int(math.ceil(math.log(value / self.lowest) / self._log_gamma)),
+            len(self.counts) - 1,
+        )
+
+    def _value(self, index: int) -> float:
+        """Representative value of a bucket (relative error ≤ the configured precision)"""
+        if index == 0:
+            return self.lowest
+        return self.lowest * 2 * self._gamma ** index / (self._gamma + 1)
+
+    def record(self, value: float):
+        self.counts[self._index(value)] += 1
+        self.count += 1
+        delta = value - self._mean
+        self._mean += delta / self.count
+        self._m2 += delta * (value - self._mean)
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other: "LatencyHistogram") -> "LatencyHistogram":
+        """Fold another histogram with the same layout into this one"""
+        if (other.significant_digits, other.lowest, other.highest) != (
+            self.significant_digits, self.lowest, self.highest
+        ):
+            raise ValueError("Cannot merge histograms with different precision or range")
+        if not other.count:
+            return self
+        merged = np.frombuffer(self.counts, dtype=np.int64)
+        merged += np.frombuffer(other.counts, dtype=np.int64)
+        self._merge_moments(other.count, other._mean, other._m2, other.min, other.max)
+        return self
+
+    def record_many(self, values: np.ndarray):
+        """Vectorised ``record`` for a whole array of latencies"""
+        values = np.asarray(values, dtype=np.float64)
+        if not values.size:
+            return
+        indexes = np.ceil(np.log(np.maximum(values, self.lowest) / self.lowest) / self._log_gamma)
+        indexes = np.clip(indexes, 0, len(self.counts) - 1).astype(np.int64)
+        counts = np.frombuffer(self.counts, dtype=np.int64)
+        counts += np.bincount(indexes, minlength=len(counts))
+        mean = float(values.mean())
+        self._merge_moments(
+            values.size, mean, float(np.square(values - mean).sum()),
+            float(values.min()), float(values.max()),
+        )
+
+    def _merge_moments(self, count: int, mean: float, m2: float, low: float, high: float):
+        """Combine count/mean/M2 of another sample set (Chan et al.)"""
+        total = self.count + count
+        delta = mean - self._mean
+        self._m2 += m2 + delta * delta * self.count * count / total
+        self._mean += delta * count / total
+        self.count = total
+        self.min = min(self.min, low)
+        self.max = max(self.max, high)
+
+    @property
+    def mean(self) -> float:
+        return self._mean if self.count else 0.0
+
+    @property
+    def stddev(self) -> float:
+        """Sample standard deviation (ddof=1), matching statistics.stdev"""
+        return math.sqrt(self._m2 / (self.count - 1)) if self.count > 1 else 0.0
+
+    def percentiles(self, qs: Sequence[float]) -> List[float]:
+        """Nearest-rank percentiles (0-100) for several quantiles in one pass"""
+        if not self.count:
+            return [0.0 for _ in qs]
+        cumulative = np.cumsum(np.frombuffer(self.counts, dtype=np.int64))
+        ranks = [max(1, int(math.ceil(q / 100 * self.count))) for q in qs]
+        indexes = np.searchsorted(cumulative, ranks)
+        return [min(max(self._value(int(i)), self.min), self.max) for i in indexes]
+
+    def percentile(self, q: float) -> float:
+        return self.percentiles([q])[0]
+
+    # ------------------------------
+    # 🔹 Serialisation
+    # ------------------------------
+    def to_dict(self) -> Dict:
+        """Compact form: only non-empty buckets are kept"""
+        counts = np.frombuffer(self.counts, dtype=np.int64)
+        nonzero = np.flatnonzero(counts)
+        return {
+            "significant_digits": self.significant_digits,
+            "lowest": self.lowest,
+            "highest": self.highest,
+            "buckets": nonzero.tolist(),
+            "counts": counts[nonzero].tolist(),
+            "count": self.count,
+            "mean": self._mean,
+            "m2": self._m2,
+            "min": self.min if self.count else None,
+            "max": self.max,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "LatencyHistogram":
+        hist = cls(data["significant_digits"], data["lowest"], data["highest"])
+        for index, count in zip(data["buckets"], data["counts"]):
+            hist.counts[index] = count
+        hist.count = data["count"]
+        hist._mean = data["mean"]
+        hist._m2 = data["m2"]
+        hist.min = data["min"] if data["min"] is not None else math.inf
+        hist.max = data["max"]
+        return hist
@@ -0,0 +1,114 @@
+# app/jobs.py
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional
+
+from app.debug import logger
+
+MAX_CONCURRENT_RUNS = 1  # Concurrent load tests skew each other's numbers
+MAX_QUEUED_RUNS = 20
+MAX_FINISHED_JOBS = 200  # Finished jobs kept in memory for /status and /result
+
+FINISHED_STATES = ("completed", "failed", "cancelled")
+JOB_KINDS = ("load_test", "capacity", "calibration")
+
+
+class QueueFullError(Exception):
+    pass
+
+
+class Job:
+    def __init__(self, run_id: str, runner: Callable[[], Awaitable], kind: str = "load_test"):
+        self.run_id = run_id
+        self.runner = runner
+        self.kind = kind
+        self.status = "queued"
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.result = None
+        self.error: Optional[str] = None
+        self.task: Optional[asyncio.Task] = None
+
+    def to_dict(self) -> Dict:
+        return {
+            "run_id": self.run_id,
+            "kind": self.kind,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+        }
+
+
+class JobManager:
+    """Bounded run queue: jobs start in submission order, at most `max_concurrent` at once"""
+
+    def __init__(self, max_concurrent: int = MAX_CONCURRENT_RUNS, max_queued: int = MAX_QUEUED_RUNS):
+        self.max_queued = max_queued
+        self.jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._slots = asyncio.Semaphore(max_concurrent)
+
+    def submit(self, run_id: str, runner: Callable[[], Awaitable], kind: str = "load_test") -> Job:
+        queued = sum(1 for job in self.jobs.values() if job.status == "queued")
+        if queued >= self.max_queued:
+            raise QueueFullError(f"Run queue is full ({self.max_queued} runs waiting)")
+        job = Job(run_id, runner, kind)
+        self.jobs[run_id] = job
+        job.task = asyncio.create_task(self._run(job))
+        job.task.add_done_callback(lambda _: self._settle(job))
+        self._evict_finished()
+        return job
+
+    def get(self, run_id: str) -> Optional[Job]:
+        return self.jobs.get(run_id)
+
+    def queue_position(self, job: Job) -> int:
+        """1-based position among queued jobs, 0 once the job has left the queue"""
+        if job.status != "queued":
+            return 0
+        queued = [j for j in self.jobs.values() if j.status == "queued"]
+        return queued.index(job) + 1
+
+    def cancel(self, run_id: str) -> bool:
+        """Request cancellation; the job reads "cancelling" until its task has actually stopped"""
+        job = self.jobs.get(run_id)
+        if job is None or job.status in FINISHED_STATES:
+            return False
+        job.task.cancel()
+        job.status = "cancelling"
+        return True
+
+    async def _run(self, job: Job):
+        try:
+            async with self._slots:
+                job.status = "running"
+                job.started_at = time.time()
+                job.result = await job.runner()
+                job.status = "completed"
+        except asyncio.CancelledError:
+            job.status = "cancelled"
+        except Exception as e:
+            logger.exception("❌ Run %s failed: %s", job.run_id, e)
+            job.status = "failed"
+            job.error = str(e)
+        finally:
+            job.finished_at = time.time()
+
+    @staticmethod
+    def _settle(job: Job):
+        # A task cancelled before its first step never enters _run's handlers
+        if job.status not in FINISHED_STATES:
+            job.status = "cancelled"
+            job.finished_at = time.time()
+
+    def _evict_finished(self):
+        finished = [run_id for run_id, job in self.jobs.items() if job.status in FINISHED_STATES]
+        for run_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self.jobs[run_id]
+
+
+job_manager = JobManager()
@@ -0,0 +1,162 @@
+# app/live.py
+
+import asyncio
+import json
+import time
+from typing import AsyncIterator, Dict, List, Optional
+
+from app.histogram import LatencyHistogram
+
+LIVE_WINDOW_SECONDS = 10  # Percentiles are computed over this rolling window
+LIVE_PUBLISH_INTERVAL = 1.0
+
+
+class _Bucket:
+    __slots__ = ("second", "count", "errors", "histogram")
+
+    def __init__(self, second: int):
+        self.second = second
+        self.count = 0
+        self.errors = 0
+        self.histogram = LatencyHistogram()
+
+
+class LiveWindow:
+    """Rolling, time-bucketed view of an in-progress run.
+
+    Virtual users call ``request_started``/``request_finished`` around every
+    request (also when it is cancelled) and ``record`` once it completes;
+    each completed request lands in the bucket for its wall-clock second
+    (a ring of ``window + 1`` buckets, so memory stays constant). A single publisher
+    task turns the window into a snapshot once per second and wakes every
+    subscriber, so the cost of a snapshot does not grow with the number of
+    dashboard viewers.
+    """
+
+    def __init__(self, run_id: str, window: int = LIVE_WINDOW_SECONDS):
+        self.run_id = run_id
+        self.window = window
+        self.started_at = time.time()
+        self.total_requests = 0
+        self.total_errors = 0
+        self.in_flight = 0
+        self.done = False
+        self._version = 0
+        self._buckets: List[Optional[_Bucket]] = [None] * (window + 1)
+        self._changed = asyncio.Condition()
+        self._publisher: Optional[asyncio.Task] = None
+        self.latest: Dict = self.snapshot()
+
+    # ------------------------------
+    # 🔹 Feed (hot path)
+    # ------------------------------
+    def request_started(self):
+        self.in_flight += 1
+
+    def request_finished(self):
+        self.in_flight -= 1
+
+    def record(self, finished_at: float, status: int, latency: float):
+        second = int(finished_at)
+        index = second % len(self._buckets)
+        bucket = self._buckets[index]
+        if bucket is None or bucket.second != second:
+            bucket = self._buckets[index] = _Bucket(second)
+        bucket.count += 1
+        bucket.histogram.record(latency)
+        self.total_requests += 1
+        if not 200 <= status < 300:
+            bucket.errors += 1
+            self.total_errors += 1
+
+    # ------------------------------
+    # 🔹 Snapshots
+    # ------------------------------
+    def snapshot(self) -> Dict:
+        now = int(time.time())
+        last_second = None
+        merged = LatencyHistogram()
+        window_errors = 0
+        for bucket in self._buckets:
+            if bucket is None or not now - self.window <= bucket.second < now:
+                continue
+            merged.merge(bucket.histogram)
+            window_errors += bucket.errors
+            if bucket.second == now - 1:
+                last_second = bucket
+        p50, p95, p99 = merged.percentiles([50, 95, 99])
+        return {
+            "run_id": self.run_id,
+            "status": "finished" if self.done else "running",
+            "elapsed": round(time.time() - self.started_at, 1),
+            "rps": last_second.count if last_second else 0,
+            "errors": self.total_errors,
+            "total_requests": self.total_requests,
+            "in_flight": self.in_flight,
+            "window_seconds": self.window,
+            "window_error_rate": round(window_errors / merged.count, 4) if merged.count else 0,
+            "p50_latency": round(p50, 4),
+            "p95_latency": round(p95, 4),
+            "p99_latency": round(p99, 4),
+        }
+
+    async def _publish(self):
+        while not self.done:
+            await asyncio.sleep(LIVE_PUBLISH_INTERVAL)
+            await self._announce(self.snapshot())
+
+    async def _announce(self, snapshot: Dict):
+        self.latest = snapshot
+        self._version += 1
+        async with self._changed:
+            self._changed.notify_all()
+
+    def start(self):
+        self._publisher = asyncio.create_task(self._publish())
+
+    async def finish(self):
+        self.done = True
+        if self._publisher is not None:
+            self._publisher.cancel()
+        await self._announce(self.snapshot())
+
+    async def subscribe(self) -> AsyncIterator[Dict]:
+        """Yield the latest snapshot, then each new one until the run finishes"""
+        seen = -1
+        while True:
+            if self._version != seen:
+                seen = self._version
+                yield self.latest
+                continue
+            if self.done:
+                return
+            async with self._changed:
+                await self._changed.wait_for(lambda: self._version != seen)
+
+
+class LiveRegistry:
+    """Live windows of the runs currently executing"""
+
+    def __init__(self):
+        self.windows: Dict[str, LiveWindow] = {}
+
+    def open(self, run_id: str) -> LiveWindow:
+        window = LiveWindow(run_id)
+        window.start()
+        self.windows[run_id] = window
+        return window
+
+    async def close(self, run_id: str):
+        window = self.windows.pop(run_id, None)
+        if window is not None:
+            await window.finish()
+
+    def get(self, run_id: str) -> Optional[LiveWindow]:
+        return self.windows.get(run_id)
+
+
+live_registry = LiveRegistry()
+
+
+def sse_event(data: Dict) -> str:
+    return f"data: {json.dumps(data)}\n\n"
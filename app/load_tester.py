@@ -1,69 +1,425 @@
 # app/load_tester.py
 
 import asyncio
-import httpx
+import math
 import time
 import random
-import os
-import json
 import numpy as np
-from typing import List, Dict, Optional
-from datetime import datetime
+from typing import Callable, List, Dict, Optional, Tuple
+from app.debug import SampledLog, logger
+from app.live import LiveWindow
+from app.log_sink import RunLogSink
+from app.responses import DEFAULT_HEAD_BYTES, ResponseReader, encode_payload
+from app.resources import DEFAULT_SAMPLE_INTERVAL, LAG_PROBE_INTERVAL, LoopLagMonitor, ResourceSampler
+from app.results import ResultShard, RunResults, error_code
+from app.runtime import GcWindow
+from app.scenario import CompiledScenario
+from app.stages import StageSegments, peak_users, profile_duration, user_schedule
+from app.timing import RequestTimer
+from app.transports import BufferedResponse, Transport, build_transport
+
+DEFAULT_MAX_IN_FLIGHT = 1000
+RATE_IDLE_STEP = 0.01  # Timeline step while the scheduled rate is zero
+
+
+async def send_request(
+    client: Transport,
+    url: str,
+    method: str = "GET",
+    headers: Optional[Dict] = None,
+    payload: Optional[Dict] = None,
+    chaos_mode: bool = False,
+    timer: Optional[RequestTimer] = None,
+    request_log: Optional[SampledLog] = None,
+    content: Optional[bytes] = None,
+    on_response: Optional[Callable[[BufferedResponse], None]] = None,
+    reader: Optional[ResponseReader] = None
+) -> Tuple[int, Optional[str], int]:
+    """Issue one request; returns (status_code, error, error_code) with status 0 on failure.
+
+    A pre-encoded `content` body is sent as-is instead of `payload`. The
+    response is consumed by `reader` (buffered in full without one);
+    `on_response` sees a fully read response of a request that did not fail.
+    """
+    if chaos_mode and random.random() < 0.1:
+        await asyncio.sleep(random.uniform(0.1, 0.5))
+        if request_log is not None and request_log.enabled:
+            request_log.debug("💥 Chaos mode triggered.")
+        return 500, "ChaosFailure", error_code("ChaosFailure")
+    try:
+        if content is None and payload is not None:
+            headers, content = encode_payload(payload, headers)
+        if timer is not None:
+            timer.start()
+        response = await client.send(method, url, headers, content, timer, reader, full=on_response is not None)
+        if timer is not None:
+            timer.finish()
+        if on_response is not None:
+            on_response(response)
+        return response.status_code, None, 0
+    except Exception as e:
+        if request_log is not None and request_log.enabled:
+            request_log.debug("❌ Request failed: %s", e)
+        return 0, str(e), error_code(type(e).__name__)
 
-LOG_DIR = "logs"
 
 async def simulate_user(
-    client: httpx.AsyncClient,
+    client: Transport,
     url: str,
     duration: int,
     method: str = "GET",
     headers: Optional[Dict] = None,
     payload: Optional[Dict] = None,
     chaos_mode: bool = False,
-    run_id: str = "default"
-) -> List[Dict]:
-    results = []
+    log_sink: Optional[RunLogSink] = None,
+    user_id: int = 0,
+    keep_samples: bool = True,
+    trace_timings: bool = True,
+    live: Optional[LiveWindow] = None,
+    stop: Optional[asyncio.Event] = None,
+    scenario: Optional[CompiledScenario] = None,
+    response_mode: str = "discard",
+    head_bytes: int = DEFAULT_HEAD_BYTES,
+    segments: Optional[StageSegments] = None
+) -> ResultShard:
+    results = ResultShard(user_id, keep_samples, segments=segments)
+    timer = RequestTimer() if trace_timings else None
+    request_log = SampledLog()
+    reader = ResponseReader(results, response_mode, head_bytes)
+    headers, content = encode_payload(payload, headers)
     end_time = time.time() + duration
-    os.makedirs(LOG_DIR, exist_ok=True)
-    log_path = os.path.join(LOG_DIR, f"run_{run_id}.jsonl")
 
-    while time.time() < end_time:
+    if scenario is not None:
+        iteration = 0
+        while time.time() < end_time and not (stop is not None and stop.is_set()):
+            variables = scenario.start_iteration(user_id, iteration)
+            if variables is None:
+                break  # Feeder data exhausted
+            await run_journey(
+                client, scenario, variables, results, timer, request_log,
+                chaos_mode, live, log_sink, deadline=end_time, stop=stop, reader=reader,
+            )
+            iteration += 1
+        logger.debug("👤 User %s finished — %s requests sent", user_id, len(results))
+        return results
+
+    while time.time() < end_time and not (stop is not None and stop.is_set()):
+        # Back-to-back: the next request is due the moment the previous one returns,
+        # so the wake-up delay is caught by the timer as resume_delay, not here
         start = time.time()
-        status_code = 0
-        error = None
 
-        print(f"🔁 Sending request to {url} with method {method}")  # DEBUG
+        if live is not None:
+            live.request_started()
+        try:
+            status_code, error, error_id = await send_request(
+                client, url, method, headers, None, chaos_mode, timer, request_log, content, reader=reader
+            )
+        finally:
+            if live is not None:
+                live.request_finished()
+        latency = time.time() - start
+        if error is None and request_log.enabled:
+            request_log.debug("✅ %s %s → %s in %.4fs", method, url, status_code, latency)
+
+        results.record(start, status_code, latency, error_id)
+        if timer is not None and error is None:
+            results.record_phases(timer.phases(), resume_delay=timer.resume_delay())
+        if live is not None:
+            live.record(start + latency, status_code, latency)
+
+        if log_sink is not None:
+            log_sink.push(start + latency, status_code, latency, error)
+
+    logger.debug("👤 User %s finished — %s requests sent", user_id, len(results))
+    return results
+
+
+async def run_journey(
+    client: Transport,
+    scenario: CompiledScenario,
+    variables: Dict,
+    results: ResultShard,
+    timer: Optional[RequestTimer] = None,
+    request_log: Optional[SampledLog] = None,
+    chaos_mode: bool = False,
+    live: Optional[LiveWindow] = None,
+    log_sink: Optional[RunLogSink] = None,
+    scheduled: Optional[float] = None,
+    deadline: float = math.inf,
+    stop: Optional[asyncio.Event] = None,
+    reader: Optional[ResponseReader] = None
+):
+    """One pass through the scenario's steps, recording each request like simulate_user does.
 
-        if chaos_mode and random.random() < 0.1:
-            await asyncio.sleep(random.uniform(0.1, 0.5))
-            latency = time.time() - start
-            status_code = 500
-            error = "ChaosFailure"
-            print("💥 Chaos mode triggered.")  # DEBUG
+    With `scheduled` (open loop) the first request's latency and dispatch
+    delay are measured from that intended start; the rest of the journey
+    follows from it. No new step starts after `deadline` or once `stop` is set.
+    """
+    for step in scenario.steps:
+        if time.time() >= deadline or (stop is not None and stop.is_set()):
+            return
+        template = step.pick()
+        url, headers, content = template.render(variables)
+        if scheduled is None:
+            start = time.time()
+            dispatch_delay = 0.0
         else:
+            start = scheduled
+            dispatch_delay = max(time.time() - scheduled, 0.0)
+            scheduled = None
+
+        if live is not None:
+            live.request_started()
+        on_response = (lambda response: template.extract(response, variables)) if template.extractors else None
+        try:
+            status_code, error, error_id = await send_request(
+                client, url, template.method, headers, None, chaos_mode, timer, request_log,
+                content, on_response, reader,
+            )
+        finally:
+            if live is not None:
+                live.request_finished()
+        latency = time.time() - start
+        if error is None and request_log is not None and request_log.enabled:
+            request_log.debug("✅ %s → %s in %.4fs", template.name, status_code, latency)
+
+        results.record(start, status_code, latency, error_id)
+        if timer is not None and error is None:
+            results.record_phases(timer.phases(), dispatch_delay, timer.resume_delay())
+        if live is not None:
+            live.record(start + latency, status_code, latency)
+        if log_sink is not None:
+            log_sink.push(start + latency, status_code, latency, error)
+
+        if template.think is not None:
+            pause = min(template.think(), deadline - time.time())
+            if pause > 0:
+                await asyncio.sleep(pause)
+
+
+# ------------------------------
+# 🔹 Open-loop (arrival-rate) mode
+# ------------------------------
+async def run_user_profile(
+    client: Transport,
+    url: str,
+    stages: List[Dict],
+    segments: StageSegments,
+    method: str = "GET",
+    headers: Optional[Dict] = None,
+    payload: Optional[Dict] = None,
+    chaos_mode: bool = False,
+    log_sink: Optional[RunLogSink] = None,
+    keep_samples: bool = True,
+    trace_timings: bool = True,
+    live: Optional[LiveWindow] = None,
+    stop: Optional[asyncio.Event] = None,
+    scenario: Optional[CompiledScenario] = None,
+    response_mode: str = "discard",
+    head_bytes: int = DEFAULT_HEAD_BYTES
+) -> RunResults:
+    """Closed-loop users started and stopped one by one along a stage profile.
+
+    Every start/stop instant is computed up front (see
+    app.stages.user_schedule) and the scheduler sleeps until each one,
+    so users join at the profile's rate instead of all opening
+    connections at once; how late it ever was is kept as the segments'
+    ``schedule_lag``. Stopped users are the most recently started ones;
+    each finishes its request in progress first.
+    """
+    start = time.time()
+    end_time = start + profile_duration(stages)
+    active: List[asyncio.Event] = []
+    tasks = []
+
+    for offset, change in user_schedule(stages):
+        due = start + offset
+        delay = due - time.time()
+        if delay > 0:
+            if stop is None:
+                await asyncio.sleep(delay)
+            else:
+                try:
+                    await asyncio.wait_for(stop.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+        if stop is not None and stop.is_set():
+            break
+        segments.note_schedule_lag(time.time() - due)
+        if change < 0:
+            if active:
+                active.pop().set()
+            continue
+        user_stop = asyncio.Event()
+        active.append(user_stop)
+        tasks.append(asyncio.create_task(simulate_user(
+            client, url, end_time - time.time(), method, headers, payload, chaos_mode,
+            log_sink, len(tasks), keep_samples, trace_timings, live, user_stop, scenario,
+            response_mode, head_bytes, segments,
+        )))
+
+    if stop is not None:
+        remaining = end_time - time.time()
+        if remaining > 0 and not stop.is_set():
             try:
-                response = await client.request(method, url, headers=headers, json=payload)
-                status_code = response.status_code
-                latency = time.time() - start
-                print(f"✅ Response {status_code} in {latency:.4f}s")  # DEBUG
-            except Exception as e:
-                latency = time.time() - start
-                error = str(e)
-                print(f"❌ Request failed: {error}")  # DEBUG
-
-        result = {"status": status_code, "latency": latency}
-        results.append(result)
-
-        with open(log_path, "a") as log_file:
-            log_file.write(json.dumps({
-                "timestamp": datetime.utcnow().isoformat(),
-                "status": status_code,
-                "latency": latency,
-                "error": error
-            }) + "\n")
-
-    print(f"👤 User finished — {len(results)} requests sent\n")  # DEBUG
-    return results
+                await asyncio.wait_for(stop.wait(), remaining)
+            except asyncio.TimeoutError:
+                pass
+        if stop.is_set():
+            for user_stop in active:
+                user_stop.set()
+    logger.debug("📈 Load profile done — %s users started, scheduler at most %.1f ms late",
+                 len(tasks), segments.schedule_lag * 1000)
+    return RunResults(await asyncio.gather(*tasks))
+
+
+def rate_at(elapsed: float, target_rps: float, rps_ramp: Optional[List[Dict]] = None) -> float:
+    """Scheduled request rate at `elapsed` seconds into the run.
+
+    Without a ramp the rate is constant. Each ramp stage moves the rate
+    linearly from the previous stage's target (starting at `target_rps`)
+    to its own `target_rps` over its `duration`; the last target is held.
+    """
+    rate = target_rps
+    for stage in rps_ramp or []:
+        if elapsed < stage["duration"]:
+            return rate + (stage["target_rps"] - rate) * elapsed / stage["duration"]
+        elapsed -= stage["duration"]
+        rate = stage["target_rps"]
+    return rate
+
+
+async def run_arrival_rate(
+    client: Transport,
+    url: str,
+    duration: int,
+    target_rps: float,
+    rps_ramp: Optional[List[Dict]] = None,
+    max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+    method: str = "GET",
+    headers: Optional[Dict] = None,
+    payload: Optional[Dict] = None,
+    chaos_mode: bool = False,
+    log_sink: Optional[RunLogSink] = None,
+    keep_samples: bool = True,
+    trace_timings: bool = True,
+    live: Optional[LiveWindow] = None,
+    stop: Optional[asyncio.Event] = None,
+    scenario: Optional[CompiledScenario] = None,
+    response_mode: str = "discard",
+    head_bytes: int = DEFAULT_HEAD_BYTES
+) -> RunResults:
+    """Issue requests on a fixed timeline, independent of response times.
+
+    Latency is measured from each request's intended send time, so a slow
+    target or a lagging scheduler shows up in the percentiles instead of
+    silently lowering the offered load (coordinated omission). When
+    `max_in_flight` requests are already outstanding at an intended send
+    time, that request is dropped and counted. Setting `stop` ends the
+    schedule early; requests already sent are still awaited.
+
+    The gap between a request's intended time and the moment its task
+    actually starts sending is recorded as its dispatch delay.
+
+    With a `scenario`, each arrival starts a whole journey instead of a
+    single request, and `max_in_flight` bounds the journeys in progress.
+    """
+    results = ResultShard(0, keep_samples)
+    request_log = SampledLog()
+    reader = ResponseReader(results, response_mode, head_bytes)
+    headers, content = encode_payload(payload, headers)
+    pending = set()
+    in_flight = 0
+    dropped = 0
+
+    async def fire_journey(intended: float, variables: Dict):
+        nonlocal in_flight
+        timer = RequestTimer() if trace_timings else None
+        try:
+            await run_journey(
+                client, scenario, variables, results, timer, request_log,
+                chaos_mode, live, log_sink, scheduled=intended, stop=stop, reader=reader,
+            )
+        finally:
+            in_flight -= 1
+
+    async def fire(intended: float):
+        nonlocal in_flight
+        dispatch_delay = max(time.time() - intended, 0.0)
+        timer = RequestTimer() if trace_timings else None
+        if live is not None:
+            live.request_started()
+        try:
+            status_code, error, error_id = await send_request(
+                client, url, method, headers, None, chaos_mode, timer, request_log, content, reader=reader
+            )
+        finally:
+            in_flight -= 1  # Also when cancelled, or a slot would be lost for the rest of the run
+            if live is not None:
+                live.request_finished()
+        latency = time.time() - intended
+        if error is None and request_log.enabled:
+            request_log.debug(
+                "✅ %s %s → %s in %.4fs (dispatched %.4fs late)",
+                method, url, status_code, latency, dispatch_delay,
+            )
+        results.record(intended, status_code, latency, error_id)
+        if timer is not None and error is None:
+            results.record_phases(timer.phases(), dispatch_delay, timer.resume_delay())
+        if live is not None:
+            live.record(intended + latency, status_code, latency)
+        if log_sink is not None:
+            log_sink.push(intended + latency, status_code, latency, error)
+
+    start = time.time()
+    end_time = start + duration
+    next_send = start
+    journeys = 0
+
+    try:
+        while next_send < end_time:
+            if stop is not None and stop.is_set():
+                break
+            delay = next_send - time.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            rate = rate_at(next_send - start, target_rps, rps_ramp)
+            if rate <= 0:
+                next_send += RATE_IDLE_STEP
+                continue
+
+            if in_flight >= max_in_flight:
+                dropped += 1
+            else:
+                if scenario is not None:
+                    variables = scenario.start_iteration(journeys, journeys)
+                    if variables is None:
+                        break  # Feeder data exhausted
+                    journeys += 1
+                    coroutine = fire_journey(next_send, variables)
+                else:
+                    coroutine = fire(next_send)
+                in_flight += 1
+                task = asyncio.create_task(coroutine)
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+            next_send += 1 / rate
+
+        if pending:
+            await asyncio.gather(*pending)
+    except asyncio.CancelledError:
+        # Cancelled mid-schedule (job cancel, capacity step timeout): stop the requests already
+        # fired as well, rather than leave them running unowned, and let their cleanup finish
+        fired = list(pending)
+        for task in fired:
+            task.cancel()
+        await asyncio.gather(*fired, return_exceptions=True)
+        raise
+
+    run_results = RunResults([results])
+    run_results.dropped_requests = dropped
+    return run_results
 
 
 async def run_load_test(
@@ -74,19 +430,85 @@ async def run_load_test(
     headers: Optional[Dict] = None,
     payload: Optional[Dict] = None,
     chaos_mode: bool = False,
-    run_id: str = "default"
-) -> List[Dict]:
-    print(f"\n🚀 Starting load test: {num_users} users | {duration}s | {method} {url}\n")  # DEBUG
-    async with httpx.AsyncClient(timeout=10) as client:
-        tasks = [
-            simulate_user(client, url, duration, method, headers, payload, chaos_mode, run_id)
-            for _ in range(num_users)
-        ]
-        all_results = await asyncio.gather(*tasks)
-        flat_results = [item for sublist in all_results for item in sublist]
+    run_id: str = "default",
+    keep_samples: bool = True,
+    target_rps: Optional[float] = None,
+    rps_ramp: Optional[List[Dict]] = None,
+    max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+    client_options: Optional[Dict] = None,
+    trace_timings: bool = True,
+    live: Optional[LiveWindow] = None,
+    resource_interval: Optional[float] = DEFAULT_SAMPLE_INTERVAL,
+    lag_interval: Optional[float] = LAG_PROBE_INTERVAL,
+    scenario: Optional[Dict] = None,
+    feeder_shard: Tuple[int, int] = (0, 1),
+    stop: Optional[asyncio.Event] = None,
+    response_mode: str = "discard",
+    response_head_bytes: int = DEFAULT_HEAD_BYTES,
+    stages: Optional[List[Dict]] = None,
+    gc_mode: str = "freeze"
+) -> RunResults:
+    """Closed loop (`num_users` back-to-back users) or, when `target_rps` is set, open loop.
 
-        print(f"📊 Test Complete — Requests: {len(flat_results)}")  # DEBUG
+    Closed-loop `stages` (see app.models.LoadStage) replace `num_users`
+    and `duration` with a profile of users ramped up, held and ramped down,
+    and add per-stage statistics to the results.
 
-        return flat_results
+    A `scenario` (see app.models.Scenario) is compiled once here, before
+    any load starts, and replaces the single `method`/`payload` request.
 
+    `gc_mode` sets the garbage collector for the run (see app.runtime.GcWindow);
+    the closing collection happens after the results are complete.
+    """
+    if stages and target_rps is not None:
+        raise ValueError("stages shape closed-loop users; use rps_ramp with target_rps")
+    compiled = CompiledScenario(scenario, url, headers, feeder_shard) if scenario else None
+    target = f"{len(compiled.steps)}-step scenario @ {url}" if compiled else f"{method} {url}"
+    if target_rps is not None:
+        logger.info("🚀 Starting load test: %s req/s | %ss | %s", target_rps, duration, target)
+    elif stages:
+        logger.info(
+            "🚀 Starting load test: %s stages up to %s users | %ss | %s",
+            len(stages), peak_users(stages), profile_duration(stages), target,
+        )
+    else:
+        logger.info("🚀 Starting load test: %s users | %ss | %s", num_users, duration, target)
+    async with GcWindow(gc_mode), RunLogSink(run_id) as log_sink, \
+            build_transport(**(client_options or {})) as client, \
+            ResourceSampler(resource_interval, source=run_id, gc_mode=gc_mode) as sampler, \
+            LoopLagMonitor(lag_interval) as lag_monitor:
+        started_at = time.time()
+        if target_rps is not None:
+            results = await run_arrival_rate(
+                client, url, duration, target_rps, rps_ramp, max_in_flight,
+                method, headers, payload, chaos_mode, log_sink, keep_samples, trace_timings, live,
+                stop=stop, scenario=compiled, response_mode=response_mode, head_bytes=response_head_bytes,
+            )
+        elif stages:
+            segments = StageSegments.for_profile(stages, started_at)
+            results = await run_user_profile(
+                client, url, stages, segments, method, headers, payload, chaos_mode,
+                log_sink, keep_samples, trace_timings, live, stop, compiled,
+                response_mode, response_head_bytes,
+            )
+            results.stages = segments
+        else:
+            tasks = [
+                simulate_user(
+                    client, url, duration, method, headers, payload, chaos_mode,
+                    log_sink, user_id, keep_samples, trace_timings, live, stop, compiled,
+                    response_mode, response_head_bytes,
+                )
+                for user_id in range(num_users)
+            ]
+            results = RunResults(await asyncio.gather(*tasks))
+        results.started_at = started_at
+        results.ended_at = time.time()
+
+    if sampler.interval:
+        results.resource_timelines.append(sampler.timeline())
+    if lag_monitor.interval:
+        results.loop_lag = lag_monitor.histogram
+    logger.info("📊 Test complete — %s requests", len(results))
 
+    return results
@@ -0,0 +1,104 @@
+# app/log_sink.py
+
+import asyncio
+import json
+import os
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+
+LOG_DIR = "logs"
+LOG_BATCH_SIZE = 2000  # Records per write once the buffer fills up
+LOG_FLUSH_INTERVAL = 0.5  # Seconds between background flushes
+
+
+class RunLogSink:
+    """Shared per-run JSONL request log, written in batches off the hot path.
+
+    Virtual users call ``push`` (a plain list append, no I/O). A background
+    task swaps the buffer out and writes it in one go, optionally through a
+    worker thread so formatting and disk I/O never block the event loop.
+    """
+
+    def __init__(
+        self,
+        run_id: str,
+        log_dir: str = LOG_DIR,
+        batch_size: int = LOG_BATCH_SIZE,
+        flush_interval: float = LOG_FLUSH_INTERVAL,
+        use_thread: bool = True,
+    ):
+        self.path = os.path.join(log_dir, f"run_{run_id}.jsonl")
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.use_thread = use_thread
+        self.records_written = 0
+        self._buffer: List[Tuple] = []
+        self._file = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._closed = False
+
+    def push(self, timestamp: float, status: int, latency: float, error: Optional[str]):
+        """Queue one request record (epoch timestamp, formatted at write time)"""
+        self._buffer.append((timestamp, status, latency, error))
+        if len(self._buffer) >= self.batch_size and self._wakeup is not None:
+            self._wakeup.set()
+
+    async def start(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._file = open(self.path, "a")
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._drain_loop())
+
+    async def close(self):
+        """Stop the drain task and flush everything still buffered"""
+        if self._closed:
+            return
+        self._closed = True
+        if self._task is not None:
+            self._wakeup.set()
+            await self._task
+        await self._flush()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def _drain_loop(self):
+        while not self._closed:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self._flush()
+
+    async def _flush(self):
+        if not self._buffer or self._file is None:
+            return
+        batch, self._buffer = self._buffer, []
+        if self.use_thread:
+            await asyncio.to_thread(self._write_batch, batch)
+        else:
+            self._write_batch(batch)
+
+    def _write_batch(self, batch: List[Tuple]):
+        lines = []
+        for timestamp, status, latency, error in batch:
+            lines.append(json.dumps({
+                "timestamp": datetime.fromtimestamp(timestamp, tz=timezone.utc)
+                .replace(tzinfo=None)
+                .isoformat(),
+                "status": status,
+                "latency": latency,
+                "error": error,
+            }))
+        self._file.write("\n".join(lines) + "\n")
+        self._file.flush()
+        self.records_written += len(batch)
@@ -1,19 +1,44 @@
-from fastapi import FastAPI, HTTPException, Request
-from fastapi.responses import HTMLResponse
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import HTMLResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware  # ← ADD THIS
-from app.load_tester import run_load_test
-from typing import List, Dict
+from typing import List, Dict, Optional
 from app.persistence import (
     generate_run_id,
-    save_run_summary,
     read_run_summaries,
+    get_run_summary,
+    get_run_timeseries,
+    get_run_resources,
     export_run_csv,
-    compare_with_previous,
+    export_single_run_csv,
+)
+from app.baselines import get_baseline
+from app.debug import configure_logging
+from app.jobs import job_manager, QueueFullError, FINISHED_STATES
+from app.live import live_registry, sse_event, LIVE_PUBLISH_INTERVAL
+from app.runner import execute_run
+from app.cluster import POLL_TIMEOUT, SNAPSHOT_INTERVAL, agent_registry
+from app.capacity import SEARCH_MODES, find_capacity
+from app.compare import MAX_BASELINES, compare_runs, compare_with_baselines
+from app.metrics import DEFAULT_BUCKET_SECONDS
+from app.samples import load_meta, analyze_stored_run, stored_time_series
+from app.responses import RESPONSE_MODES
+from app.scenario import CompiledScenario
+from app.transports import available_transports
+from app.runtime import EVENT_LOOPS, GC_MODES, describe_runtime, uvloop_available
+from app.system_limits import router as system_router
+from app.models import (
+    AgentRegistration,
+    AgentSnapshot,
+    CapacityResult,
+    CapacitySearchRequest,
+    LoadTestRequest,
+    LoadTestResponse,
+    RunStatus,
+    RunSummary,
 )
-from app.metrics import analyze_results
-from app.models import LoadTestRequest, LoadTestResponse, RunSummary
 import asyncio
 
+configure_logging()
 app = FastAPI(title="LoadAudit", version="0.1.0")
 
 app.add_middleware(
@@ -23,70 +48,288 @@ app.add_middleware(
     allow_methods=["*"],  # Allows all methods  
     allow_headers=["*"],  # Allows all headers
 )
+app.include_router(system_router)
 
 # --- API ROUTES ---
 
 
-@app.post("/start", response_model=LoadTestResponse)
+@app.post("/start", response_model=RunStatus, status_code=202)
 async def start_load_test(config: LoadTestRequest):
-    try:
-        run_id = generate_run_id()
-        print(f"\n🚀 Load Test Config:\n{config.dict()}")  # DEBUG
-
-        # 1. Run the load test
-        raw_metrics = await run_load_test(
-            url=config.target_url,
-            num_users=config.num_users,
-            duration=config.duration,
-            method=config.method,
-            headers=config.headers,
-            payload=config.payload,
-            chaos_mode=config.chaos_mode,
-            run_id=run_id,
+    """Queue a load test and return its run_id immediately"""
+    if config.stages and config.target_rps is not None:
+        raise HTTPException(status_code=422, detail="stages shape closed-loop users; use rps_ramp with target_rps")
+    if any(stage.duration < 0 or stage.target_users < 0 for stage in config.stages):
+        raise HTTPException(status_code=422, detail="Stage durations and target_users must not be negative")
+    if config.connection.transport not in available_transports():
+        raise HTTPException(
+            status_code=422, detail=f"connection.transport must be one of {available_transports()} here"
         )
-
-        print(f"\n📥 Raw Results Sample:\n{raw_metrics[:2]}")  # DEBUG
-
-        # 2. Analyze metrics
-        metrics = analyze_results(raw_metrics)
-        regressions = compare_with_previous(metrics)
-        metrics["diagnosis"].extend(regressions)
-        print(f"\n📊 Analyzed Metrics:\n{metrics}")  # DEBUG
-
-        # 3. Save summary
-        save_run_summary(
-            run_id=run_id,
-            url=config.target_url,
-            users=config.num_users,
-            duration=config.duration,
-            metrics=metrics,
+    if config.connection.pipeline > 1 and config.connection.transport != "raw":
+        raise HTTPException(status_code=422, detail="Pipelining needs the raw transport")
+    if config.connection.http2 and config.connection.transport != "httpx":
+        raise HTTPException(status_code=422, detail="HTTP/2 needs the httpx transport")
+    if config.runtime.event_loop not in EVENT_LOOPS:
+        raise HTTPException(status_code=422, detail=f"runtime.event_loop must be one of {EVENT_LOOPS}")
+    if config.runtime.event_loop == "uvloop" and not uvloop_available():
+        raise HTTPException(status_code=422, detail="runtime.event_loop 'uvloop' needs the uvloop package")
+    if config.runtime.gc_mode not in GC_MODES:
+        raise HTTPException(status_code=422, detail=f"runtime.gc_mode must be one of {GC_MODES}")
+    if config.response_mode not in RESPONSE_MODES:
+        raise HTTPException(status_code=422, detail=f"response_mode must be one of {RESPONSE_MODES}")
+    if config.scenario is not None:
+        shards = config.agents if config.agents > 0 else max(config.workers, 1)
+        try:
+            # Fail fast on bad templates, extractors, feeder paths or empty feeders; the last
+            # shard gets the fewest rows, so if it has any, every worker or agent does
+            CompiledScenario(config.scenario.dict(), config.target_url, config.headers, (shards - 1, shards))
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+    if config.agents > len(agent_registry.available()):
+        raise HTTPException(
+            status_code=422,
+            detail=f"{config.agents} agents requested, {len(agent_registry.available())} available",
         )
+    run_id = generate_run_id()
+    try:
+        job = job_manager.submit(run_id, lambda: execute_run(config, run_id))
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    return RunStatus(**job.to_dict(), queue_position=job_manager.queue_position(job))
+
+
+@app.post("/capacity", response_model=RunStatus, status_code=202)
+async def start_capacity_search(config: CapacitySearchRequest):
+    """Queue a breaking-point search; poll /runs/{run_id}/status, then GET /capacity/{run_id}"""
+    if config.mode not in SEARCH_MODES:
+        raise HTTPException(status_code=422, detail=f"mode must be one of {list(SEARCH_MODES)}")
+    run_id = generate_run_id()
+    options = config.dict(exclude={"target_url", "connection"})
+    try:
+        job = job_manager.submit(run_id, lambda: find_capacity(
+            config.target_url, **options, client_options=config.connection.dict()
+        ), kind="capacity")
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    return RunStatus(**job.to_dict(), queue_position=job_manager.queue_position(job))
 
-        # 4. Return full response
-        response = LoadTestResponse(
-            avg_latency=metrics["avg_latency"],
-            max_latency=metrics["max_latency"],
-            p95_latency=metrics["p95_latency"],
-            p99_latency=metrics["p99_latency"],
-            latency_stddev=metrics["std_dev_latency"],
-            error_rate=metrics["error_rate"],
-            throughput=metrics["throughput"],
-            total_requests=metrics["total_requests"],
-            health_score=metrics["health_score"],
-            diagnosis=metrics["diagnosis"],
+
+# Where the result of each kind of queued job is read
+JOB_RESULT_PATHS = {
+    "load_test": "/runs/{run_id}/result",
+    "capacity": "/capacity/{run_id}",
+    "calibration": "/system/calibration",
+}
+
+
+def _job_result(run_id: str, kind: str):
+    """The result of a completed job of `kind`, or the HTTP error explaining why there is none"""
+    job = job_manager.get(run_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Run not found")
+    if job.kind != kind:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Run {run_id} is a {job.kind} job; read its result at "
+                   f"{JOB_RESULT_PATHS[job.kind].format(run_id=run_id)}",
         )
+    if job.status == "failed":
+        raise HTTPException(status_code=500, detail=job.error)
+    if job.status != "completed":
+        raise HTTPException(status_code=409, detail=f"Run is {job.status}")
+    return job.result
 
-        print(f"\n✅ Final Response:\n{response.dict()}")  # DEBUG
-        return response
 
-    except Exception as e:
-        print(f"❌ Exception in /start: {e}")  # DEBUG
-        raise HTTPException(status_code=500, detail=str(e))
+@app.get("/capacity/{run_id}", response_model=CapacityResult)
+def get_capacity_result(run_id: str):
+    return _job_result(run_id, "capacity")
+
+
+@app.get("/runs/{run_id}/status", response_model=RunStatus)
+def get_run_status(run_id: str):
+    job = job_manager.get(run_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Run not found")
+    return RunStatus(**job.to_dict(), queue_position=job_manager.queue_position(job))
+
+
+@app.get("/runs/{run_id}/result", response_model=LoadTestResponse)
+def get_run_result(run_id: str):
+    return _job_result(run_id, "load_test")
+
+
+@app.get("/runs/{run_id}/live")
+async def stream_live_metrics(run_id: str):
+    """Server-sent events: one metrics snapshot per second while the run executes"""
+    if job_manager.get(run_id) is None:
+        raise HTTPException(status_code=404, detail="Run not found")
+
+    async def events():
+        job = job_manager.get(run_id)
+        # Queued: report status until the run starts
+        while live_registry.get(run_id) is None and job.status not in FINISHED_STATES:
+            yield sse_event({"run_id": run_id, "status": job.status})
+            await asyncio.sleep(LIVE_PUBLISH_INTERVAL)
+        window = live_registry.get(run_id)
+        if window is None:
+            # Finished before we subscribed, or a multi-process run without a live window
+            yield sse_event({"run_id": run_id, "status": job.status})
+            return
+        async for snapshot in window.subscribe():
+            yield sse_event(snapshot)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/runs/{run_id}/analyze")
+def analyze_run(
+    run_id: str,
+    start: Optional[float] = Query(None, ge=0),
+    end: Optional[float] = Query(None, ge=0),
+    bucket: float = Query(DEFAULT_BUCKET_SECONDS, gt=0),
+):
+    """Recompute metrics over a stored run's raw samples, or a [start, end) slice in seconds"""
+    if load_meta(run_id) is None:
+        raise HTTPException(status_code=404, detail="No stored samples for this run")
+    if start is not None and end is not None and end <= start:
+        raise HTTPException(status_code=422, detail="end must be greater than start")
+    metrics = analyze_stored_run(run_id, start, end, bucket)
+    return {"run_id": run_id, "start": start, "end": end, **metrics}
+
+
+@app.get("/runs/{run_id}/timeseries")
+def get_run_time_series(run_id: str, bucket: Optional[float] = Query(None, gt=0)):
+    """Per-bucket RPS, error rate and p50/p95/p99; other bucket sizes are recomputed from stored samples"""
+    stored = get_run_timeseries(run_id)
+    if stored is not None and (bucket is None or bucket == stored["bucket_seconds"]):
+        return stored
+    if load_meta(run_id) is None:
+        raise HTTPException(status_code=404, detail="No time series for this run")
+    return stored_time_series(run_id, bucket_seconds=bucket or DEFAULT_BUCKET_SECONDS)
+
+
+@app.get("/compare")
+def compare(
+    a: str,
+    b: Optional[str] = None,
+    baselines: int = Query(0, ge=0, le=MAX_BASELINES),
+    bucket: Optional[float] = Query(None, gt=0),
+):
+    """Diff run b against run a from their stored histograms, or run a against its last `baselines` runs"""
+    if (b is None) == (baselines == 0):
+        raise HTTPException(status_code=422, detail="Pass either b or baselines")
+    try:
+        if b is not None:
+            return compare_runs(a, b, bucket)
+        return compare_with_baselines(a, baselines)
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+
+@app.get("/runs/{run_id}/resources")
+def get_run_resource_timeline(run_id: str):
+    """Load generator CPU / RSS / FDs / loop lag / GC pauses sampled during the run"""
+    timelines = get_run_resources(run_id)
+    if timelines is None:
+        raise HTTPException(status_code=404, detail="No resource timeline for this run")
+    return timelines
+
+
+@app.post("/runs/{run_id}/cancel", response_model=RunStatus, status_code=202)
+def cancel_run(run_id: str):
+    """Ask a queued or running job to stop; poll /runs/{run_id}/status for the outcome"""
+    job = job_manager.get(run_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Run not found")
+    if not job_manager.cancel(run_id):
+        raise HTTPException(status_code=409, detail=f"Run is already {job.status}")
+    return RunStatus(**job.to_dict(), queue_position=0)
+
+
+@app.get("/runs/{run_id}/agents")
+def get_run_agents(run_id: str):
+    """Per-agent progress (requests so far, last snapshot) of a distributed run in progress"""
+    progress = agent_registry.progress(run_id)
+    if progress is None:
+        raise HTTPException(status_code=404, detail="No distributed run in progress with this id")
+    return progress
+
+
+@app.get("/runtime")
+async def get_runtime():
+    """Event loop and garbage-collector state of the API process"""
+    return describe_runtime()
+
+
+@app.post("/agents/register")
+def register_agent(registration: AgentRegistration):
+    agent = agent_registry.register(registration.name)
+    return {
+        "agent_id": agent.agent_id,
+        "poll_timeout": POLL_TIMEOUT,
+        "snapshot_interval": SNAPSHOT_INTERVAL,
+    }
+
+
+@app.get("/agents")
+def list_agents():
+    return [agent.to_dict() for agent in agent_registry.agents.values()]
+
+
+@app.get("/agents/{agent_id}/assignment")
+async def poll_agent_assignment(
+    agent_id: str,
+    now: Optional[float] = None,
+    timeout: float = Query(POLL_TIMEOUT, ge=0, le=POLL_TIMEOUT),
+):
+    """Long-poll: the agent's next shard (start_at in the agent's clock), or 204 after `timeout`"""
+    agent = agent_registry.get(agent_id)
+    if agent is None:
+        raise HTTPException(status_code=404, detail="Unknown agent; register again")
+    assignment = await agent_registry.poll(agent, now, timeout)
+    if assignment is None:
+        return Response(status_code=204)
+    return assignment
+
+
+@app.post("/agents/{agent_id}/snapshot")
+def post_agent_snapshot(agent_id: str, snapshot: AgentSnapshot):
+    agent = agent_registry.get(agent_id)
+    if agent is None:
+        raise HTTPException(status_code=404, detail="Unknown agent; register again")
+    stop = agent_registry.submit_snapshot(
+        agent, snapshot.run_id, snapshot.partial, snapshot.final, snapshot.error
+    )
+    return {"stop": stop}
 
 
 @app.get("/runs", response_model=List[RunSummary])
-def get_all_runs():
-    return read_run_summaries()
+def get_all_runs(
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+    url: Optional[str] = None,
+    since: Optional[float] = None,
+    until: Optional[float] = None,
+    newest_first: bool = False,
+):
+    """Run summaries; filter by url / unix-time range and page with limit + offset"""
+    return read_run_summaries(
+        limit=limit, offset=offset, url=url, since=since, until=until, newest_first=newest_first
+    )
+
+
+@app.get("/baselines")
+def get_run_baseline(url: str, load_level: str, method: str = "GET"):
+    """Rolling per-(url, method, load level) statistics used for regression checks"""
+    baseline = get_baseline(url, method, load_level)
+    if baseline is None:
+        raise HTTPException(status_code=404, detail="No baseline for this key yet")
+    return baseline
 
 
 @app.get("/export")
@@ -98,74 +341,20 @@ def export_csv():
 def export_single_run(run_id: str):
     """Export a specific run as CSV"""
     try:
-        # Read all runs
-        runs = read_run_summaries()
-
-        # Find the specific run
-        target_run = None
-        for run in runs:
-            if run["run_id"] == run_id:
-                target_run = run
-                break
-
+        target_run = get_run_summary(run_id)
         if not target_run:
             raise HTTPException(status_code=404, detail="Run not found")
 
-        # Create CSV content for single run
-        import io
-        import csv
-
-        output = io.StringIO()
-        writer = csv.writer(output)
-
-        # Write header
-        writer.writerow(
-            [
-                "run_id",
-                "url",
-                "users",
-                "duration",
-                "avg_latency",
-                "max_latency",
-                "p95_latency",
-                "p99_latency",
-                "latency_stddev",
-                "error_rate",
-                "throughput",
-                "total_requests",
-                "health_score",
-            ]
-        )
-
-        # Write single run data
-        writer.writerow(
-            [
-                target_run["run_id"],
-                target_run["url"],
-                target_run["users"],
-                target_run["duration"],
-                target_run["avg_latency"],
-                target_run["max_latency"],
-                target_run["p95_latency"],
-                target_run["p99_latency"],
-                target_run["latency_stddev"],
-                target_run["error_rate"],
-                target_run["throughput"],
-                target_run["total_requests"],
-                target_run["health_score"],
-            ]
-        )
-
         # Return as downloadable file
-        from fastapi.responses import Response
-
         return Response(
-            content=output.getvalue(),
+            content=export_single_run_csv(target_run),
             media_type="text/csv",
             headers={
                 "Content-Disposition": f"attachment; filename=loadaudit_run_{run_id}.csv"
             },
         )
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
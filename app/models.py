@@ -1,5 +1,78 @@
 from pydantic import BaseModel
-from typing import List, Dict
+from typing import Any, List, Dict, Optional
+
+
+class RateStage(BaseModel):
+    duration: int
+    target_rps: float
+
+
+class LoadStage(BaseModel):
+    # Users move linearly from the previous stage's target (0 at the start) to target_users
+    duration: float
+    target_users: int
+    name: Optional[str] = None
+
+
+class ConnectionOptions(BaseModel):
+    max_connections: int = 100
+    max_keepalive_connections: int = 20
+    keepalive_expiry: float = 5.0
+    http2: bool = False
+    connect_timeout: float = 10.0
+    read_timeout: float = 10.0
+    pool_timeout: float = 10.0
+    reuse_connections: bool = True
+    # "httpx" (default), "raw" (lean asyncio HTTP/1.1) or "aiohttp" (if installed)
+    transport: str = "httpx"
+    # Requests written ahead on one connection before earlier responses arrive (raw transport only)
+    pipeline: int = 1
+
+
+class RuntimeOptions(BaseModel):
+    # Event loop of worker processes: "auto" (uvloop if installed), "uvloop" or "asyncio";
+    # in-process runs use the API's own loop (uvicorn picks uvloop when it is installed)
+    event_loop: str = "auto"
+    # Garbage collector during the run: "default", "freeze", "tune" (rarer collections) or "pause"
+    gc_mode: str = "freeze"
+
+
+class ThinkTime(BaseModel):
+    # constant: always `mean`; uniform: between `min` and `max`; exponential: mean `mean`
+    distribution: str = "constant"
+    mean: float = 0.0
+    min: float = 0.0
+    max: float = 0.0
+
+
+class RequestTemplate(BaseModel):
+    name: Optional[str] = None
+    method: str = "GET"
+    # Relative to target_url unless absolute; path, headers and payload may use ${variable}
+    path: str = ""
+    headers: Dict[str, str] = {}
+    payload: Optional[Any] = None
+    # variable → "json:data.token" | "header:X-Id" | "regex:id=(\d+)" | "status"
+    extract: Dict[str, str] = {}
+    weight: float = 1.0
+    think_time: Optional[ThinkTime] = None
+
+
+class ScenarioStep(BaseModel):
+    # Several requests: one is picked per iteration, by weight
+    requests: List[RequestTemplate]
+
+
+class FeederConfig(BaseModel):
+    path: str  # Under data/feeders
+    format: Optional[str] = None  # csv | jsonl (default: from the extension)
+    cycle: bool = True
+
+
+class Scenario(BaseModel):
+    steps: List[ScenarioStep]
+    feeders: List[FeederConfig] = []
+    think_time: Optional[ThinkTime] = None  # Default pause after each request
 
 
 class LoadTestRequest(BaseModel):
@@ -10,20 +83,130 @@ class LoadTestRequest(BaseModel):
     headers: Dict[str, str] = {}
     payload: Dict = {}
     chaos_mode: bool = False
+    # Open-loop mode: issue requests at a fixed rate instead of per-user loops
+    target_rps: Optional[float] = None
+    rps_ramp: List[RateStage] = []
+    max_in_flight: int = 1000
+    # Closed-loop load profile (ramp / hold / spike / ramp-down); replaces num_users and duration
+    stages: List[LoadStage] = []
+    # Worker processes to spread the load over (1 = run in the API process)
+    workers: int = 1
+    # Registered remote agents to shard the run over instead (0 = generate load here)
+    agents: int = 0
+    # Client pool / keep-alive / timeout settings, and per-phase request timing
+    connection: ConnectionOptions = ConnectionOptions()
+    trace_timings: bool = True
+    # Event loop and garbage-collector settings of the generating processes
+    runtime: RuntimeOptions = RuntimeOptions()
+    # Seconds between samples of the generator's own CPU / memory / loop lag (None disables)
+    resource_sample_interval: Optional[float] = 1.0
+    # Multi-step user journey; replaces method/payload, with target_url as the base URL
+    scenario: Optional[Scenario] = None
+    # Response bodies: "discard" (drain unread), "head" (first response_head_bytes only) or "full" (read and hash)
+    response_mode: str = "discard"
+    response_head_bytes: int = 1024
 
 
 class LoadTestResponse(BaseModel):
     avg_latency: float
     max_latency: float
+    p50_latency: float = 0
+    p90_latency: float = 0
     p95_latency: float
     p99_latency: float
+    p999_latency: float = 0
     latency_stddev: float
     error_rate: float
     throughput: float
+    # Response bytes received on the wire, and the same as MB/s over the run
+    bytes_received: int = 0
+    throughput_mb_s: float = 0
+    body_hashes: Dict[str, int] = {}
     total_requests: int
+    dropped_requests: int = 0
+    # Agents whose share is their last snapshot only (no error types or bytes received)
+    incomplete_partials: int = 0
+    # Requests per status class, and count/share (plus latency, with raw samples) per status code / error type
+    status_classes: Dict[str, int] = {}
+    status_breakdown: Dict[str, Dict[str, float]] = {}
+    error_breakdown: Dict[str, Dict[str, float]] = {}
+    timing_breakdown: Dict[str, float] = {}
+    generator_bound: bool = False
+    client_overhead: Dict[str, float] = {}
+    # Per-stage metrics of a staged run (requests counted in the stage they started in)
+    stages: List[Dict[str, Any]] = []
     health_score: int
     diagnosis: List[str]
 
+
+class CapacitySearchRequest(BaseModel):
+    target_url: str
+    mode: str = "users"  # users | rps — what the search varies
+    method: str = "GET"
+    headers: Dict[str, str] = {}
+    payload: Dict = {}
+    # Exponential ramp from start_load, then bisection down to `resolution` of the breaking load
+    start_load: float = 10
+    max_load: float = 1000
+    growth: float = 2.0
+    resolution: float = 0.1
+    # SLO a step must meet to count as sustainable
+    max_p99_latency: float = 1.0
+    max_error_rate: float = 0.01
+    # Per-step timing: ignored warm-up, earliest confident stop, hard limit
+    warmup: float = 2.0
+    min_step_duration: float = 5.0
+    max_step_duration: float = 30.0
+    max_steps: int = 20
+    max_in_flight: int = 1000
+    connection: ConnectionOptions = ConnectionOptions()
+
+
+class CapacityStep(BaseModel):
+    load: float
+    passed: bool
+    confident: bool
+    ended_early: bool
+    duration: float
+    requests: int
+    throughput: float
+    dropped_requests: int = 0
+    abandoned_requests: int = 0
+    error_rate: float
+    error_rate_ci: List[float]
+    p99_latency: float
+    p99_latency_ci: List[float]
+
+
+class CapacityResult(BaseModel):
+    mode: str
+    max_sustainable_load: float
+    breaking_load: Optional[float] = None
+    confidence_interval: List[float]
+    capped: bool  # True when max_load was reached without an SLO violation
+    slo: Dict[str, float]
+    steps: List[CapacityStep]
+    total_duration: float
+
+
+class RunStatus(BaseModel):
+    """A queued job's state at the time of the response.
+
+    Jobs move on in the background: poll GET /runs/{run_id}/status until
+    status is completed, failed or cancelled. A cancel answers 202 with
+    status "cancelling", since the run stops (and cleans up) asynchronously.
+    """
+
+    run_id: str
+    kind: str = "load_test"  # load_test | capacity | calibration
+    status: str  # queued | running | cancelling | completed | failed | cancelled
+    queue_position: int = 0
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    error: Optional[str] = None
+
+
 class RunSummary(BaseModel):
     run_id: str
     url: str
@@ -38,3 +221,15 @@ class RunSummary(BaseModel):
     throughput: float
     total_requests: int
     health_score: int
+
+
+class AgentRegistration(BaseModel):
+    name: str
+
+
+class AgentSnapshot(BaseModel):
+    run_id: str
+    # Cumulative RunResults.to_partial()-style histogram and counters
+    partial: Optional[Dict] = None
+    final: bool = False
+    error: Optional[str] = None
@@ -1,9 +1,76 @@
 import csv
+import io
+import json
 import os
+import sqlite3
+import threading
+import time
 import uuid
-from fastapi.responses import FileResponse
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+from fastapi.responses import StreamingResponse
 
-RESULTS_CSV = "data/results.csv"  # Store in data/ folder
+from app.debug import logger
+
+DATA_DIR = "data"
+DB_PATH = os.path.join(DATA_DIR, "loadaudit.db")  # SQLite run store (WAL mode)
+RESULTS_CSV = os.path.join(DATA_DIR, "results.csv")  # Legacy store, migrated once
+
+SUMMARY_COLUMNS = [
+    "run_id", "url", "users", "duration",
+    "avg_latency", "max_latency", "p95_latency", "p99_latency",
+    "latency_stddev", "error_rate", "throughput",
+    "total_requests", "health_score"
+]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id TEXT NOT NULL UNIQUE,
+    url TEXT NOT NULL,
+    method TEXT NOT NULL DEFAULT 'GET',
+    users INTEGER NOT NULL,
+    duration INTEGER NOT NULL,
+    avg_latency REAL NOT NULL,
+    max_latency REAL NOT NULL,
+    p95_latency REAL NOT NULL,
+    p99_latency REAL NOT NULL,
+    latency_stddev REAL NOT NULL,
+    error_rate REAL NOT NULL,
+    throughput REAL NOT NULL,
+    total_requests INTEGER NOT NULL,
+    health_score INTEGER NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_runs_url ON runs (url, created_at);
+CREATE INDEX IF NOT EXISTS idx_runs_created_at ON runs (created_at);
+CREATE TABLE IF NOT EXISTS baselines (
+    url TEXT NOT NULL,
+    method TEXT NOT NULL,
+    load_level TEXT NOT NULL,
+    state TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (url, method, load_level)
+);
+CREATE TABLE IF NOT EXISTS timeseries (
+    run_id TEXT PRIMARY KEY,
+    bucket_seconds REAL NOT NULL,
+    series TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS resources (
+    run_id TEXT PRIMARY KEY,
+    timelines TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS distributions (
+    run_id TEXT PRIMARY KEY,
+    histogram TEXT NOT NULL,
+    status_counts TEXT NOT NULL,
+    error_counts TEXT NOT NULL
+);
+"""
+
+_init_lock = threading.Lock()
+_initialized = False
 
 # ------------------------------
 # 🔹 Generate Unique Run ID
@@ -12,106 +79,242 @@ def generate_run_id():
     return str(uuid.uuid4())[:8]
 
 # ------------------------------
-# 🔹 Save Run Summary to CSV
+# 🔹 Database Connection
 # ------------------------------
-def save_run_summary(run_id, url, users, duration, metrics):
-    os.makedirs("data", exist_ok=True)
-    file_exists = os.path.exists(RESULTS_CSV)
-
-    with open(RESULTS_CSV, "a", newline="") as f:
-        writer = csv.writer(f)
-        if not file_exists:
-            writer.writerow([
-                "run_id", "url", "users", "duration",
-                "avg_latency", "max_latency", "p95_latency", "p99_latency",
-                "latency_stddev", "error_rate", "throughput",
-                "total_requests", "health_score"
-            ])
-        writer.writerow([
-            run_id, url, users, duration,
-            metrics["avg_latency"], metrics["max_latency"],
-            metrics["p95_latency"], metrics["p99_latency"],
-            metrics["std_dev_latency"], metrics["error_rate"],
-            metrics["throughput"], metrics["total_requests"],
-            metrics["health_score"]
-        ])
+@contextmanager
+def connect_db() -> Iterator[sqlite3.Connection]:
+    """Short-lived connection; WAL lets readers proceed while a run is being saved"""
+    _ensure_db()
+    # Streaming exports resume the same cursor from different threadpool threads
+    conn = sqlite3.connect(DB_PATH, timeout=30, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    try:
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+
+def _ensure_db():
+    global _initialized
+    if _initialized:
+        return
+    with _init_lock:
+        if _initialized:
+            return
+        os.makedirs(DATA_DIR, exist_ok=True)
+        conn = sqlite3.connect(DB_PATH, timeout=30)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            _migrate_csv(conn)
+            conn.commit()
+        finally:
+            conn.close()
+        _initialized = True
+
+
+def _migrate_csv(conn: sqlite3.Connection):
+    """Import the legacy results.csv once, then rename it out of the way"""
+    if not os.path.exists(RESULTS_CSV):
+        return
+    # The CSV has no timestamps; keep file order and stamp rows with its mtime
+    created_at = os.path.getmtime(RESULTS_CSV)
+    with open(RESULTS_CSV, "r") as f:
+        rows = [
+            (*(row[column] for column in SUMMARY_COLUMNS), created_at)
+            for row in csv.DictReader(f)
+        ]
+    conn.executemany(
+        f"INSERT OR IGNORE INTO runs ({', '.join(SUMMARY_COLUMNS)}, created_at) "
+        f"VALUES ({', '.join('?' * (len(SUMMARY_COLUMNS) + 1))})",
+        rows,
+    )
+    os.replace(RESULTS_CSV, RESULTS_CSV + ".migrated")
+    logger.info("📦 Migrated %s runs from %s into %s", len(rows), RESULTS_CSV, DB_PATH)
+
+
+def _row_to_summary(row: sqlite3.Row) -> Dict:
+    return {column: row[column] for column in SUMMARY_COLUMNS}
 
 # ------------------------------
-# 🔹 Load All Run Summaries
+# 🔹 Save Run Summary
 # ------------------------------
-def read_run_summaries():
-    if not os.path.exists(RESULTS_CSV):
-        return []
+def save_run_summary(run_id, url, users, duration, metrics, method="GET"):
+    with connect_db() as conn:
+        conn.execute(
+            """
+            INSERT INTO runs (
+                run_id, url, method, users, duration,
+                avg_latency, max_latency, p95_latency, p99_latency,
+                latency_stddev, error_rate, throughput,
+                total_requests, health_score, created_at
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (
+                run_id, url, method, users, duration,
+                metrics["avg_latency"], metrics["max_latency"],
+                metrics["p95_latency"], metrics["p99_latency"],
+                metrics["std_dev_latency"], metrics["error_rate"],
+                metrics["throughput"], metrics["total_requests"],
+                metrics["health_score"], time.time(),
+            ),
+        )
 
-    with open(RESULTS_CSV, "r") as f:
-        reader = csv.DictReader(f)
-        summaries = []
-        for row in reader:
-            summaries.append({
-                "run_id": row["run_id"],
-                "url": row["url"],
-                "users": int(row["users"]),
-                "duration": int(row["duration"]),
-                "avg_latency": float(row["avg_latency"]),
-                "max_latency": float(row["max_latency"]),
-                "p95_latency": float(row["p95_latency"]),
-                "p99_latency": float(row["p99_latency"]),
-                "latency_stddev": float(row["latency_stddev"]),
-                "error_rate": float(row["error_rate"]),
-                "throughput": float(row["throughput"]),
-                "total_requests": int(row["total_requests"]),
-                "health_score": int(row["health_score"]),
-            })
-        return summaries
 
+def save_run_timeseries(run_id: str, series: Dict):
+    """Store the per-bucket series computed by analyze_results alongside the run"""
+    with connect_db() as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO timeseries (run_id, bucket_seconds, series) VALUES (?, ?, ?)",
+            (run_id, series["bucket_seconds"], json.dumps(series)),
+        )
+
+
+def get_run_timeseries(run_id: str) -> Optional[Dict]:
+    with connect_db() as conn:
+        row = conn.execute("SELECT series FROM timeseries WHERE run_id = ?", (run_id,)).fetchone()
+    return json.loads(row["series"]) if row is not None else None
+
+
+def save_run_resources(run_id: str, timelines: List[Dict]):
+    """Store the load generator's resource timelines (one per generating process)"""
+    with connect_db() as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO resources (run_id, timelines) VALUES (?, ?)",
+            (run_id, json.dumps(timelines)),
+        )
+
+
+def get_run_resources(run_id: str) -> Optional[List[Dict]]:
+    with connect_db() as conn:
+        row = conn.execute("SELECT timelines FROM resources WHERE run_id = ?", (run_id,)).fetchone()
+    return json.loads(row["timelines"]) if row is not None else None
+
+def save_run_distribution(run_id: str, histogram: Dict, status_counts: Dict[int, int], error_counts: Dict[int, int]):
+    """Store a run's latency histogram (LatencyHistogram.to_dict form) and status / error counters"""
+    with connect_db() as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO distributions (run_id, histogram, status_counts, error_counts) VALUES (?, ?, ?, ?)",
+            (run_id, json.dumps(histogram), json.dumps(status_counts), json.dumps(error_counts)),
+        )
+
+
+def get_run_distributions(run_ids: List[str]) -> Dict[str, Dict]:
+    """Stored distributions of several runs in one query; runs without one are left out"""
+    if not run_ids:
+        return {}
+    with connect_db() as conn:
+        rows = conn.execute(
+            f"SELECT run_id, histogram, status_counts, error_counts FROM distributions "
+            f"WHERE run_id IN ({', '.join('?' * len(run_ids))})",
+            list(run_ids),
+        ).fetchall()
+    return {
+        row["run_id"]: {
+            "histogram": json.loads(row["histogram"]),
+            # JSON object keys are strings; the counters are keyed by int code
+            "status_counts": {int(code): count for code, count in json.loads(row["status_counts"]).items()},
+            "error_counts": {int(code): count for code, count in json.loads(row["error_counts"]).items()},
+        }
+        for row in rows
+    }
+
+
+def previous_run_ids(run_id: str, limit: int) -> List[str]:
+    """Up to `limit` runs saved before `run_id` against the same url and method, newest first"""
+    with connect_db() as conn:
+        rows = conn.execute(
+            """
+            SELECT previous.run_id FROM runs AS current
+            JOIN runs AS previous
+              ON previous.url = current.url AND previous.method = current.method AND previous.seq < current.seq
+            WHERE current.run_id = ?
+            ORDER BY previous.seq DESC
+            LIMIT ?
+            """,
+            (run_id, limit),
+        ).fetchall()
+    return [row["run_id"] for row in rows]
+
+# ------------------------------
+# 🔹 Load Run Summaries
 # ------------------------------
-# 🔹 Export CSV File
+def read_run_summaries(
+    limit: Optional[int] = None,
+    offset: int = 0,
+    url: Optional[str] = None,
+    since: Optional[float] = None,
+    until: Optional[float] = None,
+    newest_first: bool = False,
+) -> List[Dict]:
+    """Run summaries in save order, optionally filtered by url / time range and paginated"""
+    clauses, params = [], []
+    if url is not None:
+        clauses.append("url = ?")
+        params.append(url)
+    if since is not None:
+        clauses.append("created_at >= ?")
+        params.append(since)
+    if until is not None:
+        clauses.append("created_at < ?")
+        params.append(until)
+
+    query = f"SELECT {', '.join(SUMMARY_COLUMNS)} FROM runs"
+    if clauses:
+        query += " WHERE " + " AND ".join(clauses)
+    query += f" ORDER BY seq {'DESC' if newest_first else 'ASC'}"
+    if limit is not None or offset:
+        query += " LIMIT ? OFFSET ?"
+        params += [limit if limit is not None else -1, offset]
+
+    with connect_db() as conn:
+        return [_row_to_summary(row) for row in conn.execute(query, params)]
+
+
+def get_run_summary(run_id: str) -> Optional[Dict]:
+    """Single run by id (indexed lookup)"""
+    with connect_db() as conn:
+        row = conn.execute(
+            f"SELECT {', '.join(SUMMARY_COLUMNS)} FROM runs WHERE run_id = ?", (run_id,)
+        ).fetchone()
+    return _row_to_summary(row) if row is not None else None
+
 # ------------------------------
+# 🔹 Export CSV
+# ------------------------------
+def _csv_line(values) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(values)
+    return buffer.getvalue()
+
+
+def _stream_runs_csv() -> Iterator[str]:
+    yield _csv_line(SUMMARY_COLUMNS)
+    with connect_db() as conn:
+        cursor = conn.execute(f"SELECT {', '.join(SUMMARY_COLUMNS)} FROM runs ORDER BY seq")
+        while True:
+            rows = cursor.fetchmany(500)
+            if not rows:
+                break
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerows(tuple(row) for row in rows)
+            yield buffer.getvalue()
+
+
 def export_run_csv():
-    if not os.path.exists(RESULTS_CSV):
+    with connect_db() as conn:
+        has_runs = conn.execute("SELECT 1 FROM runs LIMIT 1").fetchone() is not None
+    if not has_runs:
         return {"error": "No data to export."}
-    return FileResponse(
-        path=RESULTS_CSV,
-        filename="load_test_results.csv",
-        media_type="text/csv"
+    return StreamingResponse(
+        _stream_runs_csv(),
+        media_type="text/csv",
+        headers={"Content-Disposition": "attachment; filename=load_test_results.csv"},
     )
 
-# ------------------------------
-# 🔹 Compare with Previous Run
-# ------------------------------
-def compare_with_previous(current_metrics):
-    if not os.path.exists(RESULTS_CSV):
-        return []
 
-    with open(RESULTS_CSV, "r") as f:
-        rows = list(csv.DictReader(f))
-        if len(rows) < 1:
-            return []
-
-        previous = rows[-1]
-
-        regression_msgs = []
-
-        def percent_change(new, old):
-            return ((new - old) / old) * 100 if old != 0 else 0
-
-        # Convert values
-        prev_p95 = float(previous["p95_latency"])
-        prev_p99 = float(previous["p99_latency"])
-        prev_throughput = float(previous["throughput"])
-        prev_error_rate = float(previous["error_rate"])
-        prev_health = int(previous["health_score"])
-
-        # Regression detection
-        if percent_change(current_metrics["p95_latency"], prev_p95) > 50:
-            regression_msgs.append("⚠️ p95 latency has worsened significantly.")
-        if percent_change(current_metrics["p99_latency"], prev_p99) > 50:
-            regression_msgs.append("⚠️ p99 latency has worsened significantly.")
-        if percent_change(prev_throughput, current_metrics["throughput"]) > 30:
-            regression_msgs.append("⚠️ Throughput has dropped noticeably.")
-        if current_metrics["error_rate"] > prev_error_rate:
-            regression_msgs.append("⚠️ Error rate increased.")
-        if current_metrics["health_score"] < prev_health - 10:
-            regression_msgs.append("⚠️ Health score has dropped by more than 10 points.")
-
-        return regression_msgs
+def export_single_run_csv(run: Dict) -> str:
+    return _csv_line(SUMMARY_COLUMNS) + _csv_line([run[column] for column in SUMMARY_COLUMNS])
@@ -0,0 +1,208 @@
+# app/resources.py
+
+import asyncio
+import gc
+import os
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+import psutil
+
+from app.histogram import LatencyHistogram
+from app.runtime import running_loop_name
+
+DEFAULT_SAMPLE_INTERVAL = 1.0  # Seconds between resource samples during a run
+CPU_SATURATION_PERCENT = 90.0  # Of one core — an event loop cannot use more
+SATURATED_SHARE = 0.5  # Fraction of samples at saturation that makes a run generator-bound
+LOOP_LAG_LIMIT_MS = 50.0  # p95 event-loop lag beyond which timings include client-side queueing
+LAG_PROBE_INTERVAL = 0.01  # Seconds between event-loop lag probes
+
+
+class ResourceSampler:
+    """Background timeline of the load generator's own resource use.
+
+    Every `interval` seconds a task on the run's event loop records the
+    process CPU (percent of one core, from CPU-time deltas), RSS, open file
+    descriptors, how late the task itself woke up (event-loop lag), and
+    the garbage-collector pauses seen since the previous sample. Each
+    sample is a handful of non-blocking /proc reads; GC pauses are timed
+    from ``gc.callbacks``. With ``interval=None`` the sampler is a no-op.
+    The timeline also names the event loop and the run's GC mode.
+    """
+
+    def __init__(
+        self, interval: Optional[float] = DEFAULT_SAMPLE_INTERVAL, source: str = "main", gc_mode: str = "default"
+    ):
+        self.interval = interval
+        self.source = source
+        self.gc_mode = gc_mode
+        self.process = psutil.Process()
+        self.started_at = 0.0
+        self.samples: Dict[str, List[float]] = {
+            "t": [], "cpu_percent": [], "rss_mb": [], "open_fds": [],
+            "loop_lag_ms": [], "gc_pause_ms": [], "gc_collections": [],
+        }
+        self._gc_started: Optional[float] = None
+        self._gc_pause = 0.0
+        self._gc_max_pause = 0.0
+        self._gc_collections = 0
+        self._task: Optional[asyncio.Task] = None
+
+    # ------------------------------
+    # 🔹 Lifecycle
+    # ------------------------------
+    def start(self) -> "ResourceSampler":
+        if not self.interval or self._task is not None:
+            return self
+        self.started_at = time.time()
+        self.process.cpu_percent(None)  # Prime the CPU-time baseline
+        gc.callbacks.append(self._on_gc)
+        self._task = asyncio.create_task(self._sample_loop())
+        return self
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        gc.callbacks.remove(self._on_gc)
+        last = self.samples["t"][-1] if self.samples["t"] else 0.0
+        if time.time() - self.started_at - last >= self.interval / 2:
+            self._sample(0.0)  # Close the timeline with the tail since the last tick
+
+    async def __aenter__(self) -> "ResourceSampler":
+        return self.start()
+
+    async def __aexit__(self, *exc_info):
+        await self.stop()
+
+    # ------------------------------
+    # 🔹 Sampling
+    # ------------------------------
+    def _on_gc(self, phase: str, info: Dict):
+        if phase == "start":
+            self._gc_started = time.perf_counter()
+        elif self._gc_started is not None:
+            pause = time.perf_counter() - self._gc_started
+            self._gc_started = None
+            self._gc_pause += pause
+            self._gc_collections += 1
+            self._gc_max_pause = max(self._gc_max_pause, pause)
+
+    async def _sample_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self._sample(max(loop.time() - expected, 0.0))
+
+    def _sample(self, lag: float):
+        with self.process.oneshot():
+            cpu = self.process.cpu_percent(None)
+            rss = self.process.memory_info().rss
+            fds = self.process.num_fds() if hasattr(self.process, "num_fds") else self.process.num_handles()
+        samples = self.samples
+        samples["t"].append(round(time.time() - self.started_at, 3))
+        samples["cpu_percent"].append(round(cpu, 1))
+        samples["rss_mb"].append(round(rss / 1024 ** 2, 1))
+        samples["open_fds"].append(fds)
+        samples["loop_lag_ms"].append(round(lag * 1000, 3))
+        samples["gc_pause_ms"].append(round(self._gc_pause * 1000, 3))
+        samples["gc_collections"].append(self._gc_collections)
+        self._gc_pause = 0.0
+        self._gc_collections = 0
+
+    # ------------------------------
+    # 🔹 Results
+    # ------------------------------
+    def timeline(self) -> Optional[Dict]:
+        """Columnar samples plus a summary, or None when sampling was disabled"""
+        if not self.interval:
+            return None
+        return {
+            "source": self.source,
+            "pid": os.getpid(),
+            "interval": self.interval,
+            "started_at": self.started_at,
+            "event_loop": running_loop_name(),
+            "gc_mode": self.gc_mode,
+            **self.samples,
+            "summary": summarize_timeline(self.samples, self._gc_max_pause),
+        }
+
+
+class LoopLagMonitor:
+    """Fine-grained event-loop lag: a task that sleeps `interval` and records how late it wakes.
+
+    Unlike the once-per-sample lag in ResourceSampler, every probe goes
+    into a histogram, so short stalls (a GC pass, a slow callback) show up
+    in the percentiles. With ``interval=None`` the monitor is a no-op.
+    """
+
+    def __init__(self, interval: Optional[float] = LAG_PROBE_INTERVAL):
+        self.interval = interval
+        self.histogram = LatencyHistogram()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> "LoopLagMonitor":
+        if self.interval and self._task is None:
+            self._task = asyncio.create_task(self._probe_loop())
+        return self
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+    async def __aenter__(self) -> "LoopLagMonitor":
+        return self.start()
+
+    async def __aexit__(self, *exc_info):
+        await self.stop()
+
+    async def _probe_loop(self):
+        loop = asyncio.get_running_loop()
+        histogram = self.histogram
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            histogram.record(max(loop.time() - expected, 0.0))
+
+
+def summarize_timeline(samples: Dict[str, List[float]], gc_max_pause: float = 0.0) -> Dict:
+    cpu = np.asarray(samples["cpu_percent"], dtype=np.float64)
+    lag = np.asarray(samples["loop_lag_ms"], dtype=np.float64)
+    if not cpu.size:
+        return {"samples": 0}
+    return {
+        "samples": int(cpu.size),
+        "cpu_mean_percent": round(float(cpu.mean()), 1),
+        "cpu_peak_percent": round(float(cpu.max()), 1),
+        "cpu_saturated_share": round(float((cpu >= CPU_SATURATION_PERCENT).mean()), 3),
+        "rss_peak_mb": max(samples["rss_mb"]),
+        "open_fds_peak": max(samples["open_fds"]),
+        "loop_lag_p95_ms": round(float(np.percentile(lag, 95)), 3),
+        "loop_lag_max_ms": round(float(lag.max()), 3),
+        "gc_pause_total_ms": round(sum(samples["gc_pause_ms"]), 3),
+        "gc_pause_max_ms": round(gc_max_pause * 1000, 3),
+        "gc_collections": int(sum(samples["gc_collections"])),
+    }
+
+
+def generator_bound(timeline: Dict) -> bool:
+    """Whether the generating process saturated its core or its event loop during the run"""
+    summary = timeline.get("summary", {})
+    if not summary.get("samples"):
+        return False
+    return (
+        summary["cpu_saturated_share"] >= SATURATED_SHARE
+        or summary["loop_lag_p95_ms"] >= LOOP_LAG_LIMIT_MS
+    )
@@ -0,0 +1,65 @@
+# app/responses.py
+
+import hashlib
+import json
+from typing import Dict, Optional, Tuple
+
+import httpx
+
+RESPONSE_MODES = ("discard", "head", "full")
+DEFAULT_HEAD_BYTES = 1024
+
+
+def encode_payload(payload: Optional[Dict], headers: Optional[Dict]) -> Tuple[Optional[Dict], Optional[bytes]]:
+    """Serialise a JSON payload once, for reuse as the raw body of every request"""
+    if payload is None:
+        return headers, None
+    headers = dict(headers or {})
+    if not any(name.lower() == "content-type" for name in headers):
+        headers["Content-Type"] = "application/json"
+    return headers, json.dumps(payload, separators=(",", ":")).encode()
+
+
+class ResponseReader:
+    """How one user (or schedule) consumes response bodies, counting what it receives.
+
+    discard — drain the raw stream chunk by chunk without keeping it, so
+              the connection goes back to the pool and nothing is buffered
+    head    — read only the first `head_bytes`, then close; the connection
+              cannot be reused, so this trades connection churn for bytes
+    full    — buffer the whole body and record a short hash of it
+
+    Bytes are counted as received on the wire (before decompression) and
+    added to the shard, along with the body hashes in ``full`` mode.
+    """
+
+    __slots__ = ("mode", "head_bytes", "results")
+
+    def __init__(self, results, mode: str = "discard", head_bytes: int = DEFAULT_HEAD_BYTES):
+        if mode not in RESPONSE_MODES:
+            raise ValueError(f"response mode must be one of {RESPONSE_MODES}")
+        self.results = results
+        self.mode = mode
+        self.head_bytes = head_bytes
+
+    def record(self, size: int, body: Optional[bytes] = None):
+        """Count `size` bytes received; a `body` read in full is hashed too"""
+        digest = hashlib.blake2b(body, digest_size=8).hexdigest() if body is not None else None
+        self.results.record_body(size, digest)
+
+    async def consume(self, response: httpx.Response, full: bool = False):
+        """Read an httpx `response` according to the mode (`full` forces a buffered read, e.g. for extraction)"""
+        if full or self.mode == "full":
+            body = await response.aread()
+            self.record(response.num_bytes_downloaded, body)
+            return
+        if self.mode == "head":
+            received = 0
+            async for chunk in response.aiter_raw():
+                received += len(chunk)
+                if received >= self.head_bytes:
+                    break
+        else:
+            async for _ in response.aiter_raw():
+                pass
+        self.record(response.num_bytes_downloaded)
@@ -0,0 +1,336 @@
+# app/results.py
+
+from array import array
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from app.histogram import LatencyHistogram
+from app.stages import StageSegments
+from app.timing import OVERHEADS, PHASES
+
+# Compact error classification stored per sample (uint8); 0 means no client-side error
+ERROR_TYPES = [
+    "", "ChaosFailure", "ConnectTimeout", "ReadTimeout", "WriteTimeout", "PoolTimeout",
+    "ConnectError", "ReadError", "WriteError", "RemoteProtocolError", "Other",
+]
+_ERROR_CODES = {name: code for code, name in enumerate(ERROR_TYPES)}
+MAX_BODY_HASHES = 64  # Distinct response-body hashes tracked per shard; the rest count as "other"
+
+
+def error_code(error_type: Optional[str]) -> int:
+    """uint8 code for an exception class name (see ERROR_TYPES)"""
+    if not error_type:
+        return 0
+    return _ERROR_CODES.get(error_type, _ERROR_CODES["Other"])
+
+
+class ResultShard:
+    """Columnar samples recorded by a single virtual user.
+
+    Each user owns its shard, so appends need no locking. Columns are
+    compact ``array`` buffers (8 bytes per latency/timestamp, 2 per status)
+    instead of one dict per request, plus a 1-byte error code. Every sample
+    also goes into a fixed-size latency histogram and per-status counters,
+    which is all the summary metrics need; with ``keep_samples=False`` the
+    raw columns are skipped and the shard stays O(1) in size.
+
+    Traced requests also add their client-side overhead — scheduling
+    delay before the send, pool wait, and the wake-up delay after the
+    response — to ``overhead_totals`` and ``overhead_histogram``. Response
+    bytes received, and body hashes when bodies are read in full, are
+    counted by ``record_body`` (see app.responses). In a staged run every
+    sample is also passed on to the run's shared per-stage ``segments``.
+    """
+
+    __slots__ = (
+        "user_id", "keep_samples", "latencies", "statuses", "timestamps", "errors",
+        "histogram", "status_counts", "error_counts", "phase_totals", "timed_requests",
+        "overhead_totals", "overhead_histogram", "bytes_received", "body_hashes", "segments",
+    )
+
+    def __init__(
+        self, user_id: int = 0, keep_samples: bool = True, significant_digits: int = 2,
+        segments: Optional[StageSegments] = None,
+    ):
+        self.user_id = user_id
+        self.keep_samples = keep_samples
+        self.latencies = array("d")
+        self.statuses = array("H")
+        self.timestamps = array("d")
+        self.errors = array("B")
+        self.histogram = LatencyHistogram(significant_digits)
+        self.status_counts: Dict[int, int] = {}
+        self.error_counts: Dict[int, int] = {}
+        self.phase_totals = array("d", [0.0] * len(PHASES))
+        self.timed_requests = 0
+        self.overhead_totals = array("d", [0.0] * len(OVERHEADS))
+        self.overhead_histogram = LatencyHistogram(significant_digits)
+        self.bytes_received = 0
+        self.body_hashes: Dict[str, int] = {}
+        self.segments = segments
+
+    def record(self, timestamp: float, status: int, latency: float, error: int = 0):
+        if self.keep_samples:
+            self.timestamps.append(timestamp)
+            self.statuses.append(status)
+            self.latencies.append(latency)
+            self.errors.append(error)
+        self.histogram.record(latency)
+        self.status_counts[status] = self.status_counts.get(status, 0) + 1
+        if error:
+            self.error_counts[error] = self.error_counts.get(error, 0) + 1
+        if self.segments is not None:
+            self.segments.record(timestamp, status, latency, error)
+
+    def record_phases(
+        self, phases: Optional[Sequence[float]], dispatch_delay: float = 0.0, resume_delay: float = 0.0
+    ):
+        """Add one request's pool-wait/connect/TLS/TTFB/body-read split and its client overhead (see app.timing)"""
+        if phases is None:
+            return
+        totals = self.phase_totals
+        for i, value in enumerate(phases):
+            totals[i] += value
+        self.timed_requests += 1
+        self.overhead_totals[0] += dispatch_delay
+        self.overhead_totals[1] += resume_delay
+        self.overhead_histogram.record(dispatch_delay + phases[0] + resume_delay)
+
+    def record_body(self, size: int, digest: Optional[str] = None):
+        self.bytes_received += size
+        if digest is not None:
+            hashes = self.body_hashes
+            if digest not in hashes and len(hashes) >= MAX_BODY_HASHES:
+                digest = "other"
+            hashes[digest] = hashes.get(digest, 0) + 1
+
+    def __len__(self) -> int:
+        return self.histogram.count
+
+
+class RunResults:
+    """All shards of one run.
+
+    Shards are kept as-is; each column is exposed as a NumPy array built
+    from zero-copy views over the shard buffers, so the only copy is the
+    single concatenation done when a column is first needed.
+    """
+
+    def __init__(self, shards: Iterable[ResultShard] = ()):
+        self.shards: List[ResultShard] = list(shards)
+        self.dropped_requests = 0  # Open-loop sends skipped at the in-flight limit
+        self.incomplete_partials = 0  # Merged snapshots lacking error types and bytes (agents that died)
+        # Wall-clock window the load was generated in (set by run_load_test)
+        self.started_at: Optional[float] = None
+        self.ended_at: Optional[float] = None
+        # One resource timeline per generating process (see app.resources)
+        self.resource_timelines: List[Dict] = []
+        # Event-loop lag probes of the generating process(es) (see app.resources.LoopLagMonitor)
+        self.loop_lag: Optional[LatencyHistogram] = None
+        # Per-stage statistics of a staged run (see app.stages), shared by its shards
+        self.stages: Optional[StageSegments] = None
+        self._columns: Dict[str, np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return sum(len(shard) for shard in self.shards)
+
+    @property
+    def histogram(self) -> LatencyHistogram:
+        """Latency histogram merged across all shards"""
+        merged = LatencyHistogram(self.shards[0].histogram.significant_digits if self.shards else 2)
+        for shard in self.shards:
+            merged.merge(shard.histogram)
+        return merged
+
+    @property
+    def elapsed(self) -> float:
+        """Wall-clock seconds of the run, falling back to the span of the samples"""
+        if self.started_at is not None and self.ended_at is not None:
+            return max(self.ended_at - self.started_at, 0.0)
+        timestamps = self.timestamps
+        if not timestamps.size:
+            return 0.0
+        return float((timestamps + self.latencies).max() - timestamps.min())
+
+    @property
+    def status_counts(self) -> Dict[int, int]:
+        merged: Dict[int, int] = {}
+        for shard in self.shards:
+            for status, count in shard.status_counts.items():
+                merged[status] = merged.get(status, 0) + count
+        return merged
+
+    @property
+    def error_counts(self) -> Dict[int, int]:
+        merged: Dict[int, int] = {}
+        for shard in self.shards:
+            for code, count in shard.error_counts.items():
+                merged[code] = merged.get(code, 0) + count
+        return merged
+
+    @property
+    def timed_requests(self) -> int:
+        return sum(shard.timed_requests for shard in self.shards)
+
+    @property
+    def phase_totals(self) -> Dict[str, float]:
+        totals = [0.0] * len(PHASES)
+        for shard in self.shards:
+            for i, value in enumerate(shard.phase_totals):
+                totals[i] += value
+        return dict(zip(PHASES, totals))
+
+    @property
+    def bytes_received(self) -> int:
+        return sum(shard.bytes_received for shard in self.shards)
+
+    @property
+    def body_hashes(self) -> Dict[str, int]:
+        merged: Dict[str, int] = {}
+        for shard in self.shards:
+            for digest, count in shard.body_hashes.items():
+                merged[digest] = merged.get(digest, 0) + count
+        return merged
+
+    @property
+    def overhead_totals(self) -> Dict[str, float]:
+        totals = [0.0] * len(OVERHEADS)
+        for shard in self.shards:
+            for i, value in enumerate(shard.overhead_totals):
+                totals[i] += value
+        return dict(zip(OVERHEADS, totals))
+
+    @property
+    def overhead_histogram(self) -> LatencyHistogram:
+        """Per-request client overhead merged across all shards"""
+        merged = LatencyHistogram(self.shards[0].histogram.significant_digits if self.shards else 2)
+        for shard in self.shards:
+            merged.merge(shard.overhead_histogram)
+        return merged
+
+    def _column(self, name: str, dtype) -> np.ndarray:
+        if name not in self._columns:
+            views = [
+                np.frombuffer(getattr(shard, name), dtype=dtype)
+                for shard in self.shards if len(getattr(shard, name))
+            ]
+            self._columns[name] = np.concatenate(views) if views else np.empty(0, dtype=dtype)
+        return self._columns[name]
+
+    @property
+    def latencies(self) -> np.ndarray:
+        return self._column("latencies", np.float64)
+
+    @property
+    def statuses(self) -> np.ndarray:
+        return self._column("statuses", np.uint16)
+
+    @property
+    def timestamps(self) -> np.ndarray:
+        return self._column("timestamps", np.float64)
+
+    @property
+    def errors(self) -> np.ndarray:
+        return self._column("errors", np.uint8)
+
+    @property
+    def user_ids(self) -> np.ndarray:
+        """Per-sample user id, derived from shard lengths rather than stored"""
+        if "user_ids" not in self._columns:
+            self._columns["user_ids"] = np.repeat(
+                np.array([shard.user_id for shard in self.shards], dtype=np.uint32),
+                [len(shard.latencies) for shard in self.shards],
+            )
+        return self._columns["user_ids"]
+
+    # ------------------------------
+    # 🔹 Compact partials (worker → coordinator)
+    # ------------------------------
+    def to_partial(self) -> Dict:
+        """Histogram and counters only — what a worker ships back instead of samples"""
+        return {
+            "histogram": self.histogram.to_dict(),
+            "status_counts": self.status_counts,
+            "error_counts": self.error_counts,
+            "dropped_requests": self.dropped_requests,
+            "started_at": self.started_at,
+            "ended_at": self.ended_at,
+            "resource_timelines": self.resource_timelines,
+            "phase_totals": self.phase_totals,
+            "timed_requests": self.timed_requests,
+            "overhead_totals": self.overhead_totals,
+            "overhead_histogram": self.overhead_histogram.to_dict(),
+            "loop_lag": self.loop_lag.to_dict() if self.loop_lag is not None else None,
+            "bytes_received": self.bytes_received,
+            "body_hashes": self.body_hashes,
+            "stages": self.stages.to_dict() if self.stages is not None else None,
+        }
+
+    @classmethod
+    def from_partials(cls, partials: Iterable[Dict]) -> "RunResults":
+        shards = []
+        dropped = 0
+        incomplete = 0
+        starts, ends = [], []
+        timelines = []
+        loop_lag = None
+        stages = None
+        for user_id, partial in enumerate(partials):
+            shard = ResultShard(user_id, keep_samples=False)
+            shard.histogram = LatencyHistogram.from_dict(partial["histogram"])
+            # JSON transports turn the status keys into strings
+            shard.status_counts = {int(k): v for k, v in partial["status_counts"].items()}
+            shard.error_counts = {int(k): v for k, v in partial.get("error_counts", {}).items()}
+            phase_totals = partial.get("phase_totals", {})
+            shard.phase_totals = array("d", [phase_totals.get(phase, 0.0) for phase in PHASES])
+            shard.timed_requests = partial.get("timed_requests", 0)
+            overhead_totals = partial.get("overhead_totals", {})
+            shard.overhead_totals = array("d", [overhead_totals.get(name, 0.0) for name in OVERHEADS])
+            shard.bytes_received = partial.get("bytes_received", 0)
+            shard.body_hashes = dict(partial.get("body_hashes", {}))
+            if partial.get("overhead_histogram"):
+                shard.overhead_histogram = LatencyHistogram.from_dict(partial["overhead_histogram"])
+            shards.append(shard)
+            dropped += partial.get("dropped_requests", 0)
+            incomplete += not partial.get("complete", True)
+            if partial.get("started_at") is not None:
+                starts.append(partial["started_at"])
+            if partial.get("ended_at") is not None:
+                ends.append(partial["ended_at"])
+            timelines.extend(partial.get("resource_timelines", []))
+            if partial.get("loop_lag"):
+                lag = LatencyHistogram.from_dict(partial["loop_lag"])
+                if loop_lag is None:
+                    loop_lag = lag
+                else:
+                    loop_lag.merge(lag)
+            if partial.get("stages"):
+                segments = StageSegments.from_dict(partial["stages"])
+                stages = segments if stages is None else stages.merge(segments)
+        merged = cls(shards)
+        merged.dropped_requests = dropped
+        merged.incomplete_partials = incomplete
+        merged.started_at = min(starts) if starts else None
+        merged.ended_at = max(ends) if ends else None
+        merged.resource_timelines = timelines
+        merged.loop_lag = loop_lag
+        merged.stages = stages
+        return merged
+
+    # ------------------------------
+    # 🔹 Dict compatibility shim
+    # ------------------------------
+    @classmethod
+    def from_dicts(cls, results: Iterable[Dict]) -> "RunResults":
+        shard = ResultShard()
+        for r in results:
+            if isinstance(r, dict):
+                shard.record(r.get("timestamp", 0.0), r["status"], r["latency"])
+        return cls([shard])
+
+    def to_dicts(self) -> List[Dict]:
+        return [
+            {"status": int(status), "latency": float(latency)}
+            for status, latency in zip(self.statuses, self.latencies)
+        ]
@@ -0,0 +1,125 @@
+# app/runner.py
+
+import asyncio
+import math
+
+from app.debug import logger
+from app.cluster import agent_registry
+from app.baselines import check_and_update_baseline, load_level
+from app.live import live_registry
+from app.load_tester import run_load_test
+from app.metrics import analyze_results
+from app.models import LoadTestRequest, LoadTestResponse
+from app.persistence import save_run_distribution, save_run_resources, save_run_summary, save_run_timeseries
+from app.samples import save_samples
+from app.stages import peak_users, profile_duration
+from app.workers import run_multiprocess_load_test
+
+
+async def execute_run(config: LoadTestRequest, run_id: str) -> LoadTestResponse:
+    """Run one load test end to end: generate load, analyze, compare, persist"""
+    logger.debug("🚀 Load test config: %s", config.dict())
+
+    # A stage profile sets the (peak) user count and the duration
+    stages = [stage.dict() for stage in config.stages]
+    num_users = peak_users(stages) if stages else config.num_users
+    duration = math.ceil(profile_duration(stages)) if stages else config.duration
+
+    # 1. Run the load test (in-process, or sharded over worker processes)
+    run_options = dict(
+        url=config.target_url,
+        num_users=num_users,
+        duration=duration,
+        method=config.method,
+        headers=config.headers,
+        payload=config.payload,
+        chaos_mode=config.chaos_mode,
+        run_id=run_id,
+        target_rps=config.target_rps,
+        rps_ramp=[stage.dict() for stage in config.rps_ramp],
+        max_in_flight=config.max_in_flight,
+        client_options=config.connection.dict(),
+        trace_timings=config.trace_timings,
+        resource_interval=config.resource_sample_interval,
+        scenario=config.scenario.dict() if config.scenario is not None else None,
+        response_mode=config.response_mode,
+        response_head_bytes=config.response_head_bytes,
+        stages=stages,
+        gc_mode=config.runtime.gc_mode,
+    )
+    if config.agents > 0:
+        # Remote agents stream back snapshots only, so there is no live window here either
+        raw_metrics = await agent_registry.run(run_id, run_options, config.agents)
+    elif config.workers > 1:
+        # Worker processes report only at the end, so there is no live stream for them
+        raw_metrics = await run_multiprocess_load_test(
+            **run_options, workers=config.workers, event_loop=config.runtime.event_loop
+        )
+    else:
+        live = live_registry.open(run_id)
+        try:
+            raw_metrics = await run_load_test(**run_options, live=live)
+        finally:
+            await live_registry.close(run_id)
+
+    logger.debug("📥 Raw results: %s samples", len(raw_metrics))
+
+    # 2. Analyze metrics
+    metrics = analyze_results(raw_metrics)
+    regressions = check_and_update_baseline(
+        config.target_url, config.method, load_level(num_users, config.target_rps), metrics
+    )
+    metrics["diagnosis"].extend(regressions)
+    logger.debug("📊 Analyzed metrics: %s", metrics)
+
+    # 3. Save summary
+    save_run_summary(
+        run_id=run_id,
+        url=config.target_url,
+        users=num_users,
+        duration=duration,
+        metrics=metrics,
+        method=config.method,
+    )
+    if metrics["timeseries"]["t"]:
+        save_run_timeseries(run_id, metrics["timeseries"])
+    if raw_metrics.resource_timelines:
+        save_run_resources(run_id, raw_metrics.resource_timelines)
+    # Compact histogram + counters, for /compare (kept for every run, sharded or not)
+    save_run_distribution(
+        run_id, raw_metrics.histogram.to_dict(), raw_metrics.status_counts, raw_metrics.error_counts
+    )
+    # Raw samples for later re-analysis (in-process runs only; workers ship histograms)
+    await asyncio.to_thread(save_samples, run_id, raw_metrics)
+
+    # 4. Return full response
+    response = LoadTestResponse(
+        avg_latency=metrics["avg_latency"],
+        max_latency=metrics["max_latency"],
+        p50_latency=metrics["p50_latency"],
+        p90_latency=metrics["p90_latency"],
+        p95_latency=metrics["p95_latency"],
+        p99_latency=metrics["p99_latency"],
+        p999_latency=metrics["p999_latency"],
+        latency_stddev=metrics["std_dev_latency"],
+        error_rate=metrics["error_rate"],
+        throughput=metrics["throughput"],
+        bytes_received=metrics["bytes_received"],
+        throughput_mb_s=metrics["throughput_mb_s"],
+        body_hashes=metrics["body_hashes"],
+        total_requests=metrics["total_requests"],
+        dropped_requests=metrics["dropped_requests"],
+        incomplete_partials=metrics["incomplete_partials"],
+        status_classes=metrics["status_classes"],
+        status_breakdown=metrics["status_breakdown"],
+        error_breakdown=metrics["error_breakdown"],
+        timing_breakdown=metrics["timing_breakdown"],
+        generator_bound=metrics["generator_bound"],
+        client_overhead=metrics["client_overhead"],
+        stages=metrics["stages"],
+        health_score=metrics["health_score"],
+        diagnosis=metrics["diagnosis"],
+    )
+
+    logger.debug("✅ Final response: %s", response.dict())
+    return response
@@ -0,0 +1,129 @@
+# app/runtime.py
+
+import asyncio
+import gc
+import importlib.util
+import time
+from typing import Dict, Optional, Tuple
+
+from app.debug import logger
+
+EVENT_LOOPS = ("auto", "uvloop", "asyncio")
+GC_MODES = ("default", "freeze", "tune", "pause")
+RUN_GC_THRESHOLD = (50_000, 50, 1000)  # gen0 / gen1 / gen2 thresholds in "tune" mode
+
+
+# ------------------------------
+# 🔹 Event loop
+# ------------------------------
+def uvloop_available() -> bool:
+    return importlib.util.find_spec("uvloop") is not None
+
+
+def use_event_loop(event_loop: str = "auto") -> str:
+    """Install the event loop policy for the next asyncio.run() in this process; returns the loop used.
+
+    ``auto`` picks uvloop when it is installed and falls back to asyncio.
+    """
+    if event_loop not in EVENT_LOOPS:
+        raise ValueError(f"event_loop must be one of {EVENT_LOOPS}")
+    if event_loop == "uvloop" and not uvloop_available():
+        raise ValueError("event_loop 'uvloop' requested but uvloop is not installed")
+    if event_loop == "asyncio" or not uvloop_available():
+        asyncio.set_event_loop_policy(None)
+        return "asyncio"
+    import uvloop
+
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    return "uvloop"
+
+
+def running_loop_name() -> str:
+    """``uvloop`` or ``asyncio`` for the loop running this coroutine (e.g. the one uvicorn started)"""
+    module = type(asyncio.get_running_loop()).__module__
+    return "uvloop" if module.startswith("uvloop") else "asyncio"
+
+
+# ------------------------------
+# 🔹 Garbage collection during a run
+# ------------------------------
+class GcWindow:
+    """Garbage-collector settings for a run's measurement window.
+
+    default — leave the collector alone (pauses are still measured)
+    freeze  — collect once, then move every surviving object to the
+              permanent generation (``gc.freeze``), so the modules, the
+              app and the compiled run are never scanned again mid-run
+    tune    — freeze, and raise the thresholds to RUN_GC_THRESHOLD so
+              collections are rarer; results are arrays, not cyclic objects
+    pause   — freeze, and disable automatic collection for the window
+              (cyclic garbage then piles up until the end: mind the memory
+              headroom on long runs)
+
+    On exit the settings are restored, the frozen objects released and
+    one full collection made, outside the measurement. The GC is process
+    state: overlapping runs in one process share the window opened by
+    the first of them, which closes with the last one.
+    """
+
+    _active = 0
+    _saved: Optional[Tuple[bool, Tuple[int, int, int]]] = None
+
+    def __init__(self, mode: str = "freeze"):
+        if mode not in GC_MODES:
+            raise ValueError(f"gc_mode must be one of {GC_MODES}")
+        self.mode = mode
+        self.entered = False
+        self.collect_seconds = 0.0  # Of the closing collection, which is not part of the run
+
+    def start(self) -> "GcWindow":
+        if self.mode == "default" or self.entered:
+            return self
+        self.entered = True
+        GcWindow._active += 1
+        if GcWindow._active > 1:
+            return self
+        GcWindow._saved = (gc.isenabled(), gc.get_threshold())
+        gc.collect()
+        gc.freeze()
+        if self.mode == "tune":
+            gc.set_threshold(*RUN_GC_THRESHOLD)
+        elif self.mode == "pause":
+            gc.disable()
+        return self
+
+    def stop(self):
+        if not self.entered:
+            return
+        self.entered = False
+        GcWindow._active -= 1
+        if GcWindow._active:
+            return
+        enabled, threshold = GcWindow._saved
+        gc.set_threshold(*threshold)
+        if enabled:
+            gc.enable()
+        gc.unfreeze()
+        started = time.perf_counter()
+        collected = gc.collect()
+        self.collect_seconds = time.perf_counter() - started
+        logger.debug("♻️ GC window (%s) closed: %s objects collected in %.1f ms",
+                     self.mode, collected, self.collect_seconds * 1000)
+
+    async def __aenter__(self) -> "GcWindow":
+        return self.start()
+
+    async def __aexit__(self, *exc_info):
+        self.stop()
+
+
+def describe_runtime() -> Dict:
+    """Event loop and collector state of this process (call from inside the running loop)"""
+    return {
+        "event_loop": running_loop_name(),
+        "uvloop_available": uvloop_available(),
+        "gc_enabled": gc.isenabled(),
+        "gc_threshold": gc.get_threshold(),
+        "gc_frozen": gc.get_freeze_count(),
+        "gc_windows_open": GcWindow._active,
+    }
@@ -0,0 +1,215 @@
+# app/samples.py
+
+import json
+import os
+import shutil
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+
+from app.histogram import LatencyHistogram
+from app.metrics import DEFAULT_BUCKET_SECONDS, analyze_results, bucket_ids, bucket_stats, time_series_from_buckets
+from app.results import ERROR_TYPES, ResultShard, RunResults
+
+SAMPLES_DIR = os.path.join("data", "samples")
+ANALYSIS_CHUNK = 1_000_000  # Samples folded into the histogram per step
+
+# column → dtype of its .npy file (fixed width, little-endian)
+SAMPLE_COLUMNS = {
+    "timestamps": "<f8",
+    "latencies": "<f8",
+    "statuses": "<u2",
+    "user_ids": "<u4",
+    "errors": "u1",
+}
+
+
+def samples_path(run_id: str) -> str:
+    return os.path.join(SAMPLES_DIR, run_id)
+
+
+# ------------------------------
+# 🔹 Write
+# ------------------------------
+def save_samples(run_id: str, results: RunResults) -> Optional[str]:
+    """Persist a run's raw samples as one .npy file per column, sorted by timestamp.
+
+    Returns the run's sample directory, or None when the run kept no raw
+    samples (e.g. multi-process runs, which only ship histograms).
+    """
+    if not len(results.latencies):
+        return None
+    order = np.argsort(results.timestamps, kind="stable")
+    final_dir = samples_path(run_id)
+    tmp_dir = final_dir + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    for column, dtype in SAMPLE_COLUMNS.items():
+        values = getattr(results, column)[order].astype(dtype, copy=False)
+        np.save(os.path.join(tmp_dir, f"{column}.npy"), values)
+
+    timestamps = results.timestamps
+    started_at = results.started_at if results.started_at is not None else float(timestamps.min())
+    with open(os.path.join(tmp_dir, "meta.json"), "w") as f:
+        json.dump({
+            "run_id": run_id,
+            "count": int(len(order)),
+            "started_at": started_at,
+            "ended_at": started_at + results.elapsed,
+            "columns": SAMPLE_COLUMNS,
+            "error_types": ERROR_TYPES,
+            "dropped_requests": results.dropped_requests,
+        }, f)
+
+    # Swap in atomically so readers never see a half-written run
+    shutil.rmtree(final_dir, ignore_errors=True)
+    os.replace(tmp_dir, final_dir)
+    return final_dir
+
+
+# ------------------------------
+# 🔹 Read (memory-mapped)
+# ------------------------------
+def load_meta(run_id: str) -> Optional[Dict]:
+    path = os.path.join(samples_path(run_id), "meta.json")
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def load_samples(
+    run_id: str,
+    start: Optional[float] = None,
+    end: Optional[float] = None,
+    columns: Optional[Iterable[str]] = None,
+) -> Dict[str, np.ndarray]:
+    """Memory-mapped columns of a stored run, optionally limited to a time slice.
+
+    `start`/`end` are seconds from the start of the run. Slicing is a binary
+    search on the sorted timestamp column, so only the pages of the
+    requested window are ever read from disk.
+    """
+    meta = load_meta(run_id)
+    if meta is None:
+        raise FileNotFoundError(f"No stored samples for run {run_id}")
+    directory = samples_path(run_id)
+    mapped = {
+        column: np.load(os.path.join(directory, f"{column}.npy"), mmap_mode="r")
+        for column in (columns or SAMPLE_COLUMNS)
+    }
+    timestamps = mapped.get("timestamps")
+    if timestamps is None:
+        timestamps = np.load(os.path.join(directory, "timestamps.npy"), mmap_mode="r")
+    lo = 0 if start is None else int(np.searchsorted(timestamps, meta["started_at"] + start, "left"))
+    hi = len(timestamps) if end is None else int(np.searchsorted(timestamps, meta["started_at"] + end, "left"))
+    return {column: values[lo:hi] for column, values in mapped.items()}
+
+
+def stored_run_results(
+    run_id: str,
+    start: Optional[float] = None,
+    end: Optional[float] = None,
+    chunk: int = ANALYSIS_CHUNK,
+) -> RunResults:
+    """Rebuild histogram + counters for a stored run (or slice), one chunk at a time.
+
+    The result is a samples-free RunResults that analyze_results accepts
+    as-is; peak memory is bounded by `chunk`, not by the size of the run.
+    """
+    samples = load_samples(run_id, start, end, columns=("latencies", "statuses", "errors"))
+    shard = ResultShard(keep_samples=False)
+    histogram = LatencyHistogram()
+    total = len(samples["latencies"])
+    for lo in range(0, total, chunk):
+        hi = min(lo + chunk, total)
+        histogram.record_many(samples["latencies"][lo:hi])
+        for field, counts in (("statuses", shard.status_counts), ("errors", shard.error_counts)):
+            values, frequencies = np.unique(samples[field][lo:hi], return_counts=True)
+            for value, frequency in zip(values.tolist(), frequencies.tolist()):
+                if field == "errors" and value == 0:
+                    continue
+                counts[value] = counts.get(value, 0) + frequency
+    shard.histogram = histogram
+    results = RunResults([shard])
+    meta = load_meta(run_id)
+    results.started_at, results.ended_at = _window(meta, start, end)
+    if start is None and end is None:
+        results.dropped_requests = meta.get("dropped_requests", 0)
+    return results
+
+
+def _window(meta: Dict, start: Optional[float], end: Optional[float]) -> Tuple[float, float]:
+    """Wall-clock bounds of a slice, clipped to the run"""
+    run_start, run_end = meta["started_at"], meta["ended_at"]
+    lo = run_start if start is None else min(run_start + start, run_end)
+    hi = run_end if end is None else min(run_start + end, run_end)
+    return lo, max(hi, lo)
+
+
+def _bucket_end(
+    timestamps: np.ndarray, lo: int, bucket: int, origin: float, bucket_seconds: float, chunk: int,
+) -> int:
+    """Index just past the last sample of `bucket`, scanning sorted timestamps from `lo` a chunk at a time"""
+    while lo < len(timestamps):
+        ids = bucket_ids(timestamps[lo:lo + chunk], origin, bucket_seconds)
+        end = int(np.searchsorted(ids, bucket, "right"))
+        lo += end
+        if end < ids.size:
+            break
+    return lo
+
+
+def stored_time_series(
+    run_id: str,
+    start: Optional[float] = None,
+    end: Optional[float] = None,
+    bucket_seconds: float = DEFAULT_BUCKET_SECONDS,
+    chunk: int = ANALYSIS_CHUNK,
+) -> Dict:
+    """Per-bucket series of a stored run (or slice), grouped one chunk at a time.
+
+    Chunks are cut where the bucket id changes, computed exactly as
+    bucket_stats computes it (timestamps are sorted, so ids are too): no
+    bucket is split across chunks and the partial results simply concatenate.
+    """
+    if bucket_seconds <= 0:
+        raise ValueError("bucket_seconds must be positive")
+    samples = load_samples(run_id, start, end, columns=("timestamps", "latencies", "statuses"))
+    origin, _ = _window(load_meta(run_id), start, end)
+    timestamps = samples["timestamps"]
+    total = len(timestamps)
+    if total:
+        origin = min(origin, float(timestamps[0]))  # Samples can precede started_at (clock offsets)
+    parts = []
+    lo = 0
+    while lo < total:
+        hi = min(lo + chunk, total)
+        if hi < total:
+            ids = bucket_ids(timestamps[lo:hi + 1], origin, bucket_seconds)
+            cut = lo + int(np.searchsorted(ids, ids[-1], "left"))
+            # A single bucket larger than the chunk is taken whole
+            hi = cut if cut > lo else _bucket_end(timestamps, hi, int(ids[-1]), origin, bucket_seconds, chunk)
+        parts.append(bucket_stats(
+            timestamps[lo:hi], samples["latencies"][lo:hi], samples["statuses"][lo:hi],
+            origin, bucket_seconds,
+        ))
+        lo = hi
+    stats = tuple(np.concatenate(column) for column in zip(*parts)) if parts else (
+        np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64),
+        np.zeros(0), np.zeros(0), np.zeros(0),
+    )
+    return time_series_from_buckets(stats, origin, bucket_seconds)
+
+
+def analyze_stored_run(
+    run_id: str,
+    start: Optional[float] = None,
+    end: Optional[float] = None,
+    bucket_seconds: float = DEFAULT_BUCKET_SECONDS,
+) -> Dict:
+    """analyze_results over a stored run or a [start, end) slice of it, without loading it whole"""
+    metrics = analyze_results(stored_run_results(run_id, start, end))
+    metrics["timeseries"] = stored_time_series(run_id, start, end, bucket_seconds)
+    return metrics
@@ -0,0 +1,335 @@
+# app/scenario.py
+
+import bisect
+import csv
+import json
+import os
+import random
+import re
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import httpx
+
+FEEDERS_DIR = os.path.join("data", "feeders")  # Feeder files named in a scenario live here
+FEEDER_FORMATS = ("csv", "jsonl")
+THINK_DISTRIBUTIONS = ("constant", "uniform", "exponential")
+EXTRACT_SOURCES = ("json", "header", "regex", "status")
+
+_VARIABLE = re.compile(r"\$\{(\w+)\}")
+# In serialised JSON: a string that is exactly one placeholder, or a placeholder inside a string
+_JSON_VARIABLE = re.compile(r'(?:(?<=[:,\[{])|^)"\$\{(\w+)\}"(?=[,\]}]|$)|\$\{(\w+)\}')
+
+_LITERAL, _VALUE, _ESCAPED = 0, 1, 2
+
+
+# ------------------------------
+# 🔹 Templates
+# ------------------------------
+class TextTemplate:
+    """A string with ``${name}`` placeholders, split into literal and variable parts once.
+
+    Missing variables render as an empty string.
+    """
+
+    __slots__ = ("static", "parts")
+
+    def __init__(self, text: str):
+        parts: List[Tuple[bool, str]] = []
+        position = 0
+        for match in _VARIABLE.finditer(text):
+            if match.start() > position:
+                parts.append((False, text[position:match.start()]))
+            parts.append((True, match.group(1)))
+            position = match.end()
+        if position < len(text):
+            parts.append((False, text[position:]))
+        self.static = None if any(is_variable for is_variable, _ in parts) else text
+        self.parts = parts
+
+    def render(self, variables: Dict[str, Any]) -> str:
+        if self.static is not None:
+            return self.static
+        return "".join(
+            str(variables.get(value, "")) if is_variable else value
+            for is_variable, value in self.parts
+        )
+
+
+class JsonTemplate:
+    """A JSON body serialised once; placeholders are filled into the serialised text.
+
+    A string that is exactly ``"${name}"`` takes the variable's JSON value
+    (so numbers stay numbers); a placeholder inside a longer string is
+    inserted as escaped string content.
+    """
+
+    __slots__ = ("static", "parts")
+
+    def __init__(self, payload: Any):
+        text = json.dumps(payload, separators=(",", ":"))
+        parts: List[Tuple[int, str]] = []
+        position = 0
+        for match in _JSON_VARIABLE.finditer(text):
+            if match.start() > position:
+                parts.append((_LITERAL, text[position:match.start()]))
+            if match.group(1) is not None:
+                parts.append((_VALUE, match.group(1)))
+            else:
+                parts.append((_ESCAPED, match.group(2)))
+            position = match.end()
+        if position < len(text):
+            parts.append((_LITERAL, text[position:]))
+        self.static = text.encode() if all(kind == _LITERAL for kind, _ in parts) else None
+        self.parts = parts
+
+    def render(self, variables: Dict[str, Any]) -> bytes:
+        if self.static is not None:
+            return self.static
+        out = []
+        for kind, value in self.parts:
+            if kind == _LITERAL:
+                out.append(value)
+            elif kind == _VALUE:
+                out.append(json.dumps(variables.get(value)))
+            else:
+                out.append(json.dumps(str(variables.get(value, "")))[1:-1])
+        return "".join(out).encode()
+
+
+# ------------------------------
+# 🔹 Extraction and think time
+# ------------------------------
+def compile_extractor(spec: str) -> Callable[[httpx.Response, Dict], Any]:
+    """``json:data.items.0.id``, ``header:X-Request-Id``, ``regex:token=(\\w+)`` or ``status``.
+
+    The returned callable takes the response and a per-response cache (so
+    several JSON extractors parse the body once) and returns the value,
+    or None when it is not present.
+    """
+    source, _, argument = spec.partition(":")
+    if source not in EXTRACT_SOURCES:
+        raise ValueError(f"extract source must be one of {EXTRACT_SOURCES}, got {spec!r}")
+    if source == "status":
+        return lambda response, cache: response.status_code
+    if source == "header":
+        return lambda response, cache: response.headers.get(argument)
+    if source == "regex":
+        try:
+            pattern = re.compile(argument)
+        except re.error as e:
+            raise ValueError(f"Invalid extract pattern {argument!r}: {e}")
+
+        def extract_regex(response: httpx.Response, cache: Dict) -> Any:
+            match = pattern.search(response.text)
+            if match is None:
+                return None
+            return match.group(1) if pattern.groups else match.group(0)
+        return extract_regex
+
+    path = [int(key) if key.isdigit() else key for key in argument.split(".") if key]
+
+    def extract_json(response: httpx.Response, cache: Dict) -> Any:
+        if "json" not in cache:
+            try:
+                cache["json"] = response.json()
+            except ValueError:
+                cache["json"] = None
+        value = cache["json"]
+        for key in path:
+            try:
+                value = value[key]
+            except (KeyError, IndexError, TypeError):
+                return None
+        return value
+    return extract_json
+
+
+def compile_think_time(spec: Optional[Dict]) -> Optional[Callable[[], float]]:
+    """Pause (seconds) drawn after a request, or None for no pause"""
+    if not spec:
+        return None
+    distribution = spec.get("distribution", "constant")
+    if distribution not in THINK_DISTRIBUTIONS:
+        raise ValueError(f"think_time distribution must be one of {THINK_DISTRIBUTIONS}")
+    if distribution == "uniform":
+        low, high = spec.get("min", 0.0), spec.get("max", 0.0)
+        return lambda: random.uniform(low, high)
+    mean = spec.get("mean", 0.0)
+    if mean <= 0:
+        return None
+    if distribution == "exponential":
+        return lambda: random.expovariate(1 / mean)
+    return lambda: mean
+
+
+# ------------------------------
+# 🔹 Data feeders
+# ------------------------------
+def resolve_feeder_path(path: str) -> str:
+    """Feeder files must sit under FEEDERS_DIR; the API never reads anything else"""
+    root = os.path.realpath(FEEDERS_DIR)
+    resolved = os.path.realpath(os.path.join(root, path))
+    if os.path.commonpath([root, resolved]) != root:
+        raise ValueError(f"Feeder path {path!r} is outside {FEEDERS_DIR}")
+    if not os.path.isfile(resolved):
+        raise ValueError(f"Feeder file {path!r} not found in {FEEDERS_DIR}")
+    return resolved
+
+
+class DataFeeder:
+    """Rows of a CSV (with a header row) or JSONL file, read one line at a time as users need them.
+
+    With ``cycle`` the file is reopened at the end; otherwise the feeder
+    runs dry and ``next_row`` returns None. Worker processes pass their
+    ``shard`` (index, count) so each one reads a disjoint slice of the rows.
+    """
+
+    def __init__(self, path: str, fmt: Optional[str] = None, cycle: bool = True, shard: Tuple[int, int] = (0, 1)):
+        self.path = resolve_feeder_path(path)
+        self.format = fmt or os.path.splitext(path)[1].lstrip(".").lower()
+        if self.format not in FEEDER_FORMATS:
+            raise ValueError(f"Feeder format must be one of {FEEDER_FORMATS}, got {self.format!r}")
+        self.cycle = cycle
+        self.shard_index, self.shard_count = shard
+        self._rows: Optional[Iterator[Dict]] = None
+
+    def _shard_rows(self, file) -> Iterator[Dict]:
+        rows = csv.DictReader(file) if self.format == "csv" else (json.loads(line) for line in file if line.strip())
+        for index, row in enumerate(rows):
+            if index % self.shard_count == self.shard_index:
+                yield row
+
+    def _read(self) -> Iterator[Dict]:
+        while True:
+            served = 0
+            with open(self.path, newline="", encoding="utf-8") as file:
+                for row in self._shard_rows(file):
+                    served += 1
+                    yield row
+            if not self.cycle:
+                return
+            if not served:
+                raise ValueError(f"Feeder {self.path} has no rows for shard {self.shard_index}")
+
+    def has_rows(self) -> bool:
+        """Whether this shard of the file holds any row (reads only as far as the first one)"""
+        with open(self.path, newline="", encoding="utf-8") as file:
+            return next(self._shard_rows(file), None) is not None
+
+    def next_row(self) -> Optional[Dict]:
+        if self._rows is None:
+            self._rows = self._read()
+        return next(self._rows, None)
+
+
+# ------------------------------
+# 🔹 Compiled scenario
+# ------------------------------
+class CompiledRequest:
+    """One request template, with everything that does not depend on variables prepared up front"""
+
+    __slots__ = ("name", "method", "url", "headers", "static_headers", "body", "extractors", "think")
+
+    def __init__(self, spec: Dict, base_url: str, default_headers: Dict[str, str], default_think: Optional[Dict]):
+        path = spec.get("path", "")
+        url = path if path.startswith(("http://", "https://")) else (
+            base_url.rstrip("/") + "/" + path.lstrip("/") if path else base_url
+        )
+        self.name = spec.get("name") or f"{spec.get('method', 'GET')} {path or '/'}"
+        self.method = spec.get("method", "GET").upper()
+        self.url = TextTemplate(url)
+        headers = {**default_headers, **spec.get("headers", {})}
+        payload = spec.get("payload")
+        self.body = JsonTemplate(payload) if payload is not None else None
+        if self.body is not None and not any(name.lower() == "content-type" for name in headers):
+            headers["Content-Type"] = "application/json"
+        self.headers = {name: TextTemplate(value) for name, value in headers.items()}
+        self.static_headers = headers if all(t.static is not None for t in self.headers.values()) else None
+        self.extractors = {
+            variable: compile_extractor(source) for variable, source in spec.get("extract", {}).items()
+        }
+        self.think = compile_think_time(spec.get("think_time") or default_think)
+
+    def render(self, variables: Dict[str, Any]) -> Tuple[str, Dict[str, str], Optional[bytes]]:
+        """(url, headers, body bytes) for one request"""
+        headers = self.static_headers
+        if headers is None:
+            headers = {name: template.render(variables) for name, template in self.headers.items()}
+        body = self.body.render(variables) if self.body is not None else None
+        return self.url.render(variables), headers, body
+
+    def extract(self, response: httpx.Response, variables: Dict[str, Any]):
+        cache: Dict = {}
+        for variable, extractor in self.extractors.items():
+            value = extractor(response, cache)
+            if value is not None:
+                variables[variable] = value
+
+
+class CompiledStep:
+    """A sequential step: one template, or a weighted choice between several"""
+
+    __slots__ = ("requests", "cumulative", "total")
+
+    def __init__(self, requests: List[CompiledRequest], weights: List[float]):
+        if not requests:
+            raise ValueError("Every scenario step needs at least one request")
+        if any(weight <= 0 for weight in weights):
+            raise ValueError("Request weights must be positive")
+        self.requests = requests
+        self.cumulative = []
+        total = 0.0
+        for weight in weights:
+            total += weight
+            self.cumulative.append(total)
+        self.total = total
+
+    def pick(self) -> CompiledRequest:
+        if len(self.requests) == 1:
+            return self.requests[0]
+        return self.requests[bisect.bisect_right(self.cumulative, random.random() * self.total)]
+
+
+class CompiledScenario:
+    """A user journey compiled once per run (per worker process).
+
+    Every iteration starts with fresh variables: ``user_id``,
+    ``iteration`` and one row from each feeder. Requests then run step by
+    step; values extracted from a response are visible to the steps after it.
+    """
+
+    def __init__(
+        self,
+        scenario: Dict,
+        base_url: str,
+        default_headers: Optional[Dict[str, str]] = None,
+        feeder_shard: Tuple[int, int] = (0, 1),
+    ):
+        default_think = scenario.get("think_time")
+        self.steps = [
+            CompiledStep(
+                [CompiledRequest(spec, base_url, default_headers or {}, default_think) for spec in step["requests"]],
+                [spec.get("weight", 1.0) for spec in step["requests"]],
+            )
+            for step in scenario.get("steps", [])
+        ]
+        if not self.steps:
+            raise ValueError("A scenario needs at least one step")
+        self.feeders = [
+            DataFeeder(feeder["path"], feeder.get("format"), feeder.get("cycle", True), feeder_shard)
+            for feeder in scenario.get("feeders", [])
+        ]
+        for feeder, spec in zip(self.feeders, scenario.get("feeders", [])):
+            if not feeder.has_rows():
+                where = f" for shard {feeder.shard_index} of {feeder.shard_count}" if feeder.shard_count > 1 else ""
+                raise ValueError(f"Feeder {spec['path']!r} has no rows{where}")
+
+    def start_iteration(self, user_id: int, iteration: int) -> Optional[Dict[str, Any]]:
+        """Variables for a new pass through the journey, or None once a feeder has run dry"""
+        variables: Dict[str, Any] = {"user_id": user_id, "iteration": iteration}
+        for feeder in self.feeders:
+            row = feeder.next_row()
+            if row is None:
+                return None
+            variables.update(row)
+        return variables
@@ -0,0 +1,141 @@
+# app/stages.py
+
+import bisect
+from typing import Dict, List, Tuple
+
+from app.histogram import LatencyHistogram
+
+
+# ------------------------------
+# 🔹 Load profile
+# ------------------------------
+def stage_names(stages: List[Dict]) -> List[str]:
+    """Given names, or e.g. ``2:hold`` from the stage's shape"""
+    names = []
+    users = 0
+    for index, stage in enumerate(stages, 1):
+        target = stage["target_users"]
+        shape = "ramp-up" if target > users else "ramp-down" if target < users else "hold"
+        names.append(stage.get("name") or f"{index}:{shape}")
+        users = target
+    return names
+
+
+def profile_duration(stages: List[Dict]) -> float:
+    return sum(stage["duration"] for stage in stages)
+
+
+def peak_users(stages: List[Dict]) -> int:
+    return max((stage["target_users"] for stage in stages), default=0)
+
+
+def user_schedule(stages: List[Dict]) -> List[Tuple[float, int]]:
+    """(seconds into the run, +1 / -1) for every user started or stopped by the profile.
+
+    The profile starts at 0 users and each stage moves linearly from the
+    previous stage's ``target_users`` to its own over its ``duration``,
+    so the instant the count crosses each whole user is known exactly
+    (a zero-length stage jumps at once).
+    """
+    events = []
+    offset = 0.0
+    users = 0
+    for stage in stages:
+        target, duration = stage["target_users"], stage["duration"]
+        change = abs(target - users)
+        step = 1 if target > users else -1
+        for n in range(1, change + 1):
+            # The ramp crosses its n-th whole user n/change of the way through the stage
+            events.append((offset + duration * n / change, step))
+        users = target
+        offset += duration
+    return events
+
+
+# ------------------------------
+# 🔹 Per-stage statistics
+# ------------------------------
+class StageSegments:
+    """Latency histogram and status / error counters per stage of a load profile.
+
+    Requests count towards the stage they started in, so a hold stage is
+    reported without the ramp before it. In a process every user shares
+    one instance (the event loop is single-threaded); worker and agent
+    partials are merged with ``merge``. ``schedule_lag`` is the latest the
+    user scheduler started or stopped a user, in seconds.
+    """
+
+    def __init__(
+        self, names: List[str], starts: List[float], ends: List[float],
+        targets: List[int], significant_digits: int = 2,
+    ):
+        self.names = names
+        self.starts = starts
+        self.ends = ends
+        self.targets = targets
+        self.histograms = [LatencyHistogram(significant_digits) for _ in names]
+        self.status_counts: List[Dict[int, int]] = [{} for _ in names]
+        self.error_counts: List[Dict[int, int]] = [{} for _ in names]
+        self.schedule_lag = 0.0
+
+    @classmethod
+    def for_profile(cls, stages: List[Dict], started_at: float) -> "StageSegments":
+        starts, ends = [], []
+        offset = started_at
+        for stage in stages:
+            starts.append(offset)
+            offset += stage["duration"]
+            ends.append(offset)
+        return cls(stage_names(stages), starts, ends, [stage["target_users"] for stage in stages])
+
+    def record(self, timestamp: float, status: int, latency: float, error: int = 0):
+        index = min(bisect.bisect_right(self.ends, timestamp), len(self.ends) - 1)
+        self.histograms[index].record(latency)
+        counts = self.status_counts[index]
+        counts[status] = counts.get(status, 0) + 1
+        if error:
+            errors = self.error_counts[index]
+            errors[error] = errors.get(error, 0) + 1
+
+    def note_schedule_lag(self, lag: float):
+        if lag > self.schedule_lag:
+            self.schedule_lag = lag
+
+    def merge(self, other: "StageSegments") -> "StageSegments":
+        if other.names != self.names:
+            raise ValueError("Cannot merge stage statistics of different profiles")
+        self.starts = [min(a, b) for a, b in zip(self.starts, other.starts)]
+        self.ends = [max(a, b) for a, b in zip(self.ends, other.ends)]
+        self.targets = [a + b for a, b in zip(self.targets, other.targets)]
+        for index, histogram in enumerate(other.histograms):
+            self.histograms[index].merge(histogram)
+            for mine, theirs in (
+                (self.status_counts[index], other.status_counts[index]),
+                (self.error_counts[index], other.error_counts[index]),
+            ):
+                for code, count in theirs.items():
+                    mine[code] = mine.get(code, 0) + count
+        self.schedule_lag = max(self.schedule_lag, other.schedule_lag)
+        return self
+
+    def to_dict(self) -> Dict:
+        return {
+            "names": self.names,
+            "starts": self.starts,
+            "ends": self.ends,
+            "targets": self.targets,
+            "histograms": [histogram.to_dict() for histogram in self.histograms],
+            "status_counts": self.status_counts,
+            "error_counts": self.error_counts,
+            "schedule_lag": self.schedule_lag,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "StageSegments":
+        segments = cls(data["names"], data["starts"], data["ends"], data["targets"])
+        segments.histograms = [LatencyHistogram.from_dict(histogram) for histogram in data["histograms"]]
+        # JSON transports turn the status keys into strings
+        segments.status_counts = [{int(k): v for k, v in counts.items()} for counts in data["status_counts"]]
+        segments.error_counts = [{int(k): v for k, v in counts.items()} for counts in data["error_counts"]]
+        segments.schedule_lag = data.get("schedule_lag", 0.0)
+        return segments
@@ -8,84 +8,57 @@ import json
 from datetime import datetime
 import sys
 
+try:
+    import uvloop  # Optional: a faster event loop for the polling client
+except ImportError:
+    uvloop = None
+
+DEFAULT_TARGET = "http://127.0.0.1:8099/"  # python -m app.stub_server
+
+
 class LoadAuditStressTester:
-    def __init__(self, base_url="http://localhost:8000"):
+    def __init__(self, base_url="http://localhost:8000", target_url=DEFAULT_TARGET):
         self.base_url = base_url
+        self.target_url = target_url
         self.results = []
+        self.poll_interval = 2
         
-    async def run_stress_test(self):
-        """Run progressive stress tests"""
+    async def run_stress_test(self, mode="users", **search_options):
+        """Find the breaking point with the API's adaptive capacity search"""
         print("🚀 LoadAudit Stress Testing Suite")
         print("=" * 50)
         
-        # Test progression: gradually increase load
-        test_scenarios = [
-            {"users": 5, "duration": 10, "name": "Baseline"},
-            {"users": 10, "duration": 15, "name": "Light Load"},
-            {"users": 25, "duration": 20, "name": "Moderate Load"},
-            {"users": 50, "duration": 30, "name": "Heavy Load"},
-            {"users": 100, "duration": 30, "name": "Stress Test"},
-            {"users": 200, "duration": 30, "name": "Breaking Point Test"},
-            {"users": 500, "duration": 30, "name": "System Limit Test"},
-        ]
-        
-        for scenario in test_scenarios:
-            print(f"\n📊 Running {scenario['name']}: {scenario['users']} users for {scenario['duration']}s")
-            
-            # Check system health before test
-            cpu_before = psutil.cpu_percent()
-            memory_before = psutil.virtual_memory().percent
+        # Check system health before the search
+        cpu_before = psutil.cpu_percent()
+        memory_before = psutil.virtual_memory().percent
+        if cpu_before > 80 or memory_before > 80:
+            print(f"⚠️ System already stressed (CPU: {cpu_before}%, Memory: {memory_before}%)")
+            print("Stopping stress tests for safety")
+            return
             
-            if cpu_before > 80 or memory_before > 80:
-                print(f"⚠️ System already stressed (CPU: {cpu_before}%, Memory: {memory_before}%)")
-                print("Stopping stress tests for safety")
-                break
-                
-            try:
-                result = await self.run_single_test(
-                    users=scenario["users"],
-                    duration=scenario["duration"],
-                    target_url="https://httpbin.org/delay/1"
-                )
-                
-                self.results.append({
-                    "scenario": scenario["name"],
-                    "config": scenario,
-                    "result": result,
-                    "timestamp": datetime.now().isoformat()
-                })
-                
-                # Check if we should continue
-                if result.get("status") == "FAILED":
-                    print(f"❌ Test failed at {scenario['users']} users")
-                    break
-                    
-                if result.get("system_stress", False):
-                    print(f"⚠️ System stress detected at {scenario['users']} users")
-                    break
-                    
-                # Wait between tests
-                print("💤 Waiting 10 seconds before next test...")
-                await asyncio.sleep(10)
-                
-            except Exception as e:
-                print(f"❌ Critical error during {scenario['name']}: {e}")
-                break
+        print(f"\n📊 Searching capacity by {mode} against {self.target_url}")
+        try:
+            result = await self.run_capacity_search(mode=mode, **search_options)
+            self.results.append({
+                "scenario": f"Capacity search ({mode})",
+                "config": {"mode": mode, **search_options},
+                "result": result,
+                "timestamp": datetime.now().isoformat()
+            })
+        except Exception as e:
+            print(f"❌ Critical error during capacity search: {e}")
         
         # Generate report
         self.generate_report()
         
-    async def run_single_test(self, users, duration, target_url):
-        """Run a single load test via API"""
+    async def run_capacity_search(self, mode="users", **search_options):
+        """Queue a capacity search via the API and wait for its result"""
         
-        test_config = {
-            "target_url": target_url,
-            "num_users": users,
-            "duration": duration,
+        search_config = {
+            "target_url": self.target_url,
+            "mode": mode,
             "method": "GET",
-            "headers": {},
-            "payload": {},
-            "chaos_mode": False
+            **search_options
         }
         
         start_time = time.time()
@@ -93,39 +66,55 @@ class LoadAuditStressTester:
         memory_before = psutil.virtual_memory().percent
         
         try:
-            async with httpx.AsyncClient(timeout=duration + 30) as client:
+            async with httpx.AsyncClient(timeout=30) as client:
                 response = await client.post(
-                    f"{self.base_url}/start",
-                    json=test_config
+                    f"{self.base_url}/capacity",
+                    json=search_config
                 )
                 
-                if response.status_code == 200:
-                    result_data = response.json()
-                    end_time = time.time()
-                    
-                    cpu_after = psutil.cpu_percent()
-                    memory_after = psutil.virtual_memory().percent
-                    
-                    return {
-                        "status": "SUCCESS",
-                        "test_duration": end_time - start_time,
-                        "api_response": result_data,
-                        "system_impact": {
-                            "cpu_before": cpu_before,
-                            "cpu_after": cpu_after,
-                            "cpu_increase": cpu_after - cpu_before,
-                            "memory_before": memory_before,
-                            "memory_after": memory_after,
-                            "memory_increase": memory_after - memory_before
-                        },
-                        "system_stress": cpu_after > 80 or memory_after > 80
-                    }
-                else:
+                if response.status_code != 202:
                     return {
                         "status": "FAILED",
                         "error": f"HTTP {response.status_code}",
                         "response": response.text
                     }
+                
+                # The search is queued; poll until it finishes
+                run_id = response.json()["run_id"]
+                while True:
+                    await asyncio.sleep(self.poll_interval)
+                    status = (await client.get(f"{self.base_url}/runs/{run_id}/status")).json()
+                    if status["status"] in ("completed", "failed", "cancelled"):
+                        break
+                
+                if status["status"] != "completed":
+                    return {
+                        "status": "FAILED",
+                        "error": status.get("error") or f"Search {status['status']}",
+                        "test_duration": time.time() - start_time
+                    }
+                
+                capacity = (await client.get(f"{self.base_url}/capacity/{run_id}")).json()
+                end_time = time.time()
+                
+                cpu_after = psutil.cpu_percent()
+                memory_after = psutil.virtual_memory().percent
+                
+                return {
+                    "status": "SUCCESS",
+                    "run_id": run_id,
+                    "test_duration": end_time - start_time,
+                    "capacity": capacity,
+                    "system_impact": {
+                        "cpu_before": cpu_before,
+                        "cpu_after": cpu_after,
+                        "cpu_increase": cpu_after - cpu_before,
+                        "memory_before": memory_before,
+                        "memory_after": memory_after,
+                        "memory_increase": memory_after - memory_before
+                    },
+                    "system_stress": cpu_after > 80 or memory_after > 80
+                }
                     
         except Exception as e:
             return {
@@ -140,46 +129,43 @@ class LoadAuditStressTester:
         print("📋 LOADAUDIT STRESS TEST REPORT")
         print("="*60)
         
-        successful_tests = [r for r in self.results if r["result"]["status"] == "SUCCESS"]
-        failed_tests = [r for r in self.results if r["result"]["status"] == "FAILED"]
-        
-        if successful_tests:
-            max_users = max(r["config"]["users"] for r in successful_tests)
-            print(f"✅ Maximum Concurrent Users Handled: {max_users}")
+        for entry in self.results:
+            result = entry["result"]
+            if result["status"] != "SUCCESS":
+                print(f"❌ {entry['scenario']} failed: {result['error']}")
+                continue
             
-            # Find performance breaking point
-            performance_degradation = []
-            for result in successful_tests:
-                api_data = result["result"].get("api_response", {})
-                if api_data.get("avg_latency", 0) > 2.0:  # 2 second threshold
-                    performance_degradation.append(result["config"]["users"])
+            capacity = result["capacity"]
+            unit = capacity["mode"]
+            low, high = capacity["confidence_interval"]
+            print(f"✅ Maximum Sustainable Load: {capacity['max_sustainable_load']:g} {unit}")
+            if capacity["capped"]:
+                print(f"ℹ️ No SLO violation up to the search limit ({high:g} {unit})")
+            else:
+                print(f"⚠️ Breaking Point: between {low:g} and {high:g} {unit}")
+            slo = capacity["slo"]
+            print(f"🎯 SLO: p99 ≤ {slo['max_p99_latency']}s, error rate ≤ {slo['max_error_rate']:.1%}")
             
-            if performance_degradation:
-                print(f"⚠️ Performance Degradation Starts At: {min(performance_degradation)} users")
+            print("\n📈 Steps:")
+            for step in capacity["steps"]:
+                verdict = "✅" if step["passed"] else "❌"
+                early = " (early stop)" if step["ended_early"] else ""
+                print(
+                    f"  {verdict} {step['load']:g} {unit}: p99={step['p99_latency']}s "
+                    f"errors={step['error_rate']:.2%} over {step['requests']} requests{early}"
+                )
             
-            # System resource usage
-            max_cpu = max(r["result"]["system_impact"]["cpu_after"] for r in successful_tests)
-            max_memory = max(r["result"]["system_impact"]["memory_after"] for r in successful_tests)
-            print(f"🖥️ Peak CPU Usage: {max_cpu:.1f}%")
-            print(f"💾 Peak Memory Usage: {max_memory:.1f}%")
-        
-        if failed_tests:
-            first_failure = failed_tests[0]
-            print(f"❌ First Failure At: {first_failure['config']['users']} users")
-            print(f"💥 Failure Reason: {first_failure['result']['error']}")
-        
-        print(f"\n📊 Total Tests Run: {len(self.results)}")
-        print(f"✅ Successful: {len(successful_tests)}")
-        print(f"❌ Failed: {len(failed_tests)}")
-        
-        # Recommendations
-        print("\n🎯 RECOMMENDATIONS:")
-        if successful_tests:
-            safe_limit = max_users // 2
-            print(f"• Recommended Production Limit: {safe_limit} concurrent users")
-            print(f"• Safe Operating Zone: 1-{safe_limit} users")
-            print(f"• Monitor Closely Above: {safe_limit} users")
-            print(f"• Hard Limit: {max_users} users")
+            impact = result["system_impact"]
+            print(f"\n🖥️ CPU After Search: {impact['cpu_after']:.1f}%")
+            print(f"💾 Memory After Search: {impact['memory_after']:.1f}%")
+            print(f"⏱️ Search Took: {result['test_duration']:.0f}s over {len(capacity['steps'])} steps")
+            
+            # Recommendations
+            print("\n🎯 RECOMMENDATIONS:")
+            safe_limit = capacity["max_sustainable_load"] * 0.7
+            print(f"• Recommended Production Limit: {safe_limit:g} {unit} (70% of capacity)")
+            print(f"• Monitor Closely Above: {safe_limit:g} {unit}")
+            print(f"• Hard Limit: {capacity['max_sustainable_load']:g} {unit}")
         
         # Save detailed report
         report_file = f"stress_test_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
@@ -191,10 +177,14 @@ async def main():
     """Run the stress test"""
     if len(sys.argv) > 1 and sys.argv[1] == "--help":
         print("LoadAudit Stress Tester")
-        print("Usage: python app/stress_test.py")
-        print("This will progressively test your LoadAudit system to find breaking points")
+        print("Usage: python app/stress_test.py [target_url] [users|rps]")
+        print("Searches for the highest load the target sustains within its SLO")
+        print(f"Target defaults to the local stub server ({DEFAULT_TARGET})")
         return
     
+    target_url = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_TARGET
+    mode = sys.argv[2] if len(sys.argv) > 2 else "users"
+    
     print("⚠️ WARNING: This will stress test your system!")
     print("Make sure you're running this on a test environment.")
     
@@ -203,8 +193,10 @@ async def main():
         print("Stress test cancelled.")
         return
     
-    tester = LoadAuditStressTester()
-    await tester.run_stress_test()
+    tester = LoadAuditStressTester(target_url=target_url)
+    await tester.run_stress_test(mode=mode)
 
 if __name__ == "__main__":
+    if uvloop is not None:
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
     asyncio.run(main())
\ No newline at end of file
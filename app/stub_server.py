@@ -0,0 +1,250 @@
+# app/stub_server.py
+#
+# Usage: python -m app.stub_server [port] [--latency lognormal --latency-ms 5 ...]
+
+import argparse
+import asyncio
+import contextlib
+import math
+import os
+import random
+import subprocess
+import sys
+from collections import deque
+from typing import Deque, Dict, Iterator, List, Optional, Tuple
+
+STUB_HOST = "127.0.0.1"
+STUB_PORT = 8099
+
+LATENCY_MODELS = ("none", "fixed", "lognormal", "bimodal")
+
+
+class StubProfile:
+    """How the stub target behaves: latency distribution, errors, body size, connection reuse.
+
+    * ``fixed`` waits ``latency_ms`` for every response.
+    * ``lognormal`` has median ``latency_ms`` and shape ``sigma``.
+    * ``bimodal`` is lognormal around ``latency_ms``, except that a
+      ``slow_fraction`` of responses is lognormal around ``slow_ms``.
+
+    ``error_rate`` of the responses are ``error_status``; every
+    ``close_every``-th response on a connection carries ``Connection:
+    close`` and the connection is closed after it (1 disables keep-alive).
+    Draws come from a seeded generator, so a profile replays the same
+    sequence of delays and errors.
+    """
+
+    def __init__(
+        self,
+        latency: str = "none",
+        latency_ms: float = 0.0,
+        sigma: float = 0.5,
+        slow_ms: float = 0.0,
+        slow_fraction: float = 0.0,
+        error_rate: float = 0.0,
+        error_status: int = 500,
+        payload_bytes: int = 11,
+        close_every: int = 0,
+        seed: int = 42,
+    ):
+        if latency not in LATENCY_MODELS:
+            raise ValueError(f"latency must be one of {LATENCY_MODELS}")
+        self.latency = latency
+        self.latency_ms = latency_ms
+        self.sigma = sigma
+        self.slow_ms = slow_ms
+        self.slow_fraction = slow_fraction
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.payload_bytes = payload_bytes
+        self.close_every = close_every
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self._responses = {
+            keep_alive: {
+                status: _build_response(status, payload_bytes, keep_alive) for status in (200, error_status)
+            }
+            for keep_alive in (True, False)
+        }
+
+    def delay(self) -> float:
+        """Seconds to hold the next response"""
+        if self.latency == "fixed":
+            return self.latency_ms / 1000
+        if self.latency == "lognormal":
+            return self.rng.lognormvariate(math.log(max(self.latency_ms, 1e-3) / 1000), self.sigma)
+        if self.latency == "bimodal":
+            median = self.slow_ms if self.rng.random() < self.slow_fraction else self.latency_ms
+            return self.rng.lognormvariate(math.log(max(median, 1e-3) / 1000), self.sigma)
+        return 0.0
+
+    def response(self, keep_alive: bool) -> bytes:
+        status = self.error_status if self.error_rate and self.rng.random() < self.error_rate else 200
+        return self._responses[keep_alive][status]
+
+    def to_dict(self) -> Dict:
+        return {
+            "latency": self.latency,
+            "latency_ms": self.latency_ms,
+            "sigma": self.sigma,
+            "slow_ms": self.slow_ms,
+            "slow_fraction": self.slow_fraction,
+            "error_rate": self.error_rate,
+            "error_status": self.error_status,
+            "payload_bytes": self.payload_bytes,
+            "close_every": self.close_every,
+            "seed": self.seed,
+        }
+
+    def to_args(self) -> List[str]:
+        """Command-line form, for launching the stub in its own process"""
+        args = []
+        for name, value in self.to_dict().items():
+            args += [f"--{name.replace('_', '-')}", str(value)]
+        return args
+
+
+def _build_response(status: int, payload_bytes: int, keep_alive: bool) -> bytes:
+    """Pre-rendered response: a JSON body padded to `payload_bytes`"""
+    body = b'{"ok":true}' if status < 400 else b'{"ok":false}'
+    if payload_bytes > len(body):
+        body = body[:-1] + b',"pad":"' + b"x" * max(payload_bytes - len(body) - 9, 0) + b'"}'
+    reason = b"OK" if status < 400 else b"Error"
+    return (
+        b"HTTP/1.1 %d %s\r\n"
+        b"Content-Type: application/json\r\n"
+        b"Content-Length: %d\r\n"
+        b"%s"
+        b"\r\n" % (status, reason, len(body), b"" if keep_alive else b"Connection: close\r\n")
+    ) + body
+
+
+class StubProtocol(asyncio.Protocol):
+    """Minimal keep-alive HTTP/1.1 responder used as a local benchmark target"""
+
+    def __init__(self, profile: Optional[StubProfile] = None):
+        self.profile = profile or StubProfile()
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.buffer = b""
+        self.served = 0
+        self.closing = False
+        # Delayed responses queue up here so pipelined requests are answered in order
+        self.pending: Deque[Tuple[float, bytes, bool]] = deque()
+
+    def data_received(self, data):
+        self.buffer += data
+        while not self.closing:
+            header_end = self.buffer.find(b"\r\n\r\n")
+            if header_end < 0:
+                return
+            head = self.buffer[:header_end]
+            body_length = 0
+            for line in head.split(b"\r\n")[1:]:
+                name, _, value = line.partition(b":")
+                if name.strip().lower() == b"content-length":
+                    body_length = int(value.strip())
+            request_end = header_end + 4 + body_length
+            if len(self.buffer) < request_end:
+                return
+            self.buffer = self.buffer[request_end:]
+            self._respond()
+
+    def _respond(self):
+        profile = self.profile
+        self.served += 1
+        self.closing = bool(profile.close_every) and self.served % profile.close_every == 0
+        response = profile.response(keep_alive=not self.closing)
+        delay = profile.delay()
+        if not delay and not self.pending:
+            self._send(response, self.closing)
+            return
+        loop = asyncio.get_running_loop()
+        due = loop.time() + delay
+        if self.pending:
+            due = max(due, self.pending[-1][0])
+        self.pending.append((due, response, self.closing))
+        loop.call_at(due, self._flush)
+
+    def _flush(self):
+        # One timer per queued response; due times never decrease, so the head is always next
+        _, response, close = self.pending.popleft()
+        self._send(response, close)
+
+    def _send(self, response: bytes, close: bool):
+        if self.transport.is_closing():
+            return
+        self.transport.write(response)
+        if close:
+            self.transport.close()
+
+
+async def start_stub_server(
+    host: str = STUB_HOST, port: int = STUB_PORT, profile: Optional[StubProfile] = None
+) -> asyncio.AbstractServer:
+    """Start the stub server on the running loop (port 0 picks a free port)"""
+    loop = asyncio.get_running_loop()
+    profile = profile or StubProfile()
+    return await loop.create_server(lambda: StubProtocol(profile), host, port)
+
+
+def stub_url(server: asyncio.AbstractServer) -> str:
+    host, port = server.sockets[0].getsockname()[:2]
+    return f"http://{host}:{port}/"
+
+
+@contextlib.contextmanager
+def stub_process(profile: Optional[StubProfile] = None, port: int = 0) -> Iterator[str]:
+    """Run the stub in its own process, so it does not share a CPU core with the load generator"""
+    package_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    python_path = os.pathsep.join(filter(None, [package_root, os.environ.get("PYTHONPATH")]))
+    env = dict(os.environ, PYTHONPATH=python_path)
+    process = subprocess.Popen(
+        [sys.executable, "-m", "app.stub_server", str(port), *(profile or StubProfile()).to_args()],
+        stdout=subprocess.PIPE, text=True, env=env,
+    )
+    try:
+        # The first line announces the bound address
+        url = process.stdout.readline().strip().rsplit(" ", 1)[-1]
+        if not url.startswith("http"):
+            raise RuntimeError("Stub server process failed to start")
+        yield url
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def _parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="LoadAudit stub target server")
+    parser.add_argument("port", type=int, nargs="?", default=STUB_PORT)
+    parser.add_argument("--host", default=STUB_HOST)
+    parser.add_argument("--latency", choices=LATENCY_MODELS, default="none")
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--sigma", type=float, default=0.5)
+    parser.add_argument("--slow-ms", type=float, default=0.0)
+    parser.add_argument("--slow-fraction", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=500)
+    parser.add_argument("--payload-bytes", type=int, default=11)
+    parser.add_argument("--close-every", type=int, default=0)
+    parser.add_argument("--seed", type=int, default=42)
+    return parser.parse_args(argv)
+
+
+async def main():
+    args = _parse_args()
+    profile = StubProfile(
+        latency=args.latency, latency_ms=args.latency_ms, sigma=args.sigma,
+        slow_ms=args.slow_ms, slow_fraction=args.slow_fraction,
+        error_rate=args.error_rate, error_status=args.error_status,
+        payload_bytes=args.payload_bytes, close_every=args.close_every, seed=args.seed,
+    )
+    server = await start_stub_server(args.host, args.port, profile)
+    print(f"🎯 Stub target listening on {stub_url(server)}", flush=True)
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
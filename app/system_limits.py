@@ -1,53 +1,274 @@
 # Add this to your project as a new file: app/system_limits.py
 
 import asyncio
-import psutil
-import resource
 import platform
-import json
-from typing import Dict, List
-from fastapi import APIRouter
+import resource
+import time
+from typing import Dict, Optional
+
+import psutil
+from fastapi import APIRouter, HTTPException, Query
+
+from app.debug import logger
+from app.jobs import QueueFullError, job_manager
+from app.load_tester import run_load_test
+from app.models import RunStatus
+from app.persistence import generate_run_id
+from app.stub_server import StubProfile, stub_process
+from app.transports import available_transports
 
 router = APIRouter()
 
-def get_system_limits() -> Dict:
+SYSTEM_SAMPLE_INTERVAL = 2.0  # Seconds between background samples while the endpoints are polled
+SYSTEM_SNAPSHOT_TTL = 5.0  # Oldest snapshot served before one is taken on the request path
+SYSTEM_IDLE_TIMEOUT = 60.0  # The background sampler stops after this long without a reader
+FD_RESERVE = 100  # File descriptors kept back for the process itself
+ASSUMED_LATENCY = 0.1  # Seconds per request assumed for the CPU bound when no latency is given
+CALIBRATION_SECONDS = 3
+CALIBRATION_USERS = 100  # One pooled connection each with the default connection options
+# Uncalibrated estimates
+DEFAULT_MEMORY_PER_USER = 2 * 1024 * 1024
+DEFAULT_USERS_PER_CORE = 200
+
+
+# ------------------------------
+# 🔹 Cached system snapshots
+# ------------------------------
+def _tcp_sockets() -> Optional[int]:
+    """TCP sockets in use host-wide, from the kernel's counters (Linux), or None"""
+    total = 0
+    try:
+        for path in ("/proc/net/sockstat", "/proc/net/sockstat6"):
+            with open(path) as sockstat:
+                for line in sockstat:
+                    if line.startswith(("TCP:", "TCP6:")):
+                        total += int(line.split()[2])
+    except (OSError, ValueError, IndexError):
+        return None
+    return total
+
+
+def _count_connections() -> Optional[int]:
+    """Slow fallback for other platforms: enumerate every socket (background sampler only)"""
+    try:
+        return len(psutil.net_connections(kind="tcp"))
+    except (psutil.AccessDenied, OSError):
+        return None
+
+
+class SystemMonitor:
+    """Host load behind a TTL cache, refreshed by a background task while someone is reading.
+
+    Readers get the latest snapshot without waiting: CPU usage comes from
+    ``psutil.cpu_percent(interval=None)`` (the share since the previous
+    sample, so nothing sleeps) and connection counts from the kernel's
+    socket counters. The sampler starts on the first read and stops after
+    SYSTEM_IDLE_TIMEOUT seconds without one; a snapshot older than
+    SYSTEM_SNAPSHOT_TTL is replaced on the request path, which costs a
+    few /proc reads. The latest loopback calibration is kept here too.
+    """
+
+    def __init__(
+        self,
+        interval: float = SYSTEM_SAMPLE_INTERVAL,
+        ttl: float = SYSTEM_SNAPSHOT_TTL,
+        idle_timeout: float = SYSTEM_IDLE_TIMEOUT,
+    ):
+        self.interval = interval
+        self.ttl = ttl
+        self.idle_timeout = idle_timeout
+        self.process = psutil.Process()
+        self.snapshot: Optional[Dict] = None
+        self.sampled_at = 0.0
+        self.last_read = 0.0
+        self.connections: Optional[int] = None  # Filled in by the sampler where sockstat is missing
+        self.calibration: Optional[Dict] = None
+        self._task: Optional[asyncio.Task] = None
+        psutil.cpu_percent(interval=None)  # Prime the CPU-time baseline
+
+    def current(self) -> Dict:
+        now = time.monotonic()
+        self.last_read = now
+        self._ensure_sampling()
+        if self.snapshot is None or now - self.sampled_at > self.ttl:
+            self.sample()
+        return self.snapshot
+
+    def sample(self) -> Dict:
+        """Take a snapshot now; every call is non-blocking"""
+        cpu_percent = psutil.cpu_percent(interval=None)
+        memory = psutil.virtual_memory()
+        with self.process.oneshot():
+            rss = self.process.memory_info().rss
+            fds = self.process.num_fds() if hasattr(self.process, "num_fds") else self.process.num_handles()
+        connections = _tcp_sockets()
+        self.snapshot = {
+            "cpu_usage_percent": cpu_percent,
+            "memory_usage_percent": memory.percent,
+            "available_memory_gb": round(memory.available / (1024**3), 2),
+            "available_memory_bytes": memory.available,
+            "load_average": psutil.getloadavg() if hasattr(psutil, "getloadavg") else None,
+            "active_connections": connections if connections is not None else self.connections,
+            "process_open_fds": fds,
+            "process_rss_mb": round(rss / 1024**2, 1),
+            "status": get_load_status(cpu_percent, memory.percent),
+            "sampled_at": time.time(),
+        }
+        self.sampled_at = time.monotonic()
+        return self.snapshot
+
+    def _ensure_sampling(self):
+        if self._task is not None and not self._task.done():
+            return
+        try:
+            self._task = asyncio.get_running_loop().create_task(self._sample_loop())
+        except RuntimeError:
+            pass  # No event loop (a synchronous caller): snapshots are then taken on read only
+
+    async def _sample_loop(self):
+        while time.monotonic() - self.last_read < self.idle_timeout:
+            await asyncio.sleep(self.interval)
+            if _tcp_sockets() is None:
+                self.connections = await asyncio.to_thread(_count_connections)
+            self.sample()
+
+
+system_monitor = SystemMonitor()
+
+
+def get_current_load() -> Dict:
+    """Get current system load (a cached snapshot, at most SYSTEM_SNAPSHOT_TTL seconds old)"""
+    snapshot = dict(system_monitor.current())
+    snapshot.pop("available_memory_bytes")
+    return snapshot
+
+
+def get_load_status(cpu_percent: float, memory_percent: float) -> str:
+    """Determine system load status"""
+    if cpu_percent > 90 or memory_percent > 90:
+        return "CRITICAL"
+    elif cpu_percent > 70 or memory_percent > 70:
+        return "HIGH"
+    elif cpu_percent > 50 or memory_percent > 50:
+        return "MODERATE"
+    else:
+        return "LOW"
+
+
+# ------------------------------
+# 🔹 Loopback calibration
+# ------------------------------
+async def calibrate(
+    duration: int = CALIBRATION_SECONDS, users: int = CALIBRATION_USERS, transport: str = "httpx"
+) -> Dict:
+    """Measure this host's per-user costs with a short closed-loop run against a local stub.
+
+    The stub runs in its own process, so the CPU time counted is the
+    generator's alone: requests per CPU-second bound what one worker (one
+    core) can drive. Memory and file descriptors per user come from the
+    run's resource timeline, over the process's own use before it started.
+    """
+    stub = stub_process(StubProfile())
+    url = await asyncio.to_thread(stub.__enter__)  # Waits for the stub process to bind
+    try:
+        before = system_monitor.sample()
+        cpu_before = time.process_time()
+        results = await run_load_test(
+            url, users, duration, run_id="calibration", keep_samples=False,
+            client_options={"transport": transport}, resource_interval=min(1.0, duration / 4),
+        )
+        cpu_seconds = time.process_time() - cpu_before
+    finally:
+        await asyncio.to_thread(stub.__exit__, None, None, None)
+
+    summary = results.resource_timelines[0]["summary"]
+    requests = len(results)
+    calibration = {
+        "calibrated_at": time.time(),
+        "transport": transport,
+        "users": users,
+        "duration": duration,
+        "requests": requests,
+        "requests_per_second": round(requests / results.elapsed, 1) if results.elapsed else 0.0,
+        "requests_per_cpu_second": round(requests / cpu_seconds, 1) if cpu_seconds else 0.0,
+        "memory_per_user_bytes": max(int((summary["rss_peak_mb"] - before["process_rss_mb"]) * 1024**2 / users), 1),
+        "fds_per_user": round(max((summary["open_fds_peak"] - before["process_open_fds"]) / users, 1 / users), 3),
+    }
+    system_monitor.calibration = calibration
+    logger.info(
+        "📏 Calibrated %s: %.0f req/CPU-s, %.0f KB and %.2f fds per user",
+        transport, calibration["requests_per_cpu_second"],
+        calibration["memory_per_user_bytes"] / 1024, calibration["fds_per_user"],
+    )
+    return calibration
+
+
+# ------------------------------
+# 🔹 Limits and capacity
+# ------------------------------
+def estimate_capacity(snapshot: Dict, cpu_count: int, fd_limit: int, latency: float) -> Dict:
+    """Concurrent users each resource allows, from the calibration when there is one.
+
+    The CPU bound is Little's law: a core drives `requests_per_cpu_second`,
+    and a user spending `latency` per request issues 1 / latency of them.
+    """
+    calibration = system_monitor.calibration
+    if calibration is not None:
+        memory_per_user = calibration["memory_per_user_bytes"]
+        fds_per_user = calibration["fds_per_user"]
+        users_per_core = int(calibration["requests_per_cpu_second"] * latency)
+    else:
+        memory_per_user, fds_per_user, users_per_core = DEFAULT_MEMORY_PER_USER, 1.0, DEFAULT_USERS_PER_CORE
+    limits = {
+        "memory": int(snapshot["available_memory_bytes"] // memory_per_user),
+        "fd": int(max(fd_limit - FD_RESERVE, 0) / fds_per_user),
+        "cpu": cpu_count * users_per_core,
+    }
+    return {
+        "basis": "loopback calibration" if calibration is not None else "default estimates",
+        "limits": limits,
+        "memory_per_user_kb": round(memory_per_user / 1024, 1),
+        "fds_per_user": fds_per_user,
+        "users_per_core": users_per_core,
+        "max_concurrent_users": min(limits.values()),
+    }
+
+
+def get_system_limits(latency: float = ASSUMED_LATENCY) -> Dict:
     """Analyze current system limits and capacity"""
-    
-    # Get system info
+    snapshot = system_monitor.current()
     cpu_count = psutil.cpu_count(logical=True)
     memory = psutil.virtual_memory()
-    
-    # Get resource limits
     soft_limit, hard_limit = resource.getrlimit(resource.RLIMIT_NOFILE)
-    
-    # Calculate theoretical limits
-    max_concurrent_users = min(
-        soft_limit - 100,  # Reserve 100 file descriptors for system
-        memory.available // (1024 * 1024 * 2),  # 2MB per user estimate
-        cpu_count * 200  # 200 users per CPU core (conservative)
-    )
-    
+
+    capacity = estimate_capacity(snapshot, cpu_count, soft_limit, latency)
+    max_concurrent_users = capacity["max_concurrent_users"]
+    limits = capacity["limits"]
+
     return {
         "system_info": {
             "platform": platform.system(),
             "cpu_cores": cpu_count,
             "total_memory_gb": round(memory.total / (1024**3), 2),
-            "available_memory_gb": round(memory.available / (1024**3), 2),
-            "memory_usage_percent": memory.percent
+            "available_memory_gb": snapshot["available_memory_gb"],
+            "memory_usage_percent": snapshot["memory_usage_percent"]
         },
         "resource_limits": {
             "max_file_descriptors": soft_limit,
             "hard_file_descriptor_limit": hard_limit,
-            "current_open_files": len(psutil.Process().open_files())
+            "current_open_files": snapshot["process_open_fds"]
         },
         "estimated_capacity": {
             "max_concurrent_users": max_concurrent_users,
             "recommended_max_users": max_concurrent_users // 2,  # 50% safety margin
             "max_test_duration_minutes": 60,  # Practical limit
+            "basis": capacity["basis"],
+            "assumed_latency_seconds": latency,
+            "calibration": system_monitor.calibration,
             "breaking_points": {
-                "memory_limit": f"~{memory.available // (1024 * 1024 * 10)} users (10MB each)",
-                "fd_limit": f"~{soft_limit - 100} users (1 connection each)",
-                "cpu_limit": f"~{cpu_count * 200} users (200 per core)"
+                "memory_limit": f"~{limits['memory']} users ({capacity['memory_per_user_kb']:g} KB each)",
+                "fd_limit": f"~{limits['fd']} users ({capacity['fds_per_user']:g} connections each)",
+                "cpu_limit": f"~{limits['cpu']} users ({capacity['users_per_core']} per core at {latency:g}s per request)"
             }
         },
         "performance_degradation": {
@@ -59,65 +280,67 @@ def get_system_limits() -> Dict:
         }
     }
 
-def get_current_load() -> Dict:
-    """Get current system load"""
-    cpu_percent = psutil.cpu_percent(interval=1)
-    memory = psutil.virtual_memory()
-    
-    return {
-        "cpu_usage_percent": cpu_percent,
-        "memory_usage_percent": memory.percent,
-        "available_memory_gb": round(memory.available / (1024**3), 2),
-        "load_average": psutil.getloadavg() if hasattr(psutil, 'getloadavg') else None,
-        "active_connections": len(psutil.net_connections()),
-        "status": get_load_status(cpu_percent, memory.percent)
-    }
-
-def get_load_status(cpu_percent: float, memory_percent: float) -> str:
-    """Determine system load status"""
-    if cpu_percent > 90 or memory_percent > 90:
-        return "CRITICAL"
-    elif cpu_percent > 70 or memory_percent > 70:
-        return "HIGH"
-    elif cpu_percent > 50 or memory_percent > 50:
-        return "MODERATE"
-    else:
-        return "LOW"
 
 @router.get("/system/limits")
-async def get_limits():
-    """API endpoint to get system limits"""
-    return get_system_limits()
+async def get_limits(latency: float = Query(ASSUMED_LATENCY, gt=0)):
+    """API endpoint to get system limits; `latency` is the expected seconds per request of the target"""
+    return get_system_limits(latency)
+
 
-@router.get("/system/status") 
+@router.get("/system/status")
 async def get_status():
     """API endpoint to get current system status"""
     return get_current_load()
 
+
+@router.post("/system/calibrate", response_model=RunStatus, status_code=202)
+async def start_calibration(
+    duration: int = Query(CALIBRATION_SECONDS, ge=1, le=30),
+    users: int = Query(CALIBRATION_USERS, ge=1, le=10_000),
+    transport: str = "httpx",
+):
+    """Queue a loopback calibration (it waits for running load tests); GET /system/calibration reads it"""
+    if transport not in available_transports():
+        raise HTTPException(status_code=422, detail=f"transport must be one of {available_transports()} here")
+    run_id = generate_run_id()
+    try:
+        job = job_manager.submit(run_id, lambda: calibrate(duration, users, transport), kind="calibration")
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    return RunStatus(**job.to_dict(), queue_position=job_manager.queue_position(job))
+
+
+@router.get("/system/calibration")
+async def get_calibration():
+    if system_monitor.calibration is None:
+        raise HTTPException(status_code=404, detail="No calibration yet; POST /system/calibrate")
+    return system_monitor.calibration
+
+
 # Stress testing function
 async def stress_test_capacity():
     """Test system capacity progressively"""
     results = []
-    
+
     test_levels = [10, 25, 50, 100, 200, 500, 1000]
-    
+
     for user_count in test_levels:
-        print(f"\n🧪 Testing {user_count} concurrent users...")
-        
-        start_load = get_current_load()
-        
+        logger.info("🧪 Testing %s concurrent users...", user_count)
+
+        start_load = system_monitor.sample()
+
         try:
             # Simulate the load without actually making requests
             tasks = []
             for i in range(user_count):
                 tasks.append(asyncio.sleep(0.1))  # Simulate work
-            
+
             start_time = asyncio.get_event_loop().time()
             await asyncio.gather(*tasks)
             end_time = asyncio.get_event_loop().time()
-            
-            end_load = get_current_load()
-            
+
+            end_load = system_monitor.sample()
+
             result = {
                 "user_count": user_count,
                 "duration": end_time - start_time,
@@ -127,21 +350,21 @@ async def stress_test_capacity():
                 "memory_after": end_load["memory_usage_percent"],
                 "status": "SUCCESS"
             }
-            
+
             results.append(result)
-            
+
             # Break if system is getting stressed
             if end_load["cpu_usage_percent"] > 80 or end_load["memory_usage_percent"] > 80:
-                print(f"⚠️ System stress detected at {user_count} users")
+                logger.warning("⚠️ System stress detected at %s users", user_count)
                 break
-                
+
         except Exception as e:
             results.append({
                 "user_count": user_count,
                 "status": "FAILED",
                 "error": str(e)
             })
-            print(f"❌ Failed at {user_count} users: {e}")
+            logger.error("❌ Failed at %s users: %s", user_count, e)
             break
-    
-    return results
\ No newline at end of file
+
+    return results
@@ -0,0 +1,124 @@
+# app/timing.py
+
+import time
+from typing import Dict, Optional, Tuple
+
+import httpx
+
+PHASES = ("pool_wait", "connect", "tls", "ttfb", "body_read")
+# Client-side delays outside PHASES; together with pool_wait they are the client overhead
+OVERHEADS = ("dispatch_delay", "resume_delay")
+
+# httpcore trace event → the phase boundary it marks
+_MARKS = {
+    "connection.connect_tcp.started": "connect_start",
+    "connection.connect_tcp.complete": "connect_end",
+    "connection.start_tls.started": "tls_start",
+    "connection.start_tls.complete": "tls_end",
+    "http11.send_request_headers.started": "send_start",
+    "http2.send_request_headers.started": "send_start",
+    "http11.receive_response_headers.complete": "headers_end",
+    "http2.receive_response_headers.complete": "headers_end",
+    "http11.receive_response_body.started": "body_start",
+    "http2.receive_response_body.started": "body_start",
+    "http11.receive_response_body.complete": "body_end",
+    "http2.receive_response_body.complete": "body_end",
+}
+
+
+class RequestTimer:
+    """httpx/httpcore ``trace`` extension that splits one request into phases.
+
+    pool_wait  — from the request call until a connection is being opened or
+                 the request starts writing on a reused one (time queued in
+                 the client's connection pool)
+    connect    — TCP connect
+    tls        — TLS handshake
+    ttfb       — request write until response headers are received
+    body_read  — reading the response body
+
+    ``finish()`` is called when the caller's coroutine gets control back;
+    the gap after the last body byte is event-loop scheduling delay.
+    Transports without httpcore tracing set the same boundaries with ``mark()``.
+    """
+
+    __slots__ = ("started", "finished", "marks")
+
+    def __init__(self):
+        self.started = 0.0
+        self.finished = 0.0
+        self.marks: Dict[str, float] = {}
+
+    def start(self) -> "RequestTimer":
+        self.started = time.perf_counter()
+        self.finished = 0.0
+        self.marks = {}
+        return self
+
+    def finish(self):
+        self.finished = time.perf_counter()
+
+    async def __call__(self, event_name: str, info: Dict):
+        mark = _MARKS.get(event_name)
+        if mark is not None:
+            self.marks[mark] = time.perf_counter()
+
+    def mark(self, name: str):
+        """Record a phase boundary (``connect_start``, ``send_start``, ``headers_end``, ...) now"""
+        self.marks[name] = time.perf_counter()
+
+    def phases(self) -> Optional[Tuple[float, ...]]:
+        """Phase durations in PHASES order, or None if the request never reached the wire"""
+        marks = self.marks
+        if "send_start" not in marks:
+            return None
+        first_io = marks.get("connect_start", marks["send_start"])
+        return (
+            first_io - self.started,
+            self._span(marks, "connect_start", "connect_end"),
+            self._span(marks, "tls_start", "tls_end"),
+            self._span(marks, "send_start", "headers_end"),
+            self._span(marks, "body_start", "body_end"),
+        )
+
+    def resume_delay(self) -> float:
+        """Seconds between the response body completing and the caller resuming"""
+        body_end = self.marks.get("body_end")
+        if body_end is None or not self.finished:
+            return 0.0
+        return max(self.finished - body_end, 0.0)
+
+    @staticmethod
+    def _span(marks: Dict[str, float], start: str, end: str) -> float:
+        if start in marks and end in marks:
+            return marks[end] - marks[start]
+        return 0.0
+
+
+def build_client(
+    max_connections: int = 100,
+    max_keepalive_connections: int = 20,
+    keepalive_expiry: float = 5.0,
+    http2: bool = False,
+    connect_timeout: float = 10.0,
+    read_timeout: float = 10.0,
+    pool_timeout: float = 10.0,
+    reuse_connections: bool = True,
+) -> httpx.AsyncClient:
+    """Shared client for a run, with explicit pool, keep-alive and timeout settings.
+
+    With ``reuse_connections=False`` every request opens a fresh connection
+    (no keep-alive pool, ``Connection: close``), which measures
+    connection setup cost on each request. HTTP/2 needs the optional ``h2``
+    package (``pip install httpx[http2]``).
+    """
+    limits = httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=max_keepalive_connections if reuse_connections else 0,
+        keepalive_expiry=keepalive_expiry,
+    )
+    timeout = httpx.Timeout(
+        connect=connect_timeout, read=read_timeout, write=read_timeout, pool=pool_timeout
+    )
+    headers = None if reuse_connections else {"Connection": "close"}
+    return httpx.AsyncClient(limits=limits, timeout=timeout, http2=http2, headers=headers)
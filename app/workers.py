@@ -0,0 +1,133 @@
+# app/workers.py
+
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+from app.debug import configure_logging, logger
+from app.load_tester import DEFAULT_MAX_IN_FLIGHT, run_load_test
+from app.resources import DEFAULT_SAMPLE_INTERVAL
+from app.responses import DEFAULT_HEAD_BYTES
+from app.results import RunResults
+from app.runtime import use_event_loop
+from app.stages import stage_names
+
+WORKER_START_DELAY = 2.0  # Seconds allowed for worker processes to spawn before the shared start
+
+
+def split_budget(total: int, workers: int) -> List[int]:
+    """Split `total` users (or in-flight slots) across workers as evenly as possible"""
+    base, extra = divmod(total, workers)
+    return [base + (1 if i < extra else 0) for i in range(workers)]
+
+
+def shard_jobs(shards: int, suffix: str, **run_options) -> List[Dict]:
+    """Split one run's options into `shards` run_load_test kwargs.
+
+    Users (including stage targets), the request rate (including ramp
+    targets) and the in-flight limit are divided evenly; each shard gets its own run_id
+    (``{run_id}_{suffix}{n}``) and its slice of the scenario feeders. Stages
+    are named from the whole profile, since an uneven split can change a
+    stage's shape (ramp-up vs hold) on one shard and the partials must merge.
+    """
+    users = split_budget(run_options["num_users"], shards)
+    in_flight = split_budget(run_options.get("max_in_flight", DEFAULT_MAX_IN_FLIGHT), shards)
+    target_rps = run_options.get("target_rps")
+    stages = run_options.get("stages") or []
+    names = stage_names(stages)
+    jobs = []
+    for index in range(shards):
+        jobs.append({
+            **run_options,
+            "num_users": users[index],
+            "run_id": f"{run_options.get('run_id', 'default')}_{suffix}{index}",
+            "target_rps": target_rps / shards if target_rps is not None else None,
+            "rps_ramp": [
+                {"duration": stage["duration"], "target_rps": stage["target_rps"] / shards}
+                for stage in run_options.get("rps_ramp") or []
+            ],
+            "stages": [
+                {**stage, "name": name, "target_users": split_budget(stage["target_users"], shards)[index]}
+                for stage, name in zip(stages, names)
+            ],
+            "max_in_flight": max(1, in_flight[index]),
+            "feeder_shard": (index, shards),
+        })
+    return jobs
+
+
+def _worker_main(start_at: float, kwargs: Dict, event_loop: str = "auto") -> Dict:
+    """Entry point inside a worker process: wait for the shared start, run, return a partial"""
+    configure_logging()  # Spawned workers start with an unconfigured logger
+    use_event_loop(event_loop)
+    delay = start_at - time.time()
+    if delay > 0:
+        time.sleep(delay)
+    results = asyncio.run(run_load_test(**kwargs, keep_samples=False))
+    return results.to_partial()
+
+
+async def run_multiprocess_load_test(
+    url: str,
+    num_users: int,
+    duration: int,
+    method: str = "GET",
+    headers: Optional[Dict] = None,
+    payload: Optional[Dict] = None,
+    chaos_mode: bool = False,
+    run_id: str = "default",
+    target_rps: Optional[float] = None,
+    rps_ramp: Optional[List[Dict]] = None,
+    max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+    client_options: Optional[Dict] = None,
+    trace_timings: bool = True,
+    workers: Optional[int] = None,
+    resource_interval: Optional[float] = DEFAULT_SAMPLE_INTERVAL,
+    scenario: Optional[Dict] = None,
+    response_mode: str = "discard",
+    response_head_bytes: int = DEFAULT_HEAD_BYTES,
+    stages: Optional[List[Dict]] = None,
+    gc_mode: str = "freeze",
+    event_loop: str = "auto"
+) -> RunResults:
+    """Shard a run across worker processes, each with its own event loop and client.
+
+    Users (or, in open-loop mode, the request rate and in-flight limit) are
+    split evenly. Workers start together at a shared wall-clock time and
+    send back only histograms, counters and their resource timelines, which
+    are merged here into a RunResults for analyze_results. Each worker
+    writes its own request log (``logs/run_{run_id}_w{n}.jsonl``).
+    Scenario feeders are sharded, so workers read disjoint rows.
+    Each worker runs on `event_loop` (see app.runtime.use_event_loop).
+    """
+    workers = max(1, workers or os.cpu_count() or 1)
+    if target_rps is None:
+        workers = min(workers, max(num_users, 1))  # No idle workers in closed-loop mode
+    start_at = time.time() + WORKER_START_DELAY
+    jobs = shard_jobs(
+        workers, "w", url=url, num_users=num_users, duration=duration, method=method,
+        headers=headers, payload=payload, chaos_mode=chaos_mode, run_id=run_id,
+        target_rps=target_rps, rps_ramp=rps_ramp, max_in_flight=max_in_flight,
+        client_options=client_options, trace_timings=trace_timings,
+        resource_interval=resource_interval, scenario=scenario,
+        response_mode=response_mode, response_head_bytes=response_head_bytes, stages=stages,
+        gc_mode=gc_mode,
+    )
+
+    logger.info("🧵 Spreading load test over %s worker processes", workers)
+    loop = asyncio.get_running_loop()
+    # spawn, not fork: the parent may be a running uvicorn/asyncio process
+    context = multiprocessing.get_context("spawn")
+    pool = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+    try:
+        partials = await asyncio.gather(*[
+            loop.run_in_executor(pool, _worker_main, start_at, job, event_loop) for job in jobs
+        ])
+    finally:
+        # Never block the event loop here: on cancellation the workers finish their run on their own
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    return RunResults.from_partials(partials)
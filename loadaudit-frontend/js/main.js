@@ -1,6 +1,7 @@
 // Global state
 let chaosMode = false;
 let currentTest = null;
+let liveSource = null;
 let charts = {};
 let realtimeData = {
   latency: [],
@@ -280,7 +281,11 @@ function setupFormHandler() {
           );
         }
 
-        const result = await response.json();
+        const { run_id: runId } = await response.json();
+        console.log("Load test queued:", runId);
+        streamLiveMetrics(runId, formData.duration);
+
+        const result = await waitForRunResult(runId);
         console.log("Load test completed successfully:", result);
 
         // Display results and keep them visible
@@ -300,7 +305,31 @@ function setupFormHandler() {
     });
 }
 
-// Start live monitoring (simulation during actual test)
+// Poll a queued run until it finishes, then fetch its result
+async function waitForRunResult(runId, pollInterval = 1000) {
+  while (true) {
+    await new Promise((resolve) => setTimeout(resolve, pollInterval));
+
+    const statusResponse = await fetch(`${API_BASE}/runs/${runId}/status`);
+    if (!statusResponse.ok) {
+      throw new Error(`Status check failed: ${statusResponse.status}`);
+    }
+    const status = await statusResponse.json();
+
+    if (status.status === "completed") {
+      const resultResponse = await fetch(`${API_BASE}/runs/${runId}/result`);
+      if (!resultResponse.ok) {
+        throw new Error(`Result fetch failed: ${resultResponse.status}`);
+      }
+      return resultResponse.json();
+    }
+    if (status.status === "failed" || status.status === "cancelled") {
+      throw new Error(status.error || `Run ${status.status}`);
+    }
+  }
+}
+
+// Start live monitoring (metrics arrive via streamLiveMetrics)
 function startLiveMonitoring() {
   console.log("Starting live monitoring...");
 
@@ -309,17 +338,15 @@ function startLiveMonitoring() {
   document.getElementById("placeholderState").classList.add("hidden");
   document.getElementById("monitoringDashboard").classList.add("active");
 
-  const duration = parseInt(document.getElementById("duration").value);
-  const numUsers = parseInt(document.getElementById("numUsers").value);
-
-  // Simulate real-time monitoring during the actual test
-  simulateRealtimeData(duration, numUsers);
+  document.getElementById("progressFill").style.width = "0%";
+  document.getElementById("statusText").textContent = "Starting test...";
 }
 
 // Stop live monitoring but keep results visible
 function stopLiveMonitoring() {
   console.log("Stopping live monitoring...");
 
+  closeLiveStream();
   document.getElementById("testStatus").classList.remove("running");
   document.getElementById("liveStatus").classList.remove("active");
 
@@ -341,60 +368,65 @@ function stopLiveMonitoring() {
   }, 1000); // Shorter delay to keep results visible
 }
 
-// Simulate realtime data during actual test execution
-function simulateRealtimeData(duration, numUsers) {
-  let elapsed = 0;
-  const interval = 1000; // Update every second
+// Stream live metrics for a running test (server-sent events, one per second)
+function streamLiveMetrics(runId, duration) {
+  closeLiveStream();
+  liveSource = new EventSource(`${API_BASE}/runs/${runId}/live`);
 
-  console.log(`Starting ${duration}s simulation with ${numUsers} users`);
+  liveSource.onmessage = (event) => {
+    const snapshot = JSON.parse(event.data);
 
-  const updateInterval = setInterval(() => {
-    elapsed += 1;
-    const progress = (elapsed / duration) * 100;
+    if (snapshot.status === "queued") {
+      document.getElementById("statusText").textContent =
+        "Waiting in queue...";
+      return;
+    }
+    if (snapshot.elapsed === undefined) {
+      // Final status message without metrics
+      if (snapshot.status !== "running") closeLiveStream();
+      return;
+    }
 
-    // Update progress bar
+    const progress = (snapshot.elapsed / duration) * 100;
     document.getElementById("progressFill").style.width = `${Math.min(
       progress,
       100
     )}%`;
-
-    // Update status text
-    document.getElementById(
-      "statusText"
-    ).textContent = `Testing in progress... (${elapsed}/${duration}s)`;
+    document.getElementById("statusText").textContent = `Testing in progress... (${Math.floor(
+      snapshot.elapsed
+    )}/${duration}s)`;
     document.getElementById(
       "statusDetails"
-    ).textContent = `Sending requests with ${numUsers} concurrent users`;
+    ).textContent = `${snapshot.rps} req/s · ${snapshot.total_requests} requests sent`;
 
-    // Generate mock data that looks realistic
-    const baseLatency = 0.2;
-    const latencyVariation =
-      Math.sin(elapsed * 0.1) * 0.3 + Math.random() * 0.4;
-    const latency = baseLatency + latencyVariation;
-
-    const errorRate = Math.random() * 3; // 0-3% error rate
-    const activeUserCount = Math.floor(numUsers * (0.8 + Math.random() * 0.2));
-
-    // Update realtime values
-    document.getElementById("realtimeLatency").textContent = `${latency.toFixed(
-      3
-    )}s`;
+    const errorRate = snapshot.window_error_rate * 100;
+    document.getElementById(
+      "realtimeLatency"
+    ).textContent = `${snapshot.p95_latency.toFixed(3)}s`;
     document.getElementById(
       "realtimeErrors"
     ).textContent = `${errorRate.toFixed(1)}%`;
     document.getElementById("activeUsers").textContent =
-      activeUserCount.toString();
+      snapshot.in_flight.toString();
     document.getElementById("statusCodes").textContent =
       errorRate > 2 ? "Mixed" : "2xx";
 
-    // Update charts
-    updateRealtimeCharts(latency, errorRate, activeUserCount);
+    updateRealtimeCharts(snapshot.p95_latency, errorRate, snapshot.in_flight);
 
-    if (elapsed >= duration) {
-      clearInterval(updateInterval);
-      console.log("Simulation completed");
-    }
-  }, interval);
+    if (snapshot.status !== "running") closeLiveStream();
+  };
+
+  liveSource.onerror = () => {
+    console.warn("Live metrics stream interrupted");
+    closeLiveStream();
+  };
+}
+
+function closeLiveStream() {
+  if (liveSource) {
+    liveSource.close();
+    liveSource = null;
+  }
 }
 
 // Update realtime charts